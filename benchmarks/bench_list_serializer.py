@@ -0,0 +1,67 @@
+# benchmarks/bench_list_serializer.py
+"""
+请假列表序列化吞吐量（行/秒）：LeaveSerializer（select_related + only 取模型实例）vs
+compact_serializer（values_list 元组 + 列映射）。分别统计只序列化、以及取数 + 序列化 + JSON 渲染的整页耗时，
+并校验两者渲染出的 JSON 逐字节一致。
+
+    python -m benchmarks.bench_list_serializer --page-sizes 20 100 500 1000 --repeat 20
+"""
+import argparse
+
+from benchmarks.common import report, seed_institution, setup_django, timed
+
+
+def run(page_sizes, repeat):
+    from rest_framework.renderers import JSONRenderer
+    from leave.compact_serializer import leave_rows, serialize_leave_rows
+    from leave.models import Leave
+    from leave.queries import with_serializer_relations
+    from leave.serializers import LeaveSerializer
+
+    renderer = JSONRenderer()
+    base = Leave.objects.order_by('-leave_time', '-id')
+    rows = []
+    for page_size in page_sizes:
+        instances = list(with_serializer_relations(base)[:page_size])
+        tuples = list(leave_rows(base)[:page_size])
+        assert len(instances) == page_size, f'数据不足 {page_size} 行'
+        assert renderer.render(LeaveSerializer(instances, many=True).data) == \
+            renderer.render(serialize_leave_rows(tuples)), '输出不一致'
+
+        paths = {
+            'LeaveSerializer': (
+                lambda: LeaveSerializer(instances, many=True).data,
+                lambda: renderer.render(LeaveSerializer(with_serializer_relations(base)[:page_size], many=True).data),
+            ),
+            'compact': (
+                lambda: serialize_leave_rows(tuples),
+                lambda: renderer.render(serialize_leave_rows(leave_rows(base)[:page_size])),
+            ),
+        }
+        for label, (serialize_only, full_page) in paths.items():
+            serialize_seconds, _ = timed(serialize_only, repeat)
+            page_seconds, _ = timed(full_page, repeat)
+            rows.append({
+                'serializer': label,
+                'page_size': page_size,
+                'serialize_rows_per_sec': page_size * repeat / serialize_seconds,
+                'page_rows_per_sec': page_size * repeat / page_seconds,
+                'page_ms': page_seconds / repeat * 1000,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请假列表序列化吞吐量')
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 100, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=20, help='每种页大小重复次数')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    setup_django()
+    seed_institution(classes=10, students_per_class=20, advisors=5, leaves_per_student=10)
+    report(f'list serialization, {args.repeat} repeats', run(args.page_sizes, args.repeat), args.output)
+
+
+if __name__ == '__main__':
+    main()
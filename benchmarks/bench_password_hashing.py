@@ -0,0 +1,59 @@
+# benchmarks/bench_password_hashing.py
+"""
+学生批量导入吞吐量（users/sec），使用真实的 PBKDF2 哈希：
+- unique：每人独立加盐，分别用 1、2、4、N（CPU 核数）个进程并行计算
+- shared：默认密码只计算一次
+
+    python -m benchmarks.bench_password_hashing --users 200
+"""
+import argparse
+
+from benchmarks.common import report, setup_django, timed
+
+
+def make_rows(prefix, count, class_name):
+    return [
+        {'row': i + 2, 'username': f'{prefix}{i:05d}', 'last_name': f'学生{i}',
+         'email': f'{prefix}{i:05d}@example.com', 'class_name': class_name}
+        for i in range(count)
+    ]
+
+
+def run(users, worker_counts):
+    from leave.importing import bulk_import_students
+    from leave.models import Class
+    from leave.passwords import make_password_hasher
+
+    Class.objects.create(name='基准班级')
+    configs = [(f'unique, {workers} workers', 'unique', workers) for workers in worker_counts]
+    configs.append(('shared default password', 'shared', None))
+
+    rows = []
+    for index, (label, mode, workers) in enumerate(configs):
+        batch = make_rows(f'b{index}-', users, '基准班级')
+        hasher = make_password_hasher(mode, workers)
+
+        def import_batch():
+            result = bulk_import_students(batch, hasher=hasher)
+            assert len(result.created) == users, result.errors[:3]
+
+        elapsed, _ = timed(import_batch, 1)
+        rows.append({'mode': label, 'users': users, 'seconds': elapsed, 'users_per_sec': users / elapsed})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入密码哈希吞吐量基准')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=None, help='默认 1 2 4 与 CPU 核数')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    setup_django(fast_hashing=False)
+    from leave.passwords import default_workers
+    worker_counts = args.workers or sorted({1, 2, 4, default_workers()})
+    report(f'bulk_import_students ({default_workers()} CPUs)', run(args.users, worker_counts), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_request_leave.py
+"""
+POST /api/request-leave/ 吞吐量：单次写入的 create 路径 vs 旧的 create + 两次 save 路径。
+
+    python -m benchmarks.bench_request_leave --requests 500
+"""
+import argparse
+from datetime import timedelta
+from unittest import mock
+
+from benchmarks.common import auth_client, report, seed_institution, setup_django, timed
+
+
+def legacy_serializer_class():
+    """
+    复刻改造前的 LeaveSerializer.create（INSERT 后再 save 两次），作为对照组。
+    """
+    from leave.authentication import get_db_user
+    from leave.models import Leave
+    from leave.serializers import LeaveSerializer
+
+    class LegacyLeaveSerializer(LeaveSerializer):
+        def create(self, validated_data):
+            validated_data['student'] = get_db_user(self.context['request'].user)
+            student = validated_data['student']
+            if hasattr(student, 'studentprofile') and student.studentprofile.assigned_class:
+                leave_instance = Leave.objects.create(**validated_data)
+                leave_instance.class_name = student.studentprofile.assigned_class.name
+                leave_instance.advisor = student.studentprofile.advisor
+                leave_instance.save()
+                delta = (leave_instance.end_date - leave_instance.start_date).days + 1
+                leave_instance.status = 4 if delta >= 7 else 0
+                leave_instance.save()
+                return leave_instance
+            raise ValueError('User profile or assigned class is not set.')
+
+    return LegacyLeaveSerializer
+
+
+def run(requests):
+    from django.utils import timezone
+
+    data = seed_institution(classes=5, students_per_class=20, advisors=3, leaves_per_student=0)
+    clients = [auth_client(student) for student in data['students']]
+    start = timezone.now()
+    payload = {
+        'start_date': start.isoformat(),
+        'end_date': (start + timedelta(days=2)).isoformat(),
+        'reason': '基准测试',
+    }
+    counter = iter(range(10 ** 9))
+
+    def submit():
+        response = clients[next(counter) % len(clients)].post('/api/request-leave/', payload)
+        assert response.status_code == 201, response.content
+
+    rows = []
+    with mock.patch('leave.views.LeaveSerializer', legacy_serializer_class()):
+        elapsed, rate = timed(submit, requests)
+    rows.append({'path': 'before (create + 2x save)', 'requests': requests, 'seconds': elapsed, 'inserts_per_sec': rate})
+    elapsed, rate = timed(submit, requests)
+    rows.append({'path': 'after (single INSERT)', 'requests': requests, 'seconds': elapsed, 'inserts_per_sec': rate})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请假提交接口写入吞吐量基准')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    setup_django()
+    report('POST /api/request-leave/', run(args.requests), args.output)
+
+
+if __name__ == '__main__':
+    main()
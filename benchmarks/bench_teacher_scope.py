@@ -0,0 +1,64 @@
+# benchmarks/bench_teacher_scope.py
+"""
+教师请假列表的范围过滤：学生 id 子查询（student__in）vs 冗余 Leave.advisor_id 索引过滤。
+
+    python -m benchmarks.bench_teacher_scope --students-per-advisor 500 --requests 200
+"""
+import argparse
+from unittest import mock
+
+from benchmarks.common import auth_client, report, seed_institution, setup_django, timed
+
+
+def legacy_scope_queryset(user, is_admin):
+    """
+    改造前的范围过滤：先取该辅导员的学生 id，再按 student__in 过滤，作为对照组。
+    """
+    from leave.models import Leave, StudentProfile
+
+    if is_admin:
+        return Leave.objects.all()
+    students = StudentProfile.objects.filter(advisor_id=user.id).values_list('user', flat=True)
+    return Leave.objects.filter(student__in=students)
+
+
+def run(students_per_advisor, leaves_per_student, requests):
+    advisors = 4
+    classes = advisors * 10
+    data = seed_institution(classes=classes, students_per_class=students_per_advisor // 10,
+                            advisors=advisors, leaves_per_student=leaves_per_student)
+    client = auth_client(data['teachers'][0])
+
+    rows = []
+    for label, params in (('page 1', {}), ('status=0', {'status': 0}),
+                          ('cursor, no count', {'pagination': 'cursor', 'skip_count': 1})):
+        def fetch():
+            response = client.get('/api/admin/leaves/', params)
+            assert response.status_code == 200, response.content
+
+        with mock.patch('leave.queries.admin_scope_queryset', legacy_scope_queryset):
+            elapsed, rate = timed(fetch, requests)
+        rows.append({'query': label, 'scope': 'student__in subquery', 'requests': requests, 'seconds': elapsed,
+                     'requests_per_sec': rate})
+        elapsed, rate = timed(fetch, requests)
+        rows.append({'query': label, 'scope': 'advisor_id index', 'requests': requests, 'seconds': elapsed,
+                     'requests_per_sec': rate})
+    return rows, data['leaves']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='教师请假列表范围过滤基准')
+    parser.add_argument('--students-per-advisor', type=int, default=500)
+    parser.add_argument('--leaves-per-student', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    setup_django()
+    rows, total = run(args.students_per_advisor, args.leaves_per_student, args.requests)
+    report(f'GET /api/admin/leaves/ as tch ({args.students_per_advisor} students, {total} leaves total)',
+           rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
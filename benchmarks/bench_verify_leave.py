@@ -0,0 +1,147 @@
+# benchmarks/bench_verify_leave.py
+"""
+GET /api/leave/verify/<uuid>/ 并发扫码吞吐量：无缓存（改造前的逐次查询 + 懒加载关联）vs 读穿透缓存。
+扫码样本取自 --pool 条“正在外出”的假条：80% 为已批准，10% 为未批准，10% 为不存在的 UUID。
+
+缓存使用 settings 中的真实后端（文件缓存，目录在临时目录下），对比两种配置：
+- shared FileBasedCache：改造前与 default 共用的 Django 文件缓存（MAX_ENTRIES=100000），每次 set 列出整个目录
+- bounded verification cache：当前的 verification 别名（cache_backends.BoundedFileBasedCache）
+两者都先写入 --prefill 个条目，模拟运行一段时间后目录中已有大量条目（含过期的负缓存）。
+
+    python -m benchmarks.bench_verify_leave --scans 2000 --pool 200 --threads 1 4 8 --prefill 10000
+"""
+import argparse
+import logging
+import random
+import uuid as uuid_lib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test.utils import override_settings
+
+from benchmarks.common import report, seed_institution, setup_django, timed
+
+
+def legacy_get_verification(uuid):
+    """
+    复刻改造前的 verify_leave 查询路径（get_object_or_404 + LeaveSerializer 懒加载关联），作为对照组。
+    """
+    from leave.models import Leave
+    from leave.serializers import LeaveSerializer
+    from leave.verification import FOUND, MISSING, UNAPPROVED, VERIFIABLE_STATUSES
+
+    leave = Leave.objects.filter(verification_uuid=uuid).first()
+    if leave is None:
+        return MISSING, None
+    if leave.status not in VERIFIABLE_STATUSES:
+        return UNAPPROVED, None
+    return FOUND, LeaveSerializer(leave).data
+
+
+def scan_sample(size, pool):
+    from leave.models import Leave
+
+    approved = list(Leave.objects.filter(status__in=(1, 3)).values_list('verification_uuid', flat=True)[:pool])
+    pending = list(Leave.objects.exclude(status__in=(1, 3)).values_list('verification_uuid', flat=True)[:pool // 8])
+    unknown = [uuid_lib.uuid4() for _ in range(pool // 8)]
+    rng = random.Random(42)
+    sample = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.8:
+            sample.append(rng.choice(approved))
+        elif roll < 0.9:
+            sample.append(rng.choice(pending))
+        else:
+            sample.append(rng.choice(unknown))
+    return sample
+
+
+def concurrent_scans(sample, threads):
+    """
+    threads 个线程分摊扫码样本，返回 (总耗时秒, 每秒扫码次数)。
+    """
+    from django.db import connection
+    from django.test import Client
+
+    chunks = [sample[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        client = Client()
+        try:
+            for uuid in chunk:
+                response = client.get(f'/api/leave/verify/{uuid}/')
+                assert response.status_code in (200, 400, 404), response.content
+        finally:
+            connection.close()
+
+    def run_all():
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, chunks))
+
+    elapsed, _ = timed(run_all, 1)
+    return elapsed, len(sample) / elapsed
+
+
+def prefill(location, count):
+    """
+    直接写入 count 个已过期的条目（用不淘汰的后端写，避免造数本身按条列目录）。
+    """
+    from leave.cache_backends import PersistentFileBasedCache
+
+    filler = PersistentFileBasedCache(location, {})
+    for i in range(count):
+        filler.set(f'leave:verify:filler-{i}', ('missing', None), 0)
+
+
+def cache_configs():
+    from django.conf import settings
+
+    configured = settings.CACHES[settings.LEAVE_VERIFY_CACHE_ALIAS]
+    shared = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': configured['LOCATION'] + '-shared',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+    return {'shared FileBasedCache': shared, 'bounded verification cache': configured}
+
+
+def run(scans, pool, thread_counts, prefill_count):
+    from django.conf import settings
+    from django.core.cache import caches
+
+    seed_institution(classes=10, students_per_class=30, advisors=5, leaves_per_student=5)
+    sample = scan_sample(scans, pool)
+    configs = cache_configs()
+
+    rows = []
+    for threads in thread_counts:
+        with mock.patch('leave.views.get_verification', legacy_get_verification):
+            elapsed, rate = concurrent_scans(sample, threads)
+        rows.append({'path': 'no cache', 'threads': threads, 'scans': scans, 'seconds': elapsed, 'scans_per_sec': rate})
+        for label, config in configs.items():
+            with override_settings(CACHES={**settings.CACHES, settings.LEAVE_VERIFY_CACHE_ALIAS: config}):
+                caches[settings.LEAVE_VERIFY_CACHE_ALIAS].clear()
+                prefill(config['LOCATION'], prefill_count)
+                elapsed, rate = concurrent_scans(sample, threads)
+            rows.append({'path': f'read-through, {label}', 'threads': threads, 'scans': scans, 'seconds': elapsed,
+                         'scans_per_sec': rate})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='防伪查询接口并发扫码吞吐量基准')
+    parser.add_argument('--scans', type=int, default=2000)
+    parser.add_argument('--pool', type=int, default=200, help='被反复扫码的已批准假条数')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--prefill', type=int, default=10000, help='测量前缓存目录中已有的条目数')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    setup_django(locmem_caches=False)
+    logging.getLogger('django.request').setLevel(logging.ERROR)  # 400 / 404 是预期响应，不逐条打印
+    report('GET /api/leave/verify/<uuid>/', run(args.scans, args.pool, args.threads, args.prefill), args.output)
+
+
+if __name__ == '__main__':
+    main()
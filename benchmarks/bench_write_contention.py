@@ -0,0 +1,158 @@
+# benchmarks/bench_write_contention.py
+"""
+多 worker 写入争用：模拟提交高峰时多个 gunicorn worker 同时提交请假、查看假条与批量审批。
+每个 worker 是一个独立进程、独立数据库连接，共用同一个库文件（或同一个 PostgreSQL 库）。
+
+SQLite 对比两组连接配置：
+- django defaults：回滚日志（DELETE）、synchronous=FULL、延迟事务（读后写的事务升级写锁失败时直接报错）
+- tuned：settings 中的 WAL、busy_timeout、synchronous=NORMAL、IMMEDIATE 事务
+
+    python -m benchmarks.bench_write_contention --workers 3 --ops 300
+    LEAVE_DB_ENGINE=postgresql LEAVE_DB_PASSWORD=leave python -m benchmarks.bench_write_contention
+"""
+import argparse
+import logging
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.common import percentiles, report, seed_institution, setup_django
+
+# 每个 worker 的操作比例：提交请假 / 学生查看假条 / 管理员批量批准
+OPERATION_WEIGHTS = (('submit', 6), ('read', 3), ('batch_approve', 1))
+
+SQLITE_CONFIGS = {
+    'django defaults': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': '', 'transaction_mode': None},
+    'tuned': None,  # 使用 settings 中的配置
+}
+
+
+def apply_sqlite_config(config):
+    """
+    修改连接配置，之后新建的连接（fork 出的 worker 中）按新配置执行 PRAGMA。
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    options = connection.settings_dict.setdefault('OPTIONS', {})
+    if config is None:
+        config = {
+            'journal_mode': settings.LEAVE_SQLITE_JOURNAL_MODE,
+            'synchronous': settings.LEAVE_SQLITE_SYNCHRONOUS,
+            'busy_timeout': settings.LEAVE_SQLITE_BUSY_TIMEOUT,
+            'transaction_mode': settings.LEAVE_SQLITE_TRANSACTION_MODE,
+        }
+    settings.LEAVE_SQLITE_JOURNAL_MODE = config['journal_mode']
+    settings.LEAVE_SQLITE_SYNCHRONOUS = config['synchronous']
+    settings.LEAVE_SQLITE_BUSY_TIMEOUT = config['busy_timeout']
+    options.pop('transaction_mode', None)
+    if config['transaction_mode']:
+        options['transaction_mode'] = config['transaction_mode']
+
+
+def worker(index, ops, student_tokens, admin_token, pending_ids, results):
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    rng = random.Random(index)
+    names = [name for name, weight in OPERATION_WEIGHTS for _ in range(weight)]
+    admin = APIClient()
+    admin.credentials(HTTP_AUTHORIZATION=f'Bearer {admin_token}')
+    students = []
+    for token in student_tokens:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        students.append(client)
+
+    start = timezone.now()
+    payload = {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=2)).isoformat(), 'reason': '高峰提交'}
+
+    latencies, errors = {name: [] for name, _ in OPERATION_WEIGHTS}, {name: 0 for name, _ in OPERATION_WEIGHTS}
+    for _ in range(ops):
+        name = rng.choice(names)
+        began = time.perf_counter()
+        try:
+            if name == 'submit':
+                ok = rng.choice(students).post('/api/request-leave/', payload).status_code == 201
+            elif name == 'read':
+                ok = rng.choice(students).get('/api/view-leave/').status_code == 200
+            else:
+                ids = rng.sample(pending_ids, 5)
+                ok = admin.post('/api/admin/leaves/batch/approve/', {'ids': ids}, format='json').status_code == 200
+        except Exception:  # database is locked 等 OperationalError 计为失败
+            ok = False
+        latencies[name].append((time.perf_counter() - began) * 1000)
+        if not ok:
+            errors[name] += 1
+    results.put((latencies, errors))
+
+
+def run_config(label, workers, ops, student_tokens, admin_token, pending_ids):
+    from django.db import connections
+
+    connections.close_all()  # fork 前关闭连接，每个 worker 自行建立连接
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    chunk = max(1, len(student_tokens) // workers)
+    processes = [
+        ctx.Process(target=worker, args=(i, ops, student_tokens[i * chunk:(i + 1) * chunk] or student_tokens,
+                                         admin_token, pending_ids, results))
+        for i in range(workers)
+    ]
+    began = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - began
+
+    rows = []
+    for name, _ in OPERATION_WEIGHTS:
+        samples = [ms for latencies, _ in collected for ms in latencies[name]]
+        failed = sum(errors[name] for _, errors in collected)
+        rows.append({'config': label, 'operation': name, 'count': len(samples), 'errors': failed,
+                     **percentiles(samples)})
+    total = workers * ops
+    failed = sum(row['errors'] for row in rows)
+    rows.append({'config': label, 'operation': 'all', 'count': total, 'errors': failed,
+                 'seconds': elapsed, 'ok_ops_per_sec': (total - failed) / elapsed})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多 worker 写入争用基准')
+    parser.add_argument('--workers', type=int, default=3, help='并发进程数（start.sh 默认 3 个 gunicorn worker）')
+    parser.add_argument('--ops', type=int, default=300, help='每个 worker 的操作次数')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)  # database is locked 计入 errors，不逐条打印
+    from django.db import connection
+    from leave.authentication import issue_tokens
+    from leave.models import Leave
+
+    data = seed_institution(classes=10, students_per_class=20, advisors=5, leaves_per_student=5)
+    student_tokens = [str(issue_tokens(student).access_token) for student in data['students']]
+    admin_token = str(issue_tokens(data['admin']).access_token)
+    pending_ids = list(Leave.objects.filter(status__in=(0, 4, 5)).values_list('id', flat=True))
+
+    if connection.vendor == 'sqlite':
+        configs = list(SQLITE_CONFIGS.items())
+    else:
+        configs = [(connection.vendor, None)]
+
+    rows = []
+    for label, config in configs:
+        if connection.vendor == 'sqlite':
+            apply_sqlite_config(config)
+        # 每组配置使用同一批待审批假条，上一组批准过的重新置为待批准
+        Leave.objects.filter(id__in=pending_ids).update(status=0)
+        rows.extend(run_config(label, args.workers, args.ops, student_tokens, admin_token, pending_ids))
+    report(f'{args.workers} workers x {args.ops} ops ({connection.vendor})', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
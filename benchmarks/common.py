@@ -0,0 +1,165 @@
+# benchmarks/common.py
+"""
+基准测试公共工具：
+在临时 SQLite 库上建表、批量生成模拟学院数据、计时与输出结果。
+所有脚本都在仓库根目录下以 `python -m benchmarks.<脚本名>` 运行，不会触碰 db.sqlite3。
+"""
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(db_path=None, fast_hashing=True, locmem_caches=True):
+    """
+    初始化 Django 并创建一个独立的基准测试库，返回库文件路径。
+    fast_hashing=True 时造数使用 MD5 哈希，避免 PBKDF2 开销干扰被测路径。
+    locmem_caches=True 时所有缓存换成进程内缓存；False 时保留 settings 中的后端（生产配置），
+    缓存目录放到临时目录，不触碰仓库下的 cache/。
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'leave_management.settings')
+    if not locmem_caches:
+        cache_dir = tempfile.mkdtemp(prefix='leave-bench-cache-')
+        atexit.register(shutil.rmtree, cache_dir, True)
+        os.environ['LEAVE_CACHE_DIR'] = cache_dir
+
+    import django
+    from django.conf import settings
+    django.setup()
+
+    if fast_hashing:
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    if locmem_caches:
+        settings.CACHES = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+            for alias in settings.CACHES
+        }
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    if connection.vendor == 'sqlite':
+        if db_path is None:
+            tmp_dir = tempfile.mkdtemp(prefix='leave-bench-')
+            atexit.register(shutil.rmtree, tmp_dir, True)
+            db_path = os.path.join(tmp_dir, 'bench.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = db_path
+    # 其他后端（LEAVE_DB_ENGINE=postgresql）创建 test_<库名> 测试库
+    db_path = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    if connection.vendor != 'sqlite':
+        atexit.register(connection.creation.destroy_test_db, db_path, verbosity=0)
+    return db_path
+
+
+def seed_institution(classes=10, students_per_class=30, advisors=5, leaves_per_student=5):
+    """
+    批量生成班级、辅导员、学生（含组与档案）和请假条，返回各类对象列表。
+    使用 bulk_create，不触发逐行信号。
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import Group, User
+    from django.utils import timezone
+    from leave.models import Class, Leave, StudentProfile, TeacherProfile
+
+    groups = {name: Group.objects.get_or_create(name=name)[0] for name in ('stu', 'tch', 'admin', 'mas')}
+    membership = User.groups.through
+    encoded = make_password('123456')
+
+    def make_users(prefix, count, group, last_name):
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{i:05d}', password=encoded, last_name=f'{last_name}{i}',
+                 email=f'{prefix}{i:05d}@example.com')
+            for i in range(count)
+        ])
+        membership.objects.bulk_create([membership(user_id=u.id, group_id=group.id) for u in users])
+        return users
+
+    admin = make_users('a', 1, groups['admin'], '管理员')[0]
+    teachers = make_users('t', advisors, groups['tch'], '辅导员')
+    TeacherProfile.objects.bulk_create([TeacherProfile(user=t) for t in teachers])
+
+    class_objs = Class.objects.bulk_create([
+        Class(name=f'班级{i:03d}', teacher=teachers[i % len(teachers)]) for i in range(classes)
+    ])
+    students = make_users('s', classes * students_per_class, groups['stu'], '学生')
+    profiles = StudentProfile.objects.bulk_create([
+        StudentProfile(user=s, assigned_class=class_objs[i // students_per_class],
+                       advisor=teachers[(i // students_per_class) % len(teachers)])
+        for i, s in enumerate(students)
+    ])
+
+    now = timezone.now()
+    leaves = []
+    for i, profile in enumerate(profiles):
+        for j in range(leaves_per_student):
+            start = now - timedelta(days=(i * 7 + j * 3) % 365, hours=j)
+            leaves.append(Leave(
+                student_id=profile.user_id, advisor_id=profile.advisor_id,
+                start_date=start, end_date=start + timedelta(hours=6 + (i + j) % 5 * 20),
+                reason=f'理由{j}', status=(i + j) % 6,
+            ))
+    Leave.objects.bulk_create(leaves, batch_size=2000)
+
+    return {
+        'admin': admin,
+        'teachers': teachers,
+        'classes': class_objs,
+        'students': students,
+        'leaves': Leave.objects.count(),
+    }
+
+
+def auth_client(user):
+    """
+    带 JWT 令牌（含声明）的 APIClient。
+    """
+    from rest_framework.test import APIClient
+    from leave.authentication import issue_tokens
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+    return client
+
+
+def timed(fn, repeat):
+    """
+    执行 fn() repeat 次，返回 (总耗时秒, 每秒次数)。
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    return elapsed, repeat / elapsed if elapsed else float('inf')
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """
+    返回 {'p50': ..., 'p95': ..., 'p99': ...}（最近秩法），样本为空时返回 0。
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{point}': 0.0 for point in points}
+    return {
+        f'p{point}': ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))]
+        for point in points
+    }
+
+
+def report(title, rows, output=None):
+    """
+    打印结果表格，并可选写入 JSON 文件。
+    """
+    print(f'\n== {title} ==')
+    for row in rows:
+        print('  ' + '  '.join(f'{k}={v:.1f}' if isinstance(v, float) else f'{k}={v}' for k, v in row.items()))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'title': title, 'results': rows}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,190 @@
+# benchmarks/loadtest_async.py
+"""
+只读接口压测：同步部署（gunicorn 同步 worker，WSGI）vs 异步部署（gunicorn + uvicorn worker，ASGI + LEAVE_ASYNC_VIEWS=1）。
+两种部署使用相同数量的 worker 进程（内存相当），并报告压测结束时服务进程的总 RSS。
+
+请求组合：防伪查询、学生请假列表、用户信息、数据看板，以及未命中缓存的二维码（每次新的 UUID，需要现场生成图片）。
+需要安装 gunicorn 与 uvicorn：
+
+    python -m benchmarks.loadtest_async --workers 3 --concurrency 32 --requests 2000
+"""
+import argparse
+import http.client
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid as uuid_lib
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import ROOT, percentiles, report, seed_institution, setup_django
+
+# (名称, 权重)
+ROUTE_WEIGHTS = (('verify', 4), ('student_leaves', 3), ('user_info', 1), ('dashboard', 1), ('qrcode_miss', 1))
+
+DEPLOYMENTS = {
+    'sync (gunicorn, WSGI)': (['-m', 'gunicorn', 'leave_management.wsgi:application'], {}),
+    'async (gunicorn + uvicorn, ASGI)': (
+        ['-m', 'gunicorn', '-k', 'uvicorn.workers.UvicornWorker', 'leave_management.asgi:application'],
+        {'LEAVE_ASYNC_VIEWS': '1'},
+    ),
+}
+
+
+def process_tree_rss_kb(pid):
+    """
+    pid 及其所有子进程的 RSS 之和（KB），读取 /proc。
+    """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', f'/api/leave/verify/{uuid_lib.uuid4()}/')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'服务在 {timeout} 秒内未启动')
+
+
+def start_server(command, extra_env, workers, port, db_path, cache_dir):
+    env = dict(os.environ, LEAVE_DB_NAME=db_path, LEAVE_CACHE_DIR=cache_dir, **extra_env)
+    return subprocess.Popen(
+        [sys.executable, *command, '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+
+
+def build_requests(total, fixtures, seed=42):
+    """
+    预先生成 (路由名, 路径, 请求头) 列表，两种部署使用完全相同的请求序列。
+    """
+    rng = random.Random(seed)
+    names = [name for name, weight in ROUTE_WEIGHTS for _ in range(weight)]
+    requests = []
+    for _ in range(total):
+        name = rng.choice(names)
+        token = rng.choice(fixtures['student_tokens'])
+        auth = {'Authorization': f'Bearer {token}'}
+        if name == 'verify':
+            requests.append((name, f'/api/leave/verify/{rng.choice(fixtures["approved_uuids"])}/', {}))
+        elif name == 'student_leaves':
+            requests.append((name, '/api/view-leave/', auth))
+        elif name == 'user_info':
+            requests.append((name, '/api/user-info/', auth))
+        elif name == 'dashboard':
+            requests.append((name, '/api/statistics/dashboard/', auth))
+        else:
+            requests.append((name, f'/api/view-leave/qrcode/{uuid_lib.uuid4()}/', auth))
+    return requests
+
+
+def drive(port, requests, concurrency):
+    """
+    concurrency 个客户端线程（各自保持长连接）发送请求，返回 (总耗时, {路由: [毫秒]}, 失败数)。
+    """
+    local = threading.local()
+    latencies = {name: [] for name, _ in ROUTE_WEIGHTS}
+    failures = []
+
+    def send(item):
+        name, path, headers = item
+        if not hasattr(local, 'conn'):
+            local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        began = time.perf_counter()
+        try:
+            local.conn.request('GET', path, headers=headers)
+            response = local.conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            local.conn.close()
+            del local.conn
+            ok = False
+        latencies[name].append((time.perf_counter() - began) * 1000)
+        if not ok:
+            failures.append(name)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, requests))
+    return time.perf_counter() - began, latencies, len(failures)
+
+
+def prepare(db_path):
+    from leave.authentication import issue_tokens
+    from leave.models import Leave
+
+    data = seed_institution(classes=10, students_per_class=30, advisors=5, leaves_per_student=10)
+    return {
+        'student_tokens': [str(issue_tokens(student).access_token) for student in data['students'][:200]],
+        'approved_uuids': [str(u) for u in Leave.objects.filter(status__in=(1, 3))
+                           .values_list('verification_uuid', flat=True)[:500]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='同步 vs 异步部署的只读接口压测')
+    parser.add_argument('--workers', type=int, default=3, help='两种部署的 worker 进程数（start.sh 默认 3）')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发客户端连接数')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=18000)
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    fixtures = prepare(db_path)
+    from django.db import connections
+    connections.close_all()
+    requests = build_requests(args.requests, fixtures)
+    warmup = build_requests(args.workers * 20, fixtures, seed=7)
+
+    rows = []
+    for label, (command, extra_env) in DEPLOYMENTS.items():
+        cache_dir = tempfile.mkdtemp(prefix='leave-bench-cache-', dir=os.path.dirname(db_path))
+        server = start_server(command, extra_env, args.workers, args.port, db_path, cache_dir)
+        try:
+            wait_for_server(args.port)
+            drive(args.port, warmup, args.workers)
+            elapsed, latencies, failed = drive(args.port, requests, args.concurrency)
+            rss_mb = process_tree_rss_kb(server.pid) / 1024
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+        for name, _ in ROUTE_WEIGHTS:
+            rows.append({'deployment': label, 'route': name, 'count': len(latencies[name]),
+                         **percentiles(latencies[name])})
+        samples = [ms for values in latencies.values() for ms in values]
+        rows.append({'deployment': label, 'route': 'all', 'count': len(samples), 'failed': failed,
+                     'requests_per_sec': len(samples) / elapsed, **percentiles(samples), 'rss_mb': rss_mb})
+    report(f'{args.workers} workers, {args.concurrency} concurrent clients, {args.requests} requests', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
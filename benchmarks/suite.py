@@ -0,0 +1,241 @@
+# benchmarks/suite.py
+"""
+请假 API 基准套件：生成模拟学院数据后，用并发客户端调用真实路由（leave/urls.py），
+逐个场景统计吞吐量、p50/p95/p99 延迟与每个请求的 SQL 条数，结果写成 JSON，便于在提交之间比较。
+
+    python -m benchmarks.suite --classes 20 --students-per-class 30 --advisors 5 --leaves-per-student 10 \\
+        --clients 4 --requests 400 --output bench.json
+    python -m benchmarks.suite --compare bench.json      # 与之前的结果比较，出现退化时退出码为 1
+    python -m benchmarks.suite --scenarios verify admin_list
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from benchmarks.common import ROOT, percentiles, seed_institution, setup_django
+
+# 比较时视为退化的阈值：延迟 / 吞吐量变化超过 tolerance，或每请求 SQL 条数平均多出半条以上
+# （缓存命中率在并发下略有波动，不要求完全相同）
+COMPARED_METRICS = (('p95', 'lower'), ('requests_per_sec', 'higher'), ('queries_per_request', 'lower'))
+
+
+class Scenario:
+    """
+    一个场景：按序号生成请求 (method, path, data, token)，并给出期望的状态码。
+    """
+
+    def __init__(self, name, route, make_request, expected_status=(200,)):
+        self.name = name
+        self.route = route
+        self.make_request = make_request
+        self.expected_status = expected_status
+
+
+def build_scenarios(fixtures, total):
+    from django.utils import timezone
+
+    rng = random.Random(42)
+    students, teachers = fixtures['student_tokens'], fixtures['teacher_tokens']
+    admin = fixtures['admin_token']
+    start = timezone.now()
+    payload = {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=2)).isoformat(), 'reason': '基准测试'}
+    pending = rng.sample(fixtures['pending_ids'], min(total, len(fixtures['pending_ids'])))
+    approved = fixtures['approved_uuids']
+
+    scenarios = [
+        Scenario('verify', 'GET /api/leave/verify/<uuid>/',
+                 lambda i: ('get', f'/api/leave/verify/{rng.choice(approved)}/', None, None)),
+        Scenario('student_list', 'GET /api/view-leave/',
+                 lambda i: ('get', '/api/view-leave/', None, rng.choice(students))),
+        Scenario('admin_list', 'GET /api/admin/leaves/ (tch)',
+                 lambda i: ('get', '/api/admin/leaves/', {'page_size': 20}, rng.choice(teachers))),
+        Scenario('statistics', 'GET /api/statistics/dashboard/',
+                 lambda i: ('get', '/api/statistics/dashboard/', None, admin)),
+        Scenario('submit', 'POST /api/request-leave/',
+                 lambda i: ('post', '/api/request-leave/', payload, rng.choice(students)), expected_status=(201,)),
+        # 待审批假条不够时重复的 id 会得到 400（状态已变），同样计入延迟
+        Scenario('approve', 'PATCH /api/admin/approve-leave/<id>/',
+                 lambda i: ('patch', f'/api/admin/approve-leave/{pending[i % len(pending)]}/', None, admin),
+                 expected_status=(200, 400)),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+def run_scenario(scenario, total, clients):
+    """
+    clients 个线程并发发送 total 个请求，每个线程使用自己的数据库连接与 Client。
+    """
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    requests = [scenario.make_request(i) for i in range(total)]
+    chunks = [requests[i::clients] for i in range(clients)]
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = Client()
+        local_latencies, local_queries, local_errors = [], [], 0
+        try:
+            for method, path, data, token in chunk:
+                extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+                if method == 'get':
+                    call = lambda: client.get(path, data, **extra)
+                else:
+                    call = lambda: getattr(client, method)(path, json.dumps(data or {}),
+                                                           content_type='application/json', **extra)
+                began = time.perf_counter()
+                with CaptureQueriesContext(connection) as ctx:
+                    response = call()
+                local_latencies.append((time.perf_counter() - began) * 1000)
+                local_queries.append(len(ctx.captured_queries))
+                if response.status_code not in scenario.expected_status:
+                    local_errors += 1
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            queries.extend(local_queries)
+            errors.append(local_errors)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, chunks))
+    elapsed = time.perf_counter() - began
+
+    return {
+        'scenario': scenario.name,
+        'route': scenario.route,
+        'requests': total,
+        'clients': clients,
+        'errors': sum(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(total / elapsed, 1),
+        **{key: round(value, 2) for key, value in percentiles(latencies).items()},
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+def prepare(args):
+    from leave.authentication import issue_tokens
+    from leave.models import Leave
+    from leave.statistics import build_dashboard, rebuild_summaries
+
+    data = seed_institution(classes=args.classes, students_per_class=args.students_per_class,
+                            advisors=args.advisors, leaves_per_student=args.leaves_per_student)
+    # bulk_create 不触发信号，汇总表需按造好的数据重建，否则 statistics 场景计时的是空看板
+    rebuild_summaries()
+    dashboard = build_dashboard('summary')
+    assert sum(dashboard['trend_data']['real_values']) == data['leaves'], '统计汇总表与造数不一致'
+    return {
+        'leaves': data['leaves'],
+        'admin_token': str(issue_tokens(data['admin']).access_token),
+        'teacher_tokens': [str(issue_tokens(t).access_token) for t in data['teachers']],
+        'student_tokens': [str(issue_tokens(s).access_token) for s in data['students'][:500]],
+        'pending_ids': list(Leave.objects.filter(status__in=(0, 4, 5)).values_list('id', flat=True)),
+        'approved_uuids': [str(u) for u in Leave.objects.filter(status__in=(1, 3))
+                           .values_list('verification_uuid', flat=True)[:500]],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current, tolerance):
+    """
+    打印与之前结果的对比，返回退化项列表。
+    """
+    before = {row['scenario']: row for row in previous['results']}
+    regressions = []
+    print(f"\n== 对比 {previous['meta'].get('git_revision')} -> {current['meta'].get('git_revision')} ==")
+    for row in current['results']:
+        old = before.get(row['scenario'])
+        if old is None:
+            continue
+        parts = []
+        for metric, better in COMPARED_METRICS:
+            old_value, new_value = old[metric], row[metric]
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            worse = change > tolerance if better == 'lower' else change < -tolerance
+            if metric == 'queries_per_request':
+                worse = new_value - old_value >= 0.5
+            parts.append(f'{metric} {old_value} -> {new_value} ({change:+.0%}){" !" if worse else ""}')
+            if worse:
+                regressions.append(f"{row['scenario']}: {metric} {old_value} -> {new_value}")
+        print(f"  {row['scenario']}: " + '  '.join(parts))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请假 API 基准套件')
+    parser.add_argument('--classes', type=int, default=20)
+    parser.add_argument('--students-per-class', type=int, default=30)
+    parser.add_argument('--advisors', type=int, default=5)
+    parser.add_argument('--leaves-per-student', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=4, help='并发客户端线程数')
+    parser.add_argument('--requests', type=int, default=400, help='每个场景的请求数')
+    parser.add_argument('--scenarios', nargs='+', help='只运行指定场景（默认全部）')
+    parser.add_argument('--output', help='结果 JSON 输出路径')
+    parser.add_argument('--compare', help='与之前输出的 JSON 比较')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='延迟 / 吞吐量允许的相对变化（单核机器上抖动较大）')
+    args = parser.parse_args()
+
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)  # 失败按 errors 计数，不逐条打印
+    import django
+
+    fixtures = prepare(args)
+    scenarios = build_scenarios(fixtures, args.requests)
+    unknown = set(args.scenarios or ()) - set(scenarios)
+    if unknown:
+        parser.error(f'未知场景: {", ".join(sorted(unknown))}（可选：{", ".join(scenarios)}）')
+
+    results = []
+    for name in args.scenarios or scenarios:
+        results.append(run_scenario(scenarios[name], args.requests, args.clients))
+        row = results[-1]
+        print(f"  {name:<13} {row['requests_per_sec']:>8.1f} req/s  p50={row['p50']:.1f}ms  p95={row['p95']:.1f}ms  "
+              f"p99={row['p99']:.1f}ms  queries/req={row['queries_per_request']}  errors={row['errors']}")
+
+    output = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': {'classes': args.classes, 'students_per_class': args.students_per_class,
+                        'advisors': args.advisors, 'leaves_per_student': args.leaves_per_student,
+                        'leaves': fixtures['leaves']},
+            'clients': args.clients,
+            'requests_per_scenario': args.requests,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), output, args.tolerance)
+        if regressions:
+            print('\n退化：\n  ' + '\n  '.join(regressions))
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ from django.contrib.auth.models import User, Group
 from django.db import IntegrityError
 from django.core.exceptions import ObjectDoesNotExist
 from leave.models import Class, StudentProfile, TeacherProfile  # 确保这个模型的路径是正确的
+from leave.importing import DEFAULT_CHUNK_SIZE, apply_advisor_updates, bulk_import_students, plan_advisor_updates
+from leave.passwords import HASH_MODES, make_password_hasher
 
 def import_teachers_from_xlsx(xlsx_file):
     # 读取教师 XLSX 文件
@@ -118,70 +120,94 @@ def import_students_from_xlsx(xlsx_file, classes_xlsx='classes.xlsx'):
         except IntegrityError:
             print(f"用户名已存在，跳过: {username}")
 
-def update_student_advisors_from_xlsx(xlsx_file):
+def read_student_rows(xlsx_file):
+    """
+    读取学生 XLSX，返回批量导入引擎使用的字典列表（行号按 Excel 计，表头为第 1 行）。
+    """
+    df = pd.read_excel(xlsx_file, dtype=str).fillna('')
+    return [
+        {
+            'row': index + 2,
+            'username': str(row['学号']).strip(),
+            'last_name': str(row['姓名']).strip(),
+            'email': str(row.get('电子信箱', '')).strip(),
+            'class_name': str(row.get('班级', '')).strip(),
+        }
+        for index, row in df.iterrows()
+    ]
+
+def bulk_import_students_from_xlsx(xlsx_file, classes_xlsx='classes.xlsx', chunk_size=DEFAULT_CHUNK_SIZE,
+                                   errors_file='import_errors.csv', hash_mode='unique', workers=None):
+    """
+    批量模式导入学生：分块 bulk_create，逐行错误写入 errors_file。
+    密码哈希按 hash_mode 在 workers 个进程中并行计算，或相同密码只算一次。
+    """
+    # 先导入班级
+    import_classes_from_xlsx(classes_xlsx)
+    result = bulk_import_students(read_student_rows(xlsx_file), password='123456', chunk_size=chunk_size,
+                                  hasher=make_password_hasher(hash_mode, workers))
+    if result.errors:
+        result.write_errors(errors_file)
+        print(f"有 {len(result.errors)} 行未导入，详见 {errors_file}")
+    print(f"批量导入完成：成功 {len(result.created)} 个，失败 {len(result.errors)} 个。")
+    return result
+
+def update_student_advisors_from_xlsx(xlsx_file, dry_run=False, report_file=None):
     """
     根据新的 Excel 文件更新学生的辅导员信息。
     假设 Excel 文件包含以下列：
     - 学号：学生的用户名或唯一标识符
     - 带班辅导员：辅导员的姓名（存储在 User 的 last_name 字段中）
+    学生、辅导员各用一次查询解析，同名辅导员报错跳过，变更按批 bulk_update。
+    dry_run=True 时只输出将要发生的变更，不写库；report_file 为差异报告 CSV 路径。
     """
-    df = pd.read_excel(xlsx_file)
-
-    updated_count = 0
-    skipped_count = 0
-
-    for index, row in df.iterrows():
-        student_username = str(row['学号']).strip()
-        advisor_last_name = str(row['带班辅导员']).strip()
-
-        try:
-            # 获取学生的 User 对象
-            student_user = User.objects.get(username=student_username, groups__name='stu')
-        except User.DoesNotExist:
-            print(f"学生用户不存在或不属于 'stu' 组，跳过: {student_username}")
-            skipped_count += 1
-            continue
-
-        try:
-            # 获取辅导员的 User 对象
-            advisor_user = User.objects.get(last_name=advisor_last_name, groups__name='tch')
-        except User.DoesNotExist:
-            print(f"辅导员 '{advisor_last_name}' 不存在或不属于 'tch' 组，无法关联学生: {student_username}")
-            skipped_count += 1
-            continue
-
-        try:
-            # 获取学生的 StudentProfile
-            student_profile = student_user.studentprofile
-            # 获取辅导员的 TeacherProfile
-            teacher_profile = advisor_user.teacherprofile
-
-            # 更新辅导员
-            student_profile.advisor = advisor_user
-            student_profile.save()
-
-            print(f"成功为学生 {student_username} 关联辅导员 {advisor_last_name}")
-            updated_count += 1
-        except Exception as e:
-            print(f"更新学生 {student_username} 的辅导员时出错: {e}")
-            skipped_count += 1
-
-    print(f"更新完成：成功 {updated_count} 个，跳过 {skipped_count} 个。")
+    df = pd.read_excel(xlsx_file, dtype=str).fillna('')
+    rows = [
+        {'row': index + 2, 'username': str(row['学号']).strip(), 'advisor_last_name': str(row['带班辅导员']).strip()}
+        for index, row in df.iterrows()
+    ]
+    plan = plan_advisor_updates(rows)
+
+    for row, username, old_name, new_name in plan.changes:
+        print(f"学生 {username}: {old_name or '（无）'} -> {new_name}")
+    for row, username, reason in plan.errors:
+        print(f"第 {row} 行 {username}: {reason}，跳过")
+    if report_file:
+        plan.write_report(report_file)
+        print(f"差异报告已写入 {report_file}")
+
+    if dry_run:
+        print(f"试运行：将更新 {len(plan.changes)} 个，无需变更 {len(plan.unchanged)} 个，跳过 {len(plan.errors)} 个。")
+        return plan
+    apply_advisor_updates(plan)
+    print(f"更新完成：成功 {len(plan.changes)} 个，无需变更 {len(plan.unchanged)} 个，跳过 {len(plan.errors)} 个。")
+    return plan
 
 def main():
     parser = argparse.ArgumentParser(description="导入教师、学生、班级数据或更新辅导员信息到 Django 数据库")
     parser.add_argument('type', help='导入类型（stu、tch、cls 或 update_advisors）')
     parser.add_argument('filename', help='Excel 文件的路径')
+    parser.add_argument('--bulk', action='store_true', help='学生批量导入模式（分块 bulk_create）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='批量模式每个事务写入的学生数')
+    parser.add_argument('--errors-file', default='import_errors.csv', help='批量模式逐行错误汇总文件')
+    parser.add_argument('--hash-mode', choices=HASH_MODES, default='unique',
+                        help='批量模式密码哈希：unique 每人独立加盐（并行计算）/ shared 默认密码只算一次')
+    parser.add_argument('--workers', type=int, default=None, help='并行哈希的进程数，默认 CPU 核数')
+    parser.add_argument('--dry-run', action='store_true', help='update_advisors 只输出将要发生的变更，不写库')
+    parser.add_argument('--report', help='update_advisors 差异报告 CSV 路径')
     args = parser.parse_args()
 
     if args.type == 'tch':
         import_teachers_from_xlsx(args.filename)
+    elif args.type == 'stu' and args.bulk:
+        bulk_import_students_from_xlsx(args.filename, chunk_size=args.chunk_size, errors_file=args.errors_file,
+                                       hash_mode=args.hash_mode, workers=args.workers)
     elif args.type == 'stu':
         import_students_from_xlsx(args.filename)
     elif args.type == 'cls':
         import_classes_from_xlsx(args.filename)
     elif args.type == 'update_advisors':
-        update_student_advisors_from_xlsx(args.filename)
+        update_student_advisors_from_xlsx(args.filename, dry_run=args.dry_run, report_file=args.report)
     else:
         print("错误：未知的用户类型。请使用 'stu'、'tch'、'cls' 或 'update_advisors'。")
 
@@ -0,0 +1,43 @@
+# leave/advisors.py
+"""
+Leave.advisor 与学生档案辅导员的一致性：
+教师的请假列表按 Leave.advisor_id 过滤（见 queries.admin_scope_queryset），
+所以学生换辅导员后，其全部假条的 advisor 要同步到新辅导员，与原先“看当前学生的全部假条”一致。
+
+- 单个档案保存时由 signals 同步
+- bulk_update 等绕过信号的批量修改后调用 sync_leave_advisors
+- reconcile_leave_advisors 命令全量校正
+"""
+from django.db import transaction
+
+from .models import Leave, StudentProfile
+
+ID_BATCH_SIZE = 500  # 控制 IN 参数个数，避开 SQLite 参数上限
+
+
+def sync_leave_advisors(student_ids=None):
+    """
+    把假条的 advisor 改成学生档案当前的辅导员，返回 (修正的假条数, 有假条被修正的学生 id 集合)。
+    student_ids 为 None 时检查全部学生；按辅导员分组，先查出需要修正的学生，再每组一条 UPDATE。
+    """
+    profiles = StudentProfile.objects.all()
+    if student_ids is not None:
+        profiles = profiles.filter(user_id__in=list(student_ids))
+    students_by_advisor = {}
+    for user_id, advisor_id in profiles.values_list('user_id', 'advisor_id').iterator():
+        students_by_advisor.setdefault(advisor_id, []).append(user_id)
+
+    repaired, affected = 0, set()
+    with transaction.atomic():
+        for advisor_id, ids in students_by_advisor.items():
+            for start in range(0, len(ids), ID_BATCH_SIZE):
+                leaves = Leave.objects.filter(student_id__in=ids[start:start + ID_BATCH_SIZE])
+                if advisor_id is None:
+                    leaves = leaves.filter(advisor_id__isnull=False)
+                else:
+                    leaves = leaves.exclude(advisor_id=advisor_id)
+                stale = set(leaves.values_list('student_id', flat=True).distinct())
+                if stale:
+                    repaired += leaves.filter(student_id__in=stale).update(advisor_id=advisor_id)
+                    affected |= stale
+    return repaired, affected
@@ -9,4 +9,10 @@ class LeaveConfig(AppConfig):
     def ready(self):
         import leave.signals  # 导入信号处理器
 
+        from django.db.backends.signals import connection_created
+        from .db import configure_sqlite
+        from .metrics import install_query_recorder
+        connection_created.connect(configure_sqlite, dispatch_uid='leave.db.configure_sqlite')
+        connection_created.connect(install_query_recorder, dispatch_uid='leave.metrics.install_query_recorder')
+
 
@@ -0,0 +1,218 @@
+# leave/authentication.py
+"""
+基于令牌声明的无状态 JWT 认证：
+登录时把 user_id / username / last_name / groups 写进令牌，认证时直接用声明
+构造轻量用户对象，不再每个请求查询一次 auth_user。
+只有确实需要完整 User 模型的地方（改密码、读邮箱等）才会按需查询数据库。
+
+吊销检查（settings.LEAVE_JWT_REVOCATION_CHECK）：
+- 'none'    ：只信任令牌签名与有效期。改密码、组变更后旧令牌在过期前仍可使用；
+               停用、删除的用户在 access 令牌过期前仍可访问（刷新时检查用户是否存在且未停用）
+- 'version' ：比对缓存中记录的吊销时间，早于该时间登录的令牌一律失效（默认）。
+               记录存放在专用的 revocation 缓存别名中，该别名从不淘汰（cache_backends.PersistentFileBasedCache）
+- 'db'      ：与 simplejwt 默认行为相同，每个请求加载 User 行
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+
+from .roles import get_group_names
+
+# 登录时间声明：刷新出的 access 令牌也会带上（simplejwt 不复制 iat）
+AUTH_TIME_CLAIM = 'auth_time'
+CLAIM_KEYS = ('username', 'last_name', 'groups', AUTH_TIME_CLAIM)
+
+
+def get_revocation_mode():
+    return getattr(settings, 'LEAVE_JWT_REVOCATION_CHECK', 'version')
+
+
+def _revocation_cache():
+    return caches[getattr(settings, 'LEAVE_JWT_REVOCATION_CACHE', 'revocation')]
+
+
+def _revocation_key(user_id):
+    return f'leave:jwt-revoked-before:{user_id}'
+
+
+def revoke_user_tokens(*user_ids):
+    """
+    使这些用户此前签发的所有令牌失效（改密码、重置密码、删除、停用、组变更时调用）。
+    记录保留到刷新令牌过期为止，之后旧令牌本身已过期。
+    """
+    if not user_ids:
+        return
+    lifetime = settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']
+    now = time.time()
+    _revocation_cache().set_many(
+        {_revocation_key(user_id): now for user_id in user_ids}, int(lifetime.total_seconds())
+    )
+
+
+def is_token_revoked(token):
+    if get_revocation_mode() != 'version':
+        return False
+    revoked_before = _revocation_cache().get(_revocation_key(token[api_settings.USER_ID_CLAIM]))
+    return revoked_before is not None and token.get(AUTH_TIME_CLAIM, 0) < revoked_before
+
+
+async def ais_token_revoked(token):
+    if get_revocation_mode() != 'version':
+        return False
+    revoked_before = await _revocation_cache().aget(_revocation_key(token[api_settings.USER_ID_CLAIM]))
+    return revoked_before is not None and token.get(AUTH_TIME_CLAIM, 0) < revoked_before
+
+
+def set_user_claims(token, user):
+    """
+    写入用户名、姓名与组名声明（登录与刷新时都从数据库读取）。
+    """
+    token['username'] = user.username
+    token['last_name'] = user.last_name
+    token['groups'] = list(get_group_names(user))
+
+
+def issue_tokens(user):
+    """
+    为用户签发带声明的 refresh 令牌（其 access_token 也带相同声明）。
+    """
+    return LeaveTokenObtainPairSerializer.get_token(user)
+
+
+class LeaveTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    登录接口：在令牌中附加用户名、姓名与组名声明。
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        set_user_claims(token, user)
+        token[AUTH_TIME_CLAIM] = time.time()
+        return token
+
+
+class LeaveTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    刷新接口：已吊销的 refresh 令牌不能再换取新的 access 令牌。
+    姓名与组名声明从数据库重新读取，不沿用 refresh 令牌里的旧值：教师改名后，
+    add_student 的辅导员比对与审批记录的 approver 在下一次刷新后即使用新姓名。
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_token_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        set_user_claims(refresh, user)
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # 未安装 token_blacklist
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class TokenBackedUser(TokenUser):
+    """
+    由令牌声明构造的用户对象。
+    声明之外的属性（email、studentprofile、students 等）首次访问时加载完整 User 并委托。
+    """
+
+    def __init__(self, token):
+        super().__init__(token)
+        # roles.get_group_names 直接使用令牌里的组名
+        self._leave_group_names = tuple(token.get('groups', ()))
+
+    @property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @property
+    def is_active(self):
+        # 停用用户的令牌由吊销检查拒绝（'none' 模式下不检查，见模块说明）
+        return True
+
+    @cached_property
+    def db_user(self):
+        try:
+            return User.objects.get(pk=self.pk)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.db_user, attr)
+
+    def save(self, *args, **kwargs):
+        return self.db_user.save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.db_user.delete(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        return self.db_user.set_password(raw_password)
+
+    def check_password(self, raw_password):
+        return self.db_user.check_password(raw_password)
+
+
+def get_db_user(user):
+    """
+    需要真正的 User 模型实例时（如作为外键赋值）使用。
+    """
+    return user.db_user if isinstance(user, TokenBackedUser) else user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    优先使用令牌声明构造用户；旧令牌（无声明）或 'db' 模式回退到数据库。
+    """
+
+    def get_user(self, validated_token):
+        if get_revocation_mode() == 'db' or any(key not in validated_token for key in CLAIM_KEYS):
+            return super().get_user(validated_token)
+        if is_token_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return TokenBackedUser(validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        异步视图（Django HttpRequest）使用的认证，返回值与 authenticate 相同。
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if get_revocation_mode() == 'db' or any(key not in validated_token for key in CLAIM_KEYS):
+            return await sync_to_async(super().get_user)(validated_token)
+        if await ais_token_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return TokenBackedUser(validated_token)
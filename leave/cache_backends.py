@@ -0,0 +1,63 @@
+# leave/cache_backends.py
+"""
+项目自定义的缓存后端。
+
+Django 的 FileBasedCache 在每次 set 时列出整个缓存目录，条目数达到 MAX_ENTRIES 后随机删除三分之一，
+不区分条目是否还有效。这对“丢了就重新算”的数据没问题，对必须保留的数据（令牌吊销记录）则不可接受；
+条目多、写入频繁时（防伪查询缓存），每次 set 列目录本身也是主要开销。
+"""
+import itertools
+import random
+from collections import defaultdict
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class PersistentFileBasedCache(FileBasedCache):
+    """
+    从不淘汰的文件缓存：条目只在过期后被读到时删除。
+    用于令牌吊销记录（每个用户最多一条，数量以用户数为上限），该别名不能与其他数据共用。
+    """
+
+    def _cull(self):
+        pass
+
+
+# 缓存目录 -> 本进程内的 set 计数。CacheHandler 每个线程各建一个后端实例，计数放在实例上会按线程分散
+_set_counters = defaultdict(lambda: itertools.count(1))
+
+
+class BoundedFileBasedCache(FileBasedCache):
+    """
+    有上限、写入开销低的文件缓存，用于防伪查询缓存。
+
+    OPTIONS 除 MAX_ENTRIES / CULL_FREQUENCY 外：
+    - CULL_INTERVAL：每个进程每 N 次 set 才统计一次条目数（默认 1，与 Django 相同），
+      条目数最多超出上限 worker 数 × N
+    淘汰时先删除已过期的条目（负缓存只保留 1 分钟，大部分是这类），仍达到上限才按 CULL_FREQUENCY 随机删除。
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_interval = max(1, int(params.get('OPTIONS', {}).get('CULL_INTERVAL', 1)))
+
+    def _drop_if_expired(self, fname):
+        try:
+            with open(fname, 'rb') as f:
+                return self._is_expired(f)
+        except FileNotFoundError:
+            return True
+
+    def _cull(self):
+        if next(_set_counters[self._dir]) % self._cull_interval:
+            return
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        filelist = [fname for fname in filelist if not self._drop_if_expired(fname)]
+        if len(filelist) < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+        for fname in random.sample(filelist, int(len(filelist) / self._cull_frequency)):
+            self._delete(fname)
@@ -0,0 +1,31 @@
+# leave/db.py
+"""
+数据库连接初始化：
+SQLite 每个新连接建立时执行 settings 中配置的 PRAGMA（WAL、busy_timeout、synchronous），
+多个 gunicorn worker 共用一个库文件时减少写锁等待与 database is locked 错误。
+其他后端不做处理。
+"""
+from django.conf import settings
+
+
+def sqlite_pragmas():
+    """
+    返回要执行的 (PRAGMA 名, 值) 列表，值为空的项跳过。
+    """
+    pragmas = (
+        ('journal_mode', getattr(settings, 'LEAVE_SQLITE_JOURNAL_MODE', 'WAL')),
+        ('busy_timeout', getattr(settings, 'LEAVE_SQLITE_BUSY_TIMEOUT', 5000)),
+        ('synchronous', getattr(settings, 'LEAVE_SQLITE_SYNCHRONOUS', 'NORMAL')),
+    )
+    return [(name, value) for name, value in pragmas if value not in (None, '')]
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    connection_created 信号处理器，由 LeaveConfig.ready 注册。
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f'PRAGMA {name} = {value}')
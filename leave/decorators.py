@@ -4,6 +4,8 @@ from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
 
+from .roles import has_group
+
 def group_required(*group_names):
     """
     装饰器，用于检查用户是否属于指定的一个或多个用户组。
@@ -27,8 +29,8 @@ def group_required(*group_names):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
             
-            # 检查用户是否属于任何一个指定的组
-            if not request.user.groups.filter(name__in=group_names).exists():
+            # 检查用户是否属于任何一个指定的组（组名在本次请求内只查询一次）
+            if not has_group(request.user, *group_names):
                 return Response(
                     {'detail': 'You do not have permission to perform this action.'},
                     status=status.HTTP_403_FORBIDDEN
@@ -0,0 +1,292 @@
+# leave/exporting.py
+"""
+请假记录流式导出：
+- values_list 投影 + iterator(chunk_size)，不构造模型实例、不经过序列化器
+- 逐行写出（openpyxl write-only / csv / 可选的 Parquet），内存占用与总行数无关
+export_leaves 命令与管理员导出接口共用这里的列定义与行生成器。
+
+HTTP 导出（StreamingHttpResponse）使用 iter_csv_chunks / iter_xlsx_chunks：
+每取回 chunk_size 行产出一段字节，XLSX 由 zipfile 直接写到不可 seek 的缓冲区，
+整个文件不会在内存或磁盘上完整存在。
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import Leave
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (表头, values_list 字段)，顺序即导出列顺序
+EXPORT_COLUMNS = (
+    ('请假条ID', 'id'),
+    ('学号', 'student__username'),
+    ('学生姓名', 'student__last_name'),
+    ('班级', 'student__studentprofile__assigned_class__name'),
+    ('学生邮箱', 'student__email'),
+    ('辅导员姓名', 'advisor__last_name'),
+    ('开始日期', 'start_date'),
+    ('结束日期', 'end_date'),
+    ('请假理由', 'reason'),
+    ('申请时间', 'leave_time'),
+    ('状态', 'status'),
+    ('批准人', 'approver'),
+)
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS]
+EXPORT_FIELDS = [field for _, field in EXPORT_COLUMNS]
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+def local_day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_export_queryset(qs=None, date_from=None, date_to=None, statuses=None):
+    """
+    按开始日期（本地时区，含首尾两天）和状态过滤，按 id 排序。
+    """
+    qs = Leave.objects.all() if qs is None else qs
+    if date_from is not None:
+        qs = qs.filter(start_date__gte=local_day_start(date_from))
+    if date_to is not None:
+        qs = qs.filter(start_date__lt=local_day_start(date_to + timedelta(days=1)))
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+    return qs.order_by('id')
+
+
+def iter_export_rows(qs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    逐行生成导出数据，时间转换为本地时区的无时区 datetime（Excel 不支持带时区的时间）。
+    """
+    for row in qs.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        yield [
+            timezone.localtime(value).replace(tzinfo=None) if isinstance(value, datetime) else value
+            for value in row
+        ]
+
+
+def format_csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return '' if value is None else value
+
+
+def write_csv(path, rows):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADERS)
+        for row in rows:
+            writer.writerow([format_csv_value(value) for value in row])
+            count += 1
+    return count
+
+
+def write_xlsx(path, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('请假记录')
+    sheet.append(EXPORT_HEADERS)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_parquet(path, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    按 chunk_size 行一个 row group 写入 Parquet，需要安装 pyarrow。
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('请假条ID', pa.int64()), ('学号', pa.string()), ('学生姓名', pa.string()), ('班级', pa.string()),
+        ('学生邮箱', pa.string()), ('辅导员姓名', pa.string()), ('开始日期', pa.timestamp('us')),
+        ('结束日期', pa.timestamp('us')), ('请假理由', pa.string()), ('申请时间', pa.timestamp('us')),
+        ('状态', pa.int64()), ('批准人', pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                writer.write_table(pa.Table.from_pylist([dict(zip(EXPORT_HEADERS, r)) for r in batch], schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist([dict(zip(EXPORT_HEADERS, r)) for r in batch], schema))
+            count += len(batch)
+    return count
+
+
+def write_export(path, rows, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    按格式写出，返回导出行数。
+    """
+    if export_format == 'csv':
+        return write_csv(path, rows)
+    if export_format == 'parquet':
+        return write_parquet(path, rows, chunk_size)
+    return write_xlsx(path, rows)
+
+
+# ==========================================
+# HTTP 流式导出
+# ==========================================
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    逐块产出 CSV 字节（带 BOM，Excel 可直接打开中文）。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for chunk in _chunks(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([format_csv_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _StreamBuffer:
+    """
+    zipfile 的写入目标：只支持 write，产出后清空。
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_STATIC_PARTS = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '<Override PartName="/xl/styles.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Target="xl/workbook.xml" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="请假记录" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+     '<Relationship Id="rId2" Target="styles.xml" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+     '</Relationships>'),
+    # cellXfs 第 1 项（s="1"）是日期时间格式，与 openpyxl 写 datetime 时的默认格式相同
+    ('xl/styles.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+     '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd h:mm:ss"/></numFmts>'
+     '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+     '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+     '<fill><patternFill patternType="gray125"/></fill></fills>'
+     '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+     '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+     '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+     '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+     '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+     '</styleSheet>'),
+)
+
+# Excel 日期序列号的起点（1900 日期系统，已计入 1900-02-29 的历史错误，适用于 1900-03-01 之后的日期）
+XLSX_EPOCH = datetime(1899, 12, 30)
+XLSX_DATETIME_STYLE = 1
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        delta = value - XLSX_EPOCH
+        serial = delta.days + (delta.seconds + delta.microseconds / 1e6) / 86400
+        return f'<c s="{XLSX_DATETIME_STYLE}"><v>{serial!r}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub('', str(format_csv_value(value))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def iter_xlsx_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    逐块产出 XLSX 字节：单个工作表，字符串使用 inlineStr（无共享字符串表），
+    时间写成带日期格式的数值单元格（本地时间），与 export_leaves 命令的 openpyxl 导出一致，可直接排序、筛选。
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS:
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                .encode('utf-8')
+            )
+            sheet.write(_xlsx_row(EXPORT_HEADERS).encode('utf-8'))
+            yield buffer.pop()
+            for chunk in _chunks(rows, chunk_size):
+                sheet.write(''.join(_xlsx_row(row) for row in chunk).encode('utf-8'))
+                yield buffer.pop()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.pop()
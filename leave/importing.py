@@ -0,0 +1,208 @@
+# leave/importing.py
+"""
+importer.py 的批量导入引擎：
+- 学生导入：所有班级一次读入字典，已存在的学号一次查询取回；
+  用户、组成员关系、StudentProfile 分块 bulk_create，每块一个事务；逐行错误可写成汇总文件
+- 辅导员更新：学生、辅导员各一次查询解析，变更按批 bulk_update，可先试运行输出差异报告
+
+bulk_create 不触发 post_save / m2m_changed 信号，所以档案在这里直接创建。
+"""
+import csv
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import IntegrityError, transaction
+
+from .advisors import sync_leave_advisors
+from .models import Class, StudentProfile
+from .verification import invalidate_student_verifications
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+@dataclass
+class ImportResult:
+    created: list = field(default_factory=list)  # 成功创建的学号
+    errors: list = field(default_factory=list)  # (行号, 学号, 原因)
+
+    def add_error(self, row, reason):
+        self.errors.append((row['row'], row['username'], reason))
+
+    def write_errors(self, path):
+        """
+        把逐行错误写成 CSV（utf-8-sig，Excel 可直接打开）。
+        """
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['行号', '学号', '原因'])
+            writer.writerows(self.errors)
+
+
+def hash_passwords(passwords):
+    """
+    逐个计算密码哈希（每个用户独立的盐）。
+    """
+    return [make_password(password) for password in passwords]
+
+
+def validate_student_rows(rows, result):
+    """
+    校验学号、班级与重复，返回可以创建的行（附带 class_id）。
+    """
+    classes = dict(Class.objects.values_list('name', 'id'))
+    usernames = [row['username'] for row in rows if row['username']]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+    valid, seen = [], set()
+    for row in rows:
+        username = row['username']
+        if not username:
+            result.add_error(row, '学号为空')
+        elif username in existing:
+            result.add_error(row, '用户名已存在')
+        elif username in seen:
+            result.add_error(row, '文件中学号重复')
+        elif row['class_name'] not in classes:
+            result.add_error(row, f"班级 {row['class_name']} 不存在")
+        else:
+            seen.add(username)
+            valid.append({**row, 'class_id': classes[row['class_name']]})
+    return valid
+
+
+def create_student_chunk(rows, encoded_passwords, stu_group):
+    """
+    在一个事务中创建一块学生：用户、stu 组成员关系、学生档案。
+    """
+    membership = User.groups.through
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=row['username'], password=encoded, last_name=row['last_name'],
+                 email=row['email'], is_active=True)
+            for row, encoded in zip(rows, encoded_passwords)
+        ])
+        if any(user.pk is None for user in users):
+            # 数据库不支持 bulk_create 回填主键时按学号取回
+            ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        membership.objects.bulk_create([membership(user_id=user.pk, group_id=stu_group.pk) for user in users])
+        StudentProfile.objects.bulk_create([
+            StudentProfile(user_id=user.pk, assigned_class_id=row['class_id'])
+            for user, row in zip(users, rows)
+        ])
+
+
+def bulk_import_students(rows, password='123456', chunk_size=DEFAULT_CHUNK_SIZE, hasher=hash_passwords):
+    """
+    批量导入学生。rows 为字典列表：row（行号）、username、last_name、email、class_name。
+    hasher 接收密码列表、返回同序的哈希列表，见 leave.passwords.make_password_hasher。
+    某一块写入失败（如并发导入了相同学号）时，该块逐行重试，只有冲突的行记为错误。
+    """
+    result = ImportResult()
+    valid = validate_student_rows(rows, result)
+    stu_group, _ = Group.objects.get_or_create(name='stu')
+    # 一次性为所有行计算哈希，进程池类 hasher 只需启动一次
+    all_encoded = hasher([password] * len(valid)) if valid else []
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        encoded = all_encoded[start:start + chunk_size]
+        try:
+            create_student_chunk(chunk, encoded, stu_group)
+        except IntegrityError:
+            for row, encoded_password in zip(chunk, encoded):
+                try:
+                    create_student_chunk([row], [encoded_password], stu_group)
+                except IntegrityError as e:
+                    result.add_error(row, f'写入失败: {e}')
+                    continue
+                result.created.append(row['username'])
+            continue
+        result.created.extend(row['username'] for row in chunk)
+    return result
+
+
+# ==========================================
+# 批量更新学生辅导员
+# ==========================================
+
+@dataclass
+class AdvisorPlan:
+    changes: list = field(default_factory=list)  # (行号, 学号, 原辅导员, 新辅导员)
+    unchanged: list = field(default_factory=list)  # 学号
+    errors: list = field(default_factory=list)  # (行号, 学号, 原因)
+    profiles: list = field(default_factory=list)  # 待写入的 StudentProfile（advisor_id 已更新）
+
+    def write_report(self, path):
+        """
+        把变更与错误写成 CSV 差异报告（utf-8-sig）。
+        """
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['行号', '学号', '原辅导员', '新辅导员', '错误'])
+            writer.writerows([(*change, '') for change in self.changes])
+            writer.writerows([(row, username, '', '', reason) for row, username, reason in self.errors])
+
+
+def resolve_advisors(last_names):
+    """
+    一次查询取回 tch 组中这些姓名的用户，返回 {姓名: [(user_id, 是否有教师档案), ...]}。
+    """
+    advisors = {}
+    rows = User.objects.filter(last_name__in=set(last_names), groups__name='tch').values_list(
+        'last_name', 'id', 'teacherprofile__id'
+    )
+    for last_name, user_id, teacher_profile_id in rows:
+        advisors.setdefault(last_name, []).append((user_id, teacher_profile_id is not None))
+    return advisors
+
+
+def plan_advisor_updates(rows):
+    """
+    计算辅导员变更（不写库）。rows 为字典列表：row（行号）、username、advisor_last_name。
+    学生与辅导员各用一次查询解析；同名辅导员视为歧义，整行报错而不是随意选一个。
+    """
+    plan = AdvisorPlan()
+    profiles = {
+        profile.user.username: profile
+        for profile in StudentProfile.objects.filter(
+            user__username__in=[row['username'] for row in rows], user__groups__name='stu'
+        ).select_related('user', 'advisor').only('id', 'advisor_id', 'user__username', 'advisor__last_name')
+    }
+    advisors = resolve_advisors(row['advisor_last_name'] for row in rows)
+
+    for row in rows:
+        username, last_name = row['username'], row['advisor_last_name']
+        profile = profiles.get(username)
+        candidates = advisors.get(last_name, [])
+        if profile is None:
+            plan.errors.append((row['row'], username, "学生用户不存在、不属于 'stu' 组或没有学生档案"))
+        elif not candidates:
+            plan.errors.append((row['row'], username, f"辅导员 '{last_name}' 不存在或不属于 'tch' 组"))
+        elif len(candidates) > 1:
+            plan.errors.append((row['row'], username, f"辅导员 '{last_name}' 有 {len(candidates)} 个同名用户"))
+        elif not candidates[0][1]:
+            plan.errors.append((row['row'], username, f"辅导员 '{last_name}' 没有教师档案"))
+        elif profile.advisor_id == candidates[0][0]:
+            plan.unchanged.append(username)
+        else:
+            old_name = profile.advisor.last_name if profile.advisor_id else ''
+            plan.changes.append((row['row'], username, old_name, last_name))
+            profile.advisor_id = candidates[0][0]
+            plan.profiles.append(profile)
+    return plan
+
+
+def apply_advisor_updates(plan, batch_size=DEFAULT_CHUNK_SIZE):
+    """
+    按批 bulk_update 写入计划中的变更，所有批次在一个事务内。
+    """
+    student_ids = [profile.user_id for profile in plan.profiles]
+    with transaction.atomic():
+        StudentProfile.objects.bulk_update(plan.profiles, ['advisor'], batch_size=batch_size)
+        # bulk_update 不触发信号：同步这些学生假条的 advisor，并让防伪查询缓存失效
+        sync_leave_advisors(student_ids)
+        invalidate_student_verifications(*student_ids)
+    return len(plan.profiles)
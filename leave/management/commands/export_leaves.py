@@ -0,0 +1,70 @@
+# leave/management/commands/export_leaves.py
+
+import os
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leave.exporting import (
+    DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, filter_export_queryset, iter_export_rows, write_export,
+)
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"日期格式应为 YYYY-MM-DD: {value}")
+
+
+class Command(BaseCommand):
+    help = '流式导出请假条记录到 Excel / CSV / Parquet 文件（可按开始日期和状态过滤）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='指定输出文件路径，例如 /path/to/output.xlsx',
+            required=True
+        )
+        parser.add_argument('--format', choices=EXPORT_FORMATS, help='输出格式，默认按文件扩展名判断（否则 xlsx）')
+        parser.add_argument('--start-date', help='只导出开始日期不早于该日的假条（YYYY-MM-DD）')
+        parser.add_argument('--end-date', help='只导出开始日期不晚于该日的假条（YYYY-MM-DD）')
+        parser.add_argument('--status', type=int, nargs='+', help='只导出这些状态的假条，例如 --status 1 3')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每次从数据库取回的行数')
+
+    def handle(self, *args, **options):
+        output_path = options['output']
+        export_format = options['format'] or os.path.splitext(output_path)[1].lstrip('.').lower()
+        if export_format not in EXPORT_FORMATS:
+            export_format = 'xlsx'
+        if export_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError("导出 Parquet 需要安装 pyarrow：pip install pyarrow")
+
+        # 确保指定的目录存在
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            try:
+                os.makedirs(output_dir)
+                self.stdout.write(self.style.SUCCESS(f"已创建目录: {output_dir}"))
+            except Exception as e:
+                raise CommandError(f"无法创建目录 {output_dir}: {e}")
+
+        qs = filter_export_queryset(
+            date_from=parse_date(options['start_date']) if options['start_date'] else None,
+            date_to=parse_date(options['end_date']) if options['end_date'] else None,
+            statuses=options['status'],
+        )
+        try:
+            count = write_export(output_path, iter_export_rows(qs, options['chunk_size']), export_format,
+                                 options['chunk_size'])
+        except Exception as e:
+            raise CommandError(f"导出过程中出错: {e}")
+
+        if not count:
+            self.stdout.write(self.style.WARNING("没有请假条记录可导出。"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"成功导出 {count} 条请假记录到 {output_path}"))
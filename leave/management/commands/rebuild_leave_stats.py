@@ -0,0 +1,13 @@
+# leave/management/commands/rebuild_leave_stats.py
+
+from django.core.management.base import BaseCommand
+
+from leave.statistics import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = '从 Leave 表全量重建数据看板统计汇总表（可加入定时任务作校正）'
+
+    def handle(self, *args, **options):
+        rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS('统计汇总表已重建。'))
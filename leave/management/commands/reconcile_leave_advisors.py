@@ -0,0 +1,18 @@
+# leave/management/commands/reconcile_leave_advisors.py
+
+from django.core.management.base import BaseCommand
+
+from leave.advisors import ID_BATCH_SIZE, sync_leave_advisors
+from leave.verification import invalidate_student_verifications
+
+
+class Command(BaseCommand):
+    help = '把假条的 advisor 校正为学生档案当前的辅导员（教师请假列表按该字段过滤，可加入定时任务）'
+
+    def handle(self, *args, **options):
+        repaired, student_ids = sync_leave_advisors()
+        # 防伪页面展示辅导员姓名：只让被校正学生的假条失效
+        student_ids = sorted(student_ids)
+        for start in range(0, len(student_ids), ID_BATCH_SIZE):
+            invalidate_student_verifications(*student_ids[start:start + ID_BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(f'已校正 {repaired} 条假条的辅导员。'))
@@ -0,0 +1,249 @@
+# leave/metrics.py
+"""
+请求指标：按路由统计耗时、SQL 条数与耗时、响应大小，并发现 N+1 查询。
+
+- RequestMetricsMiddleware 为每个请求创建 RequestRecorder，放在 contextvar 中
+- 每个数据库连接建立时安装 execute_wrapper（见 install_query_recorder），
+  SQL 记到当前请求的 recorder 上；sync_to_async 会带上 contextvar，异步视图的查询同样计入
+- 同一请求内同一条 SQL（参数不同）执行次数达到 LEAVE_METRICS_N_PLUS_ONE_THRESHOLD 视为 N+1，记 WARNING 日志
+- 汇总数据保存在进程内：管理员接口 /api/admin/metrics/ 查看当前 worker 的数据，
+  并每隔 LEAVE_METRICS_DUMP_INTERVAL 秒把汇总写入 'leave.metrics' 日志（带 pid，多 worker 可离线合并）
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('leave.metrics')
+
+# 直方图桶上界，最后一个桶为 +inf
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current_recorder = ContextVar('leave_request_recorder', default=None)
+
+
+def metrics_enabled():
+    return getattr(settings, 'LEAVE_METRICS_ENABLED', True)
+
+
+class RequestRecorder:
+    """
+    单个请求内的 SQL 记录。
+    """
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = Counter()  # 参数化的 SQL -> 执行次数
+
+    def record(self, sql, duration):
+        self.query_count += 1
+        self.query_time += duration
+        self.statements[sql] += 1
+
+    def repeated_statements(self, threshold):
+        """
+        执行次数达到阈值的 SQL（N+1 嫌疑），按次数降序。
+        """
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper：把 SQL 计入当前请求；不在请求内（命令、后台任务）时直接执行。
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created 信号处理器，由 LeaveConfig.ready 注册。
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _histogram(buckets):
+    return [0] * (len(buckets) + 1)
+
+
+class RouteStats:
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0  # 5xx
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.query_count = 0
+        self.max_queries = 0
+        self.query_ms = 0.0
+        self.response_bytes = 0
+        self.max_response_bytes = 0
+        self.n_plus_one = 0
+        self.duration_histogram = _histogram(DURATION_BUCKETS_MS)
+        self.query_histogram = _histogram(QUERY_COUNT_BUCKETS)
+        self.repeated_sql = {}  # SQL -> 单个请求内的最大重复次数
+
+    def add(self, duration_ms, recorder, size, status_code, repeated):
+        self.count += 1
+        self.errors += status_code >= 500
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.query_count += recorder.query_count
+        self.max_queries = max(self.max_queries, recorder.query_count)
+        self.query_ms += recorder.query_time * 1000
+        if size is not None:
+            self.response_bytes += size
+            self.max_response_bytes = max(self.max_response_bytes, size)
+        self.duration_histogram[bisect_left(DURATION_BUCKETS_MS, duration_ms)] += 1
+        self.query_histogram[bisect_left(QUERY_COUNT_BUCKETS, recorder.query_count)] += 1
+        if repeated:
+            self.n_plus_one += 1
+            for sql, times in repeated:
+                self.repeated_sql[sql] = max(self.repeated_sql.get(sql, 0), times)
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / count, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_queries': round(self.query_count / count, 2),
+            'max_queries': self.max_queries,
+            'avg_query_ms': round(self.query_ms / count, 2),
+            'avg_response_bytes': round(self.response_bytes / count),
+            'max_response_bytes': self.max_response_bytes,
+            'n_plus_one_requests': self.n_plus_one,
+            'repeated_sql': [{'sql': sql, 'max_per_request': times}
+                             for sql, times in sorted(self.repeated_sql.items(), key=lambda item: -item[1])],
+            'duration_histogram_ms': _labelled(DURATION_BUCKETS_MS, self.duration_histogram),
+            'query_count_histogram': _labelled(QUERY_COUNT_BUCKETS, self.query_histogram),
+        }
+
+
+def _labelled(buckets, counts):
+    labels = [f'<={bound}' for bound in buckets] + [f'>{buckets[-1]}']
+    return dict(zip(labels, counts))
+
+
+class MetricsRegistry:
+    """
+    进程内的按路由汇总，线程安全。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._started = time.time()
+        self._last_dump = time.monotonic()
+
+    def add(self, route, *args):
+        with self._lock:
+            self._routes.setdefault(route, RouteStats()).add(*args)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {route: stats.as_dict() for route, stats in sorted(self._routes.items())}
+        return {'pid': os.getpid(), 'since': self._started, 'routes': routes}
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+            self._started = time.time()
+
+    def maybe_dump(self):
+        """
+        距上次写日志超过 LEAVE_METRICS_DUMP_INTERVAL 秒时写一次汇总（0 表示不写）。
+        """
+        interval = getattr(settings, 'LEAVE_METRICS_DUMP_INTERVAL', 300)
+        if not interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_dump < interval:
+                return
+            self._last_dump = time.monotonic()
+        logger.info('request metrics %s', json.dumps(self.snapshot(), ensure_ascii=False))
+
+
+registry = MetricsRegistry()
+
+
+def route_key(request):
+    """
+    用 "方法 路由模板" 作为汇总键，同一接口的不同 id / uuid 归为一类。
+    """
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None else '<unresolved>'
+    return f'{request.method} /{route}'
+
+
+def response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    """
+    同时支持同步与异步请求链。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
+        recorder = RequestRecorder()
+        token = _current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.finish(request, response, recorder, start)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
+        recorder = RequestRecorder()
+        token = _current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.finish(request, response, recorder, start)
+        return response
+
+    def finish(self, request, response, recorder, start):
+        duration_ms = (time.perf_counter() - start) * 1000
+        route = route_key(request)
+        repeated = recorder.repeated_statements(getattr(settings, 'LEAVE_METRICS_N_PLUS_ONE_THRESHOLD', 5))
+        for sql, times in repeated:
+            logger.warning('possible N+1 in %s: %d x %s', route, times, sql)
+        registry.add(route, duration_ms, recorder, response_size(response), response.status_code, repeated)
+        registry.maybe_dump()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave', '0010_alter_leave_verification_uuid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['-leave_time', '-id'], name='leave_time_id_idx'),
+        ),
+    ]
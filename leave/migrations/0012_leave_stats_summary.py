@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:04
+
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F
+from django.db.models.functions import ExtractMonth, ExtractWeekDay, TruncDate
+
+
+def populate_summaries(apps, schema_editor):
+    """
+    用现有假条初始化统计汇总表（与 leave.statistics.rebuild_summaries 相同的口径）。
+    """
+    Leave = apps.get_model('leave', 'Leave')
+    queryset = Leave.objects.all()
+
+    apps.get_model('leave', 'LeaveClassStat').objects.bulk_create([
+        apps.get_model('leave', 'LeaveClassStat')(class_name=row['name'] or '', count=row['value'])
+        for row in queryset.values(name=F('student__studentprofile__assigned_class__name')).annotate(value=Count('id'))
+    ])
+    apps.get_model('leave', 'LeaveDailyStat').objects.bulk_create([
+        apps.get_model('leave', 'LeaveDailyStat')(date=row['date'], count=row['count'])
+        for row in queryset.annotate(date=TruncDate('start_date')).values('date').annotate(count=Count('id'))
+    ])
+    histogram = {}
+    durations = queryset.annotate(
+        duration=ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField())
+    ).values_list('duration', flat=True)
+    for duration in durations:
+        if duration:
+            histogram[duration.days] = histogram.get(duration.days, 0) + 1
+    apps.get_model('leave', 'LeaveDurationStat').objects.bulk_create([
+        apps.get_model('leave', 'LeaveDurationStat')(days=days, count=count) for days, count in histogram.items()
+    ])
+    apps.get_model('leave', 'LeaveHeatmapStat').objects.bulk_create([
+        apps.get_model('leave', 'LeaveHeatmapStat')(**row)
+        for row in queryset.annotate(month=ExtractMonth('start_date'), weekday=ExtractWeekDay('start_date'))
+        .values('month', 'weekday').annotate(count=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave', '0011_leave_time_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveClassStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_name', models.CharField(blank=True, max_length=100, unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveDurationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days', models.IntegerField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaveHeatmapStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.IntegerField()),
+                ('weekday', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('month', 'weekday')},
+            },
+        ),
+        migrations.RunPython(populate_summaries, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave', '0012_leave_stats_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['student', 'status', '-leave_time'], name='leave_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['advisor', 'status', '-leave_time'], name='leave_advisor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['advisor', '-leave_time', '-id'], name='leave_advisor_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['status', '-leave_time'], name='leave_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['start_date', 'end_date'], name='leave_dates_idx'),
+        ),
+    ]
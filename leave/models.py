@@ -21,6 +21,31 @@ class Leave(models.Model):
         help_text="防伪校验码"
     )    # 防伪uuid
 
+    class Meta:
+        indexes = [
+            # 列表游标分页键 (leave_time, id)
+            models.Index(fields=['-leave_time', '-id'], name='leave_time_id_idx'),
+            # 学生查看自己的假条（可按状态过滤），按申请时间倒序
+            models.Index(fields=['student', 'status', '-leave_time'], name='leave_student_status_idx'),
+            # 辅导员范围内的假条（可按状态过滤）
+            models.Index(fields=['advisor', 'status', '-leave_time'], name='leave_advisor_status_idx'),
+            # 教师列表按辅导员范围过滤（不按状态过滤时）并按时间倒序分页
+            models.Index(fields=['advisor', '-leave_time', '-id'], name='leave_advisor_time_idx'),
+            # 管理员按状态过滤的列表
+            models.Index(fields=['status', '-leave_time'], name='leave_status_time_idx'),
+            # 统计与导出按开始日期聚合/过滤；含 end_date，时长统计可只读索引
+            models.Index(fields=['start_date', 'end_date'], name='leave_dates_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录读出时的统计相关字段，供 signals 增量维护统计汇总表
+        instance._stats_snapshot = instance.stats_snapshot()
+        return instance
+
+    def stats_snapshot(self):
+        return self.__dict__.get('student_id'), self.__dict__.get('start_date'), self.__dict__.get('end_date')
 
     def __str__(self):
         return f'{self.student.last_name} - {self.student.class_set.first().name} - {self.reason}'
@@ -85,3 +110,34 @@ class Class(models.Model):
 
     def __str__(self):
         return self.name
+
+
+# leave/models.py
+"""
+数据看板统计汇总表：
+由 signals 在 Leave 增删改时增量维护，rebuild_leave_stats 命令可全量重建。
+看板接口直接读取这些表，耗时与桶数成正比，与假条总数无关。
+"""
+
+class LeaveClassStat(models.Model):
+    class_name = models.CharField(max_length=100, unique=True, blank=True)  # 班级名称，'' 表示未分班
+    count = models.IntegerField(default=0)
+
+
+class LeaveDailyStat(models.Model):
+    date = models.DateField(unique=True)  # 请假开始日期（本地时区）
+    count = models.IntegerField(default=0)
+
+
+class LeaveDurationStat(models.Model):
+    days = models.IntegerField(unique=True)  # 请假时长的整天数（向下取整），时长为 0 的假条不计入
+    count = models.IntegerField(default=0)
+
+
+class LeaveHeatmapStat(models.Model):
+    month = models.IntegerField()  # 1-12
+    weekday = models.IntegerField()  # 1=周日 ... 7=周六，与 ExtractWeekDay 一致
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('month', 'weekday')
@@ -0,0 +1,164 @@
+# leave/pagination.py
+"""
+请假列表分页：
+- 默认：页码分页（page / page_size），响应结构与旧客户端保持一致
+- 可选：游标分页（pagination=cursor 或携带 cursor 参数），
+  以 (leave_time, id) 为键，不做 OFFSET；skip_count=1 时不执行 COUNT(*)
+每页的行由 compact_serializer.leave_rows 取成具名元组，serialize_leave_rows 序列化；
+COUNT(*) 在原查询集上执行，不带取行用的 JOIN。
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .compact_serializer import leave_rows, serialize_leave_rows
+
+CURSOR_NEXT = 'n'
+CURSOR_PREV = 'p'
+
+
+def encode_cursor(row, direction):
+    """
+    把分页边界 (leave_time, id) 编码成不透明的游标字符串。
+    """
+    payload = json.dumps([direction, row.leave_time.isoformat(), row.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    解析游标，返回 (direction, leave_time, id)；格式错误时抛出 ValidationError。
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, leave_time, leave_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (CURSOR_NEXT, CURSOR_PREV):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(leave_time), int(leave_id)
+    except (TypeError, ValueError):
+        raise ValidationError({'cursor': '无效的游标。'})
+
+
+def query_params(request):
+    """
+    DRF Request 用 query_params，异步视图里的 Django HttpRequest 用 GET。
+    """
+    return getattr(request, 'query_params', request.GET)
+
+
+def is_cursor_request(request):
+    params = query_params(request)
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+def get_page_size(request):
+    try:
+        page_size = int(query_params(request).get('page_size', 10))
+    except ValueError:
+        raise ValidationError({'page_size': '必须为整数。'})
+    return max(1, page_size)
+
+
+def keyset_query(qs, token, page_size):
+    """
+    返回 (游标方向, 按 (leave_time, id) 多取一条的查询)，没有游标时方向为 None。
+    """
+    if not token:
+        return None, qs.order_by('-leave_time', '-id')[:page_size + 1]
+
+    direction, leave_time, leave_id = decode_cursor(token)
+    if direction == CURSOR_NEXT:
+        after = Q(leave_time__lt=leave_time) | Q(leave_time=leave_time, id__lt=leave_id)
+        return direction, qs.filter(after).order_by('-leave_time', '-id')[:page_size + 1]
+    before = Q(leave_time__gt=leave_time) | Q(leave_time=leave_time, id__gt=leave_id)
+    return direction, qs.filter(before).order_by('leave_time', 'id')[:page_size + 1]
+
+
+def keyset_bounds(rows, direction, page_size):
+    """
+    由多取一条的结果得到 (本页行列表, next 游标, previous 游标)。
+    """
+    has_more = len(rows) > page_size
+    if direction is None:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1], CURSOR_NEXT) if has_more else None, None
+    if direction == CURSOR_NEXT:
+        rows = rows[:page_size]
+        next_token = encode_cursor(rows[-1], CURSOR_NEXT) if has_more else None
+        prev_token = encode_cursor(rows[0], CURSOR_PREV) if rows else None
+    else:
+        rows = rows[:page_size][::-1]
+        next_token = encode_cursor(rows[-1], CURSOR_NEXT) if rows else None
+        prev_token = encode_cursor(rows[0], CURSOR_PREV) if has_more else None
+    return rows, next_token, prev_token
+
+
+def keyset_page(qs, token, page_size):
+    """
+    按 (-leave_time, -id) 取一页，返回 (行列表, next 游标, previous 游标)。
+    """
+    direction, query = keyset_query(qs, token, page_size)
+    return keyset_bounds(list(query), direction, page_size)
+
+
+def leave_page_data(request, qs):
+    """
+    根据查询参数对请假列表分页并序列化，返回响应数据。
+    """
+    params = query_params(request)
+    page_size = get_page_size(request)
+
+    if not is_cursor_request(request):
+        paginator = Paginator(leave_rows(qs), page_size)
+        paginator.count = qs.count()  # count 是 cached_property，在不带 JOIN 的原查询上计数
+        page_obj = paginator.get_page(params.get('page', 1))
+        return {
+            'count': paginator.count,
+            'next': page_obj.next_page_number() if page_obj.has_next() else None,
+            'previous': page_obj.previous_page_number() if page_obj.has_previous() else None,
+            'results': serialize_leave_rows(page_obj.object_list),
+        }
+
+    rows, next_token, prev_token = keyset_page(leave_rows(qs), params.get('cursor'), page_size)
+    data = {
+        'next': next_token,
+        'previous': prev_token,
+        'results': serialize_leave_rows(rows),
+    }
+    if params.get('skip_count') not in ('1', 'true'):
+        data = {'count': qs.count(), **data}
+    return data
+
+
+async def aleave_page_data(request, qs):
+    """
+    leave_page_data 的异步版本（异步 ORM），响应数据与同步版本一致。
+    """
+    params = query_params(request)
+    page_size = get_page_size(request)
+
+    if not is_cursor_request(request):
+        paginator = Paginator(leave_rows(qs), page_size)
+        paginator.count = await qs.acount()  # count 是 cached_property，预先填入后分页计算不再查询
+        page_obj = paginator.get_page(params.get('page', 1))
+        return {
+            'count': paginator.count,
+            'next': page_obj.next_page_number() if page_obj.has_next() else None,
+            'previous': page_obj.previous_page_number() if page_obj.has_previous() else None,
+            'results': serialize_leave_rows([row async for row in page_obj.object_list]),
+        }
+
+    direction, query = keyset_query(leave_rows(qs), params.get('cursor'), page_size)
+    rows, next_token, prev_token = keyset_bounds([row async for row in query], direction, page_size)
+    data = {
+        'next': next_token,
+        'previous': prev_token,
+        'results': serialize_leave_rows(rows),
+    }
+    if params.get('skip_count') not in ('1', 'true'):
+        data = {'count': await qs.acount(), **data}
+    return data
@@ -0,0 +1,60 @@
+# leave/passwords.py
+"""
+批量建号时的密码哈希：
+- 'unique' ：每个用户独立加盐，在进程池中并行计算（PBKDF2 是 CPU 密集型，线程无法并行）
+- 'shared' ：相同明文只计算一次，所有用户共用同一个哈希（同盐）；
+             只适用于初始默认密码这类本就公开的口令，用户改密后各自重新加盐
+
+importer.py 的批量导入通过 make_password_hasher 选择策略。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+
+HASH_MODES = ('unique', 'shared')
+
+
+def _init_worker():
+    # spawn 方式启动的子进程不会继承已初始化的 Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'leave_management.settings')
+    import django
+    django.setup()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def parallel_hash_passwords(passwords, workers=None):
+    """
+    每个密码独立加盐，workers 个进程并行计算，返回同序的哈希列表。
+    """
+    passwords = list(passwords)
+    workers = min(workers or default_workers(), len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def shared_hash_passwords(passwords):
+    """
+    每个不同的明文只计算一次哈希。
+    """
+    encoded = {}
+    for password in set(passwords):
+        encoded[password] = make_password(password)
+    return [encoded[password] for password in passwords]
+
+
+def make_password_hasher(mode='unique', workers=None):
+    """
+    返回 bulk_import_students 使用的 hasher（接收密码列表，返回哈希列表）。
+    """
+    if mode not in HASH_MODES:
+        raise ValueError(f'未知的密码哈希模式: {mode!r}，可选 {HASH_MODES}')
+    if mode == 'shared':
+        return shared_hash_passwords
+    return lambda passwords: parallel_hash_passwords(passwords, workers)
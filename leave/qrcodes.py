@@ -0,0 +1,116 @@
+# leave/qrcodes.py
+"""
+防伪二维码的生成与缓存：
+- 二维码图片只取决于验证地址（即 verification_uuid），按地址内容寻址缓存 PNG
+- 缓存为 settings.CACHES 中的 LEAVE_QRCODE_CACHE_ALIAS（默认 'qrcode'），
+  locmem 按 LRU 淘汰、file 按条目数清理，MAX_ENTRIES 限制占用
+- ETag 由地址计算，不需要生成图片即可响应条件请求（304）
+- 异步视图在有界线程池中生成图片，不阻塞事件循环
+"""
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import qrcode
+from django.conf import settings
+from django.core.cache import caches
+
+# 修改二维码样式（尺寸、纠错级别等）时递增，旧缓存与旧 ETag 随之失效
+RENDER_VERSION = 1
+
+# 图片内容永不改变，浏览器可长期缓存；接口需要登录，所以只允许私有缓存
+QRCODE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+
+def qrcode_cache():
+    return caches[getattr(settings, 'LEAVE_QRCODE_CACHE_ALIAS', 'qrcode')]
+
+
+def verify_url(uuid):
+    """
+    二维码被扫描后打开的页面地址。
+    """
+    base_url = getattr(settings, 'LEAVE_VERIFY_BASE_URL', 'https://leave.sdutee.xyz')
+    return f"{base_url}/leave/verify/{uuid}/"
+
+
+def qrcode_digest(url):
+    return hashlib.sha256(f'{RENDER_VERSION}:{url}'.encode()).hexdigest()
+
+
+def qrcode_etag(url):
+    return f'"{qrcode_digest(url)}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match 是否命中（支持多个值与 *，忽略弱校验前缀 W/）。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return any(value.removeprefix('W/') == etag for value in candidates)
+
+
+def render_qrcode(url):
+    img = qrcode.make(url)
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def _qrcode_key(url):
+    return f'leave:qrcode:{qrcode_digest(url)}'
+
+
+def get_qrcode_png(url):
+    """
+    读取缓存的 PNG，未命中时生成并写入缓存。
+    """
+    cache = qrcode_cache()
+    key = _qrcode_key(url)
+    png = cache.get(key)
+    if png is None:
+        png = render_qrcode(url)
+        cache.set(key, png, None)
+    return png
+
+
+_render_executor = None
+
+
+def render_executor():
+    """
+    异步视图生成二维码用的线程池，线程数由 LEAVE_QRCODE_RENDER_THREADS 限制，
+    缓存未命中的突发请求在池中排队，不会无限占用线程。
+    """
+    global _render_executor
+    if _render_executor is None:
+        _render_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'LEAVE_QRCODE_RENDER_THREADS', 2),
+            thread_name_prefix='qrcode-render',
+        )
+    return _render_executor
+
+
+async def aget_qrcode_png(url):
+    """
+    get_qrcode_png 的异步版本。
+    """
+    cache = qrcode_cache()
+    key = _qrcode_key(url)
+    png = await cache.aget(key)
+    if png is None:
+        png = await asyncio.get_running_loop().run_in_executor(render_executor(), render_qrcode, url)
+        await cache.aset(key, png, None)
+    return png
+
+
+def prerender_leave_qrcode(uuid):
+    """
+    假条批准后预先生成二维码，学生第一次打开时直接命中缓存。
+    """
+    get_qrcode_png(verify_url(uuid))
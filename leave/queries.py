@@ -0,0 +1,66 @@
+# leave/queries.py
+"""
+请假列表的查询构建层：
+AdminLeaveListView 和 get_student_leaves 共用。列表只负责范围、过滤与排序，
+分页时由 compact_serializer.leave_rows 把当前页连同关联（学生、学生档案、班级、辅导员）
+在一次 JOIN 中取成元组，每页查询条数与 page_size 无关；COUNT(*) 仍在不带 JOIN 的查询上执行。
+角色可见范围（admin_scope_queryset）也用于管理员导出接口。
+"""
+from .models import Leave
+
+# LeaveSerializer 会访问的关联链（单条假条，如防伪查询）
+LEAVE_LIST_RELATED = (
+    'student__studentprofile__assigned_class',
+    'advisor',
+)
+
+# LeaveSerializer 实际输出的列，其他列（如学生密码哈希）不再取回
+LEAVE_LIST_FIELDS = (
+    'id', 'student_id', 'start_date', 'end_date', 'reason', 'leave_time',
+    'status', 'approver', 'advisor_id', 'reject_reason', 'verification_uuid',
+    'student__username', 'student__last_name', 'student__email',
+    'student__studentprofile__assigned_class__name',
+    'advisor__last_name',
+)
+
+
+def with_serializer_relations(qs):
+    """
+    为 LeaveSerializer 附加 select_related / only 投影。
+    """
+    return qs.select_related(*LEAVE_LIST_RELATED).only(*LEAVE_LIST_FIELDS)
+
+
+def filter_status(qs, status_param):
+    """
+    按 status 查询参数过滤，None 表示不过滤。
+    """
+    if status_param is not None:
+        qs = qs.filter(status=status_param)
+    return qs
+
+
+def admin_scope_queryset(user, is_admin):
+    """
+    管理员/教师/mas 可见的假条范围：
+    - admin/mas：全部假条
+    - tch：只看自己学生的假条。按冗余的 Leave.advisor_id 走索引过滤，
+      学生换辅导员时由 advisors.sync_leave_advisors 保持一致
+    """
+    if is_admin:
+        return Leave.objects.all()
+    return Leave.objects.filter(advisor_id=user.id)
+
+
+def admin_leave_queryset(user, is_admin, status_param=None):
+    """
+    管理员/教师/mas 的请假列表（范围见 admin_scope_queryset）。
+    """
+    return filter_status(admin_scope_queryset(user, is_admin), status_param).order_by('-leave_time')
+
+
+def student_leave_queryset(user, status_param=None):
+    """
+    学生自己的请假列表。
+    """
+    return filter_status(Leave.objects.filter(student_id=user.id), status_param).order_by('-leave_time')
@@ -0,0 +1,49 @@
+# leave/query_plans.py
+"""
+SQLite 执行计划检查：对捕获到的查询运行 EXPLAIN QUERY PLAN，找出对指定表的全表扫描。
+测试中用来保证列表与统计查询都走索引，例如：
+
+    with CaptureQueriesContext(connection) as ctx:
+        client.get('/api/view-leave/')
+    self.assertEqual(find_table_scans(ctx.captured_queries), [])
+
+“SCAN 表 USING INDEX / USING COVERING INDEX”（按索引顺序读取）不算全表扫描。
+其他数据库的 EXPLAIN 输出格式不同，调用方应只在 SQLite 下使用。
+"""
+import re
+
+from django.db import connection
+
+DEFAULT_TABLES = ('leave_leave',)
+
+
+def explain_query_plan(sql, params=None):
+    """
+    返回 EXPLAIN QUERY PLAN 的 detail 列（每个步骤一行）。
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params or ())
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def table_scans(plan, tables=DEFAULT_TABLES):
+    """
+    执行计划中对 tables 的全表扫描步骤。
+    """
+    pattern = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+    return [step for step in plan if (match := pattern.match(step.strip())) and match.group(1) in tables]
+
+
+def find_table_scans(captured_queries, tables=DEFAULT_TABLES):
+    """
+    检查 CaptureQueriesContext 捕获的 SELECT，返回 [(sql, 全表扫描步骤), ...]。
+    """
+    offenders = []
+    for query in captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        scans = table_scans(explain_query_plan(sql), tables)
+        if scans:
+            offenders.append((sql, scans))
+    return offenders
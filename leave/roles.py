@@ -0,0 +1,45 @@
+# leave/roles.py
+"""
+角色解析：
+用户的组名在每个请求内只查询一次并缓存在 user 对象上，
+group_required 装饰器和各视图里的角色判断都从这里读取。
+"""
+
+ADMIN_GROUPS = ('admin', 'mas')
+
+
+def get_group_names(user):
+    """
+    返回用户所属组名（按组 id 排序的元组），同一个 user 对象只查询一次数据库。
+    """
+    names = getattr(user, '_leave_group_names', None)
+    if names is None:
+        names = tuple(user.groups.order_by('pk').values_list('name', flat=True))
+        user._leave_group_names = names
+    return names
+
+
+async def aget_group_names(user):
+    """
+    get_group_names 的异步版本，结果同样缓存在 user 对象上。
+    """
+    names = getattr(user, '_leave_group_names', None)
+    if names is None:
+        names = tuple([name async for name in user.groups.order_by('pk').values_list('name', flat=True)])
+        user._leave_group_names = names
+    return names
+
+
+def has_group(user, *group_names):
+    """
+    用户是否属于任意一个指定的组。
+    """
+    names = get_group_names(user)
+    return any(name in names for name in group_names)
+
+
+def is_admin_user(user):
+    """
+    admin / mas 组视为管理员。
+    """
+    return has_group(user, *ADMIN_GROUPS)
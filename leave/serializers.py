@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
 from .models import Leave, StudentProfile, Class
+from .roles import get_group_names
+from .authentication import get_db_user, revoke_user_tokens
 import pytz
 from datetime import datetime
 from django.db import transaction
@@ -70,40 +72,36 @@ class LeaveSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        # 保持原有的 create 方法
-        validated_data['student'] = self.context['request'].user
-
-        # 获取 student 的 class_name
-        if hasattr(validated_data['student'], 'studentprofile') and validated_data['student'].studentprofile.assigned_class:
-            assigned_class = validated_data['student'].studentprofile.assigned_class
-            leave_instance = Leave.objects.create(**validated_data)
-            leave_instance.class_name = assigned_class.name  # 手动设置 class_name
-            
-            # 设置辅导员
-            advisor = validated_data['student'].studentprofile.advisor
-            leave_instance.advisor = advisor
-            leave_instance.save()
-            
-            # 计算请假天数
-            start_date = leave_instance.start_date
-            end_date = leave_instance.end_date
-            # 假设 start_date 和 end_date 是日期字段，不包含时间
-            delta = (end_date - start_date).days + 1  # 包含开始和结束日期
-
-            # 设置 status 根据请假天数
-            if delta >= 7:
-                leave_instance.status = 4  # 时间多于7天，需要二重审批
-            elif 3 <= delta <= 6:
-                leave_instance.status = 0  # 假设 2 表示需要协商
-            elif 1 <= delta <= 2:
-                leave_instance.status = 0  # 假设 1 表示快速审核
-            else:
-                leave_instance.status = 0  # 默认状态
-
-            leave_instance.save()  # 保存实例
-            return leave_instance
-        else:
-            raise serializers.ValidationError("User profile or assigned class is not set.")
+        """
+        先算好辅导员与状态，再一次 INSERT 写入；学生档案、班级、辅导员用一条查询取回。
+        """
+        user = self.context['request'].user
+        with transaction.atomic():
+            profile = StudentProfile.objects.select_related(
+                'user', 'assigned_class', 'advisor'
+            ).filter(user_id=user.id).first()
+            if profile is None or profile.assigned_class is None:
+                raise serializers.ValidationError("User profile or assigned class is not set.")
+
+            student = profile.user
+            student.studentprofile = profile  # 缓存反向关联，序列化输出时不再查询
+            validated_data['student'] = student
+            validated_data['advisor'] = profile.advisor  # 设置辅导员
+            validated_data['status'] = leave_status_for(
+                validated_data['start_date'], validated_data['end_date']
+            )
+            return Leave.objects.create(**validated_data)
+
+
+def leave_status_for(start_date, end_date):
+    """
+    根据请假天数决定初始状态：7 天及以上需要二重审批（4），其余待批准（0）。
+    """
+    delta = (end_date - start_date).days + 1  # 包含开始和结束日期
+    if delta >= 7:
+        return 4  # 时间多于7天，需要二重审批
+    return 0
+
 
 # 其他序列化器保持不变
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -153,7 +151,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
             return None
     
     def get_user_group(self, obj):
-        return obj.groups.first().name if obj.groups.first() else None
+        group_names = get_group_names(obj)
+        return group_names[0] if group_names else None
 
 # leave/serializers.py
 
@@ -166,7 +165,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     # confirmNewPassword = serializers.CharField(required=True, write_only=True, style={'input_type': 'password'})
 
     def validate_currentPassword(self, value):
-        user = self.context['request'].user
+        user = get_db_user(self.context['request'].user)
         if not user.check_password(value):
             raise serializers.ValidationError("当前密码不正确。")
         return value
@@ -180,9 +179,10 @@ class ChangePasswordSerializer(serializers.Serializer):
         return value
 
     def save(self, **kwargs):
-        user = self.context['request'].user
+        user = get_db_user(self.context['request'].user)
         user.set_password(self.validated_data['newPassword'])
         user.save()
+        revoke_user_tokens(user.id)
         return user
 
 #添加学生功能方面代码
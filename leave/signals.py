@@ -1,8 +1,22 @@
+from django.conf import settings
 from django.db import transaction
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
 from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import StudentProfile, TeacherProfile
+from django.contrib.auth.models import Group, User
+from .models import Class, Leave, StudentProfile, TeacherProfile
+from .authentication import revoke_user_tokens
+from .statistics import (
+    apply_leave_delta, apply_leave_deltas, class_leave_count, leave_stat_keys, move_class_count, move_class_stat,
+    student_class_name,
+)
+from .stats_cache import invalidate_blocks
+from .qrcodes import prerender_leave_qrcode
+from .advisors import sync_leave_advisors
+from .state_machine import APPROVED, leave_status_changed
+from .verification import (
+    invalidate_class_verifications, invalidate_student_verifications, invalidate_user_verifications,
+    invalidate_verification,
+)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -15,6 +29,14 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(m2m_changed, sender=User.groups.through)
 def manage_user_profile(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse:
+        # group.user_set.add/remove/clear：instance 是组，pk_set 是用户 id
+        revoke_group_member_tokens(instance, action, pk_set)
+        return
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # 组成员变化后丢弃 roles.get_group_names 缓存的组名，令牌中的组声明也随之失效
+        instance.__dict__.pop('_leave_group_names', None)
+        revoke_user_tokens(instance.pk)
     if action == 'post_add':
         with transaction.atomic():
             for group in instance.groups.filter(pk__in=pk_set):
@@ -28,4 +50,234 @@ def manage_user_profile(sender, instance, action, reverse, model, pk_set, **kwar
                 if group.name == 'stu' and hasattr(instance, 'studentprofile'):
                     instance.studentprofile.delete()
                 elif group.name == 'tch' and hasattr(instance, 'teacherprofile'):
-                    instance.teacherprofile.delete()
\ No newline at end of file
+                    instance.teacherprofile.delete()
+
+
+def revoke_group_member_tokens(group, action, pk_set):
+    if action == 'pre_clear':
+        # post_clear 时 pk_set 为 None，成员关系也已删除，先记下成员
+        group._cleared_user_ids = list(group.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        revoke_user_tokens(*pk_set)
+    elif action == 'post_clear':
+        revoke_user_tokens(*group.__dict__.pop('_cleared_user_ids', ()))
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_group_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if not raw and instance.pk is not None:
+        instance._previous_name = Group.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def revoke_renamed_group_tokens(sender, instance, created, **kwargs):
+    # 组改名后，成员令牌中的组名声明已不对应任何组
+    previous = getattr(instance, '_previous_name', None)
+    if previous is not None and previous != instance.name:
+        revoke_user_tokens(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_deleted_group_members(sender, instance, **kwargs):
+    # 删除组时成员关系由级联删除，不触发 m2m_changed
+    instance._deleted_user_ids = list(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def revoke_deleted_group_tokens(sender, instance, **kwargs):
+    revoke_user_tokens(*getattr(instance, '_deleted_user_ids', ()))
+
+
+@receiver(post_save, sender=User)
+def revoke_inactive_user_tokens(sender, instance, created, **kwargs):
+    if not created and not instance.is_active:
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+# ==========================================
+# 统计汇总表的增量维护
+# ==========================================
+
+def _leave_class_name(leave):
+    """
+    优先使用已缓存的 学生 -> 档案 -> 班级 关联（LeaveSerializer.create 会预加载），否则查询一次。
+    """
+    if Leave.student.is_cached(leave):
+        student = leave.student
+        if User.studentprofile.is_cached(student):
+            profile = student.studentprofile
+            if profile.assigned_class_id is None:
+                return ''
+            if StudentProfile.assigned_class.is_cached(profile):
+                return profile.assigned_class.name
+    return student_class_name(leave.student_id)
+
+
+@receiver(post_save, sender=Leave)
+def update_leave_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_stats_snapshot', None)
+    new = instance.stats_snapshot()
+    instance._stats_snapshot = new
+    if created:
+        apply_leave_delta(leave_stat_keys(*new, _leave_class_name(instance)), 1)
+        invalidate_blocks()
+    elif old is not None and old != new:
+        # 审批等只改 status 的保存不会走到这里，看板缓存也不失效
+        old_class = student_class_name(old[0]) if old[0] != new[0] else _leave_class_name(instance)
+        apply_leave_deltas([
+            (leave_stat_keys(*old, old_class), -1),
+            (leave_stat_keys(*new, _leave_class_name(instance)), 1),
+        ])
+        invalidate_blocks()
+
+
+@receiver(pre_delete, sender=Leave)
+def remember_deleted_leave_stats(sender, instance, **kwargs):
+    # 级联删除学生时档案可能先于假条被删，所以在 pre_delete 阶段取班级
+    instance._stats_delete_keys = leave_stat_keys(*instance.stats_snapshot(), _leave_class_name(instance))
+
+
+@receiver(post_delete, sender=Leave)
+def remove_deleted_leave_stats(sender, instance, **kwargs):
+    keys = getattr(instance, '_stats_delete_keys', None)
+    if keys is not None:
+        apply_leave_delta(keys, -1)
+        invalidate_blocks()
+
+
+@receiver(pre_save, sender=StudentProfile)
+def remember_previous_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    # 记录保存前的班级与辅导员，供统计汇总表与 Leave.advisor 同步使用
+    instance._previous_profile = None
+    watched = {'assigned_class', 'assigned_class_id', 'advisor', 'advisor_id'}
+    if raw or instance.pk is None or (update_fields is not None and not watched & set(update_fields)):
+        return
+    instance._previous_profile = StudentProfile.objects.filter(pk=instance.pk).values_list(
+        'assigned_class_id', 'assigned_class__name', 'advisor_id'
+    ).first()
+
+
+@receiver(post_save, sender=StudentProfile)
+def move_leave_class_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_profile', None)
+    if previous is None or previous[0] == instance.assigned_class_id:
+        return
+    new_name = instance.assigned_class.name if instance.assigned_class_id else ''
+    move_class_count(instance.user_id, previous[1] or '', new_name)
+    invalidate_blocks('class_stats')
+
+
+@receiver(post_save, sender=StudentProfile)
+def sync_moved_student_leaves(sender, instance, created, **kwargs):
+    # 换辅导员后，该学生的假条随之转到新辅导员名下（教师列表按 Leave.advisor 过滤）
+    previous = getattr(instance, '_previous_profile', None)
+    if previous is not None and previous[2] != instance.advisor_id:
+        sync_leave_advisors([instance.user_id])
+
+
+@receiver(pre_save, sender=Class)
+def remember_previous_class_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_previous_name = None
+    if raw or instance.pk is None or (update_fields is not None and 'name' not in update_fields):
+        return
+    instance._stats_previous_name = Class.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Class)
+def rename_leave_class_stats(sender, instance, created, **kwargs):
+    # 汇总表按班级名称计数，改名时把计数移到新名称下
+    previous = getattr(instance, '_stats_previous_name', None)
+    if previous is not None and previous != instance.name:
+        move_class_stat(class_leave_count(instance.pk), previous, instance.name)
+        invalidate_blocks('class_stats')
+
+
+@receiver(pre_delete, sender=Class)
+def remember_deleted_class_stats(sender, instance, **kwargs):
+    # 删除班级时学生档案由 SET_NULL 批量置空，不触发档案的 save 信号，先记下该班的假条数
+    instance._stats_leave_count = class_leave_count(instance.pk)
+
+
+@receiver(post_delete, sender=Class)
+def remove_deleted_class_stats(sender, instance, **kwargs):
+    move_class_stat(getattr(instance, '_stats_leave_count', 0), instance.name, '')
+    invalidate_blocks('class_stats')
+
+
+# ==========================================
+# 防伪二维码与防伪查询缓存
+# ==========================================
+
+@receiver(post_save, sender=Leave)
+def prerender_approved_qrcode(sender, instance, created, raw=False, **kwargs):
+    # 假条批准后预生成二维码（LEAVE_QRCODE_PRERENDER），事务提交后执行，不拖慢审批请求的事务
+    if raw or instance.status != 1 or not getattr(settings, 'LEAVE_QRCODE_PRERENDER', False):
+        return
+    uuid = instance.verification_uuid
+    transaction.on_commit(lambda: prerender_leave_qrcode(uuid))
+
+
+@receiver(post_save, sender=Leave)
+@receiver(post_delete, sender=Leave)
+def invalidate_leave_verification(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_verification(instance.verification_uuid)
+
+
+@receiver(post_save, sender=StudentProfile)
+def invalidate_profile_verifications(sender, instance, created, raw=False, **kwargs):
+    # 防伪页面展示学生班级、辅导员；新建档案时还没有假条
+    if not raw and not created:
+        invalidate_student_verifications(instance.user_id)
+
+
+@receiver(leave_status_changed)
+def handle_leave_status_changed(sender, leaves, target, **kwargs):
+    # 状态机用 QuerySet.update 迁移状态，不会触发上面的 post_save
+    uuids = [uuid for _, uuid in leaves]
+    invalidate_verification(*uuids)
+    if target == APPROVED and getattr(settings, 'LEAVE_QRCODE_PRERENDER', False):
+        transaction.on_commit(lambda: [prerender_leave_qrcode(uuid) for uuid in uuids])
+
+
+# 防伪页面展示的用户字段
+VERIFIED_USER_FIELDS = ('username', 'last_name', 'email')
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_verified_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._verify_previous = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(VERIFIED_USER_FIELDS):
+        return  # 如登录时只更新 last_login
+    instance._verify_previous = User.objects.filter(pk=instance.pk).values_list(*VERIFIED_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_renamed_user_verifications(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_verify_previous', None)
+    if previous is not None and previous != tuple(getattr(instance, field) for field in VERIFIED_USER_FIELDS):
+        invalidate_user_verifications(instance.pk)
+
+
+@receiver(post_save, sender=Class)
+def invalidate_renamed_class_verifications(sender, instance, created, **kwargs):
+    # 旧名称由 remember_previous_class_name 记录
+    previous = getattr(instance, '_stats_previous_name', None)
+    if previous is not None and previous != instance.name:
+        invalidate_class_verifications(instance.pk)
+
+
+@receiver(pre_delete, sender=Class)
+def invalidate_deleted_class_verifications(sender, instance, **kwargs):
+    # 学生档案随后由 SET_NULL 批量置空，不触发档案的 save 信号
+    invalidate_class_verifications(instance.pk)
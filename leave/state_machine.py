@@ -0,0 +1,135 @@
+# leave/state_machine.py
+"""
+假条状态机（状态码见 models.py）：
+ 0:未批准  1:已批准  2:已驳回  3:已销假  4:待审核（长假）  5:已审核（初审通过）
+
+状态迁移用带条件的 UPDATE 完成（WHERE status IN 允许的源状态），不读取整行再 save，
+两个审批人同时操作同一假条时只有一个能成功。
+QuerySet.update 不触发 post_save，迁移成功后发送 leave_status_changed 信号，
+防伪查询缓存、二维码预生成等在 signals 中响应。
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Leave
+
+PENDING = 0
+APPROVED = 1
+REJECTED = 2
+COMPLETED = 3
+AWAITING_REVIEW = 4
+REVIEWED = 5
+
+# sets_approver：迁移时是否把操作人记为 approver
+Transition = namedtuple('Transition', ['name', 'sources', 'target', 'sets_approver'])
+
+TRANSITIONS = {
+    t.name: t for t in (
+        Transition('approve', (PENDING, AWAITING_REVIEW, REVIEWED), APPROVED, True),
+        Transition('pre_approve', (AWAITING_REVIEW,), REVIEWED, True),
+        Transition('mas_approve', (AWAITING_REVIEW, REVIEWED), APPROVED, True),
+        Transition('reject', (PENDING, AWAITING_REVIEW), REJECTED, True),
+        Transition('complete', (APPROVED,), COMPLETED, False),
+    )
+}
+
+# 参数：leaves=[(id, verification_uuid), ...]，target=新状态
+leave_status_changed = Signal()
+
+# 批量迁移的结果
+OK = 'ok'
+NOT_FOUND = 'not_found'
+INVALID_STATE = 'invalid_state'
+
+
+def transition_values(transition, approver=None, reject_reason=None):
+    """
+    迁移要写入的列：只有 status 与少数相关列，不回写整行。
+    """
+    values = {'status': transition.target}
+    if transition.sets_approver:
+        values['approver'] = approver or ''
+    if reject_reason:
+        values['reject_reason'] = reject_reason
+    return values
+
+
+def _send_changed(leaves, target):
+    if leaves:
+        leave_status_changed.send(sender=Leave, leaves=leaves, target=target)
+
+
+def transition_leave(transition, leave_id, approver=None, reject_reason=None, queryset=None):
+    """
+    对单个假条执行迁移（compare-and-set），返回 (结果, 当前状态)。
+    UPDATE ... WHERE id = %s AND status IN (源状态)，影响行数为 1 即迁移成功；
+    为 0 时再查一次当前状态，区分假条不存在与状态不允许。
+    """
+    scope = Leave.objects.all() if queryset is None else queryset
+    with transaction.atomic():
+        won = scope.filter(id=leave_id, status__in=transition.sources).update(
+            **transition_values(transition, approver, reject_reason)
+        )
+        if won:
+            uuid = Leave.objects.filter(id=leave_id).values_list('verification_uuid', flat=True).get()
+            _send_changed([(leave_id, uuid)], transition.target)
+            return OK, transition.target
+    current = scope.filter(id=leave_id).values_list('status', flat=True).first()
+    if current is None:
+        return NOT_FOUND, None
+    return INVALID_STATE, current
+
+
+def apply_batch_transition(transition, leave_ids, approver=None, reject_reason=None, queryset=None):
+    """
+    对一批假条执行同一个迁移，返回 (更新条数, [{'id', 'result', 'status'?}, ...])。
+    在事务中先锁定并读取这些假条的当前状态用于逐条说明结果，再用一条带条件的 UPDATE 写入。
+    queryset 限定可操作范围（如教师只能操作自己学生的假条），范围外的 id 视为不存在。
+
+    SQLite 上 select_for_update 不加锁（LEAVE_SQLITE_TRANSACTION_MODE 为空时事务也不是 IMMEDIATE），
+    读取与 UPDATE 之间其他事务可能已迁移了其中一些假条。这时 UPDATE 影响行数少于预期：
+    回滚到保存点，逐条 compare-and-set，只有真正由本次 UPDATE 改动的假条算成功并发送信号。
+    """
+    ids = list(dict.fromkeys(leave_ids))
+    scope = Leave.objects.all() if queryset is None else queryset
+    values = transition_values(transition, approver, reject_reason)
+    with transaction.atomic():
+        current = {
+            leave_id: (status, uuid)
+            for leave_id, status, uuid in scope.select_for_update().filter(id__in=ids)
+            .values_list('id', 'status', 'verification_uuid')
+        }
+        allowed = [leave_id for leave_id in ids if leave_id in current and current[leave_id][0] in transition.sources]
+        changed = allowed
+        if allowed:
+            sid = transaction.savepoint()
+            updated = Leave.objects.filter(id__in=allowed, status__in=transition.sources).update(**values)
+            if updated == len(allowed):
+                transaction.savepoint_commit(sid)
+            else:
+                transaction.savepoint_rollback(sid)
+                changed = [
+                    leave_id for leave_id in allowed
+                    if Leave.objects.filter(id=leave_id, status__in=transition.sources).update(**values)
+                ]
+                lost = set(allowed) - set(changed)
+                for leave_id in lost:
+                    current.pop(leave_id)
+                current.update(
+                    (leave_id, (status, uuid))
+                    for leave_id, status, uuid in Leave.objects.filter(id__in=lost)
+                    .values_list('id', 'status', 'verification_uuid')
+                )
+        _send_changed([(leave_id, current[leave_id][1]) for leave_id in changed], transition.target)
+
+    results = []
+    for leave_id in ids:
+        if leave_id not in current:
+            results.append({'id': leave_id, 'result': NOT_FOUND})
+        elif leave_id in changed:
+            results.append({'id': leave_id, 'result': OK})
+        else:
+            results.append({'id': leave_id, 'result': INVALID_STATE, 'status': current[leave_id][0]})
+    return len(changed), results
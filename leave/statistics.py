@@ -0,0 +1,358 @@
+# leave/statistics.py
+"""
+数据看板统计：
+- live_*    ：直接在 Leave 表上聚合（全表扫描），用于重建汇总表或 LEAVE_STATS_SOURCE='live'
+- summary_* ：读取汇总表，耗时与桶数成正比
+- 增量维护  ：signals 在 Leave 增删改时调用 apply_leave_deltas，事务提交后合并写入汇总表
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import ExtractMonth, ExtractWeekDay, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Leave, LeaveClassStat, LeaveDailyStat, LeaveDurationStat, LeaveHeatmapStat, StudentProfile,
+)
+
+logger = logging.getLogger(__name__)
+
+SMOOTHING_WINDOW = 3
+
+# 时长分段边界（天）：(1, 3) 即 1天以内 / 1-3天 / 3天以上
+DEFAULT_DURATION_BUCKETS = (1, 3)
+
+
+def get_stats_source():
+    return getattr(settings, 'LEAVE_STATS_SOURCE', 'summary')
+
+
+def get_duration_buckets():
+    boundaries = tuple(getattr(settings, 'LEAVE_DURATION_BUCKETS', DEFAULT_DURATION_BUCKETS))
+    if not boundaries or list(boundaries) != sorted(set(boundaries)) or boundaries[0] <= 0:
+        raise ValueError(f'LEAVE_DURATION_BUCKETS 必须是递增的正整数天数: {boundaries!r}')
+    return boundaries
+
+
+def duration_bucket_labels(boundaries):
+    labels = [f'{boundaries[0]}天以内']
+    labels += [f'{low}-{high}天' for low, high in zip(boundaries, boundaries[1:])]
+    labels.append(f'{boundaries[-1]}天以上')
+    return labels
+
+
+# ==========================================
+# 单条假条对应的统计键
+# ==========================================
+
+def student_class_name(student_id):
+    """
+    学生当前班级名称，未分班返回 ''。
+    """
+    name = StudentProfile.objects.filter(user_id=student_id).values_list('assigned_class__name', flat=True).first()
+    return name or ''
+
+
+def leave_stat_keys(student_id, start_date, end_date, class_name):
+    """
+    一条假条在各汇总表中对应的键。
+    """
+    local_start = timezone.localtime(start_date)
+    duration = end_date - start_date
+    return {
+        'class_name': class_name,
+        'date': local_start.date(),
+        'days': duration.days if duration else None,
+        'heatmap': (local_start.month, local_start.isoweekday() % 7 + 1),
+    }
+
+
+def _bump(model, lookup, delta):
+    """
+    计数 += delta；行不存在时创建。
+    """
+    if model.objects.filter(**lookup).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # 并发下其他请求刚创建了这一行
+        model.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def leave_delta_rows(keys):
+    """
+    一条假条的统计键对应的汇总行：(模型, 查找条件) 列表。
+    """
+    month, weekday = keys['heatmap']
+    rows = [
+        (LeaveClassStat, (('class_name', keys['class_name']),)),
+        (LeaveDailyStat, (('date', keys['date']),)),
+        (LeaveHeatmapStat, (('month', month), ('weekday', weekday))),
+    ]
+    if keys['days'] is not None:
+        rows.append((LeaveDurationStat, (('days', keys['days']),)))
+    return rows
+
+
+def write_stat_deltas(totals):
+    """
+    在一个短事务内把 {(模型, 查找条件): delta} 计入汇总表，按固定顺序更新，避免并发写入互相死锁。
+    """
+    with transaction.atomic():
+        for (model, lookup), delta in sorted(totals.items(), key=lambda item: (item[0][0]._meta.label, item[0][1])):
+            _bump(model, dict(lookup), delta)
+
+
+def _write_stat_deltas_logged(totals):
+    try:
+        write_stat_deltas(totals)
+    except Exception:
+        logger.exception('统计汇总表增量写入失败，可运行 rebuild_leave_stats 重建')
+
+
+def apply_leave_deltas(changes):
+    """
+    把若干 (统计键, delta) 合并后登记到当前事务，提交后用一个短事务写入汇总表。
+
+    当天、班级、热力图格子几乎是每次提交请假都会更新的热点行，放在提交请假的事务里会让并发提交排队；
+    提交后再写，请假事务只有一次 INSERT。净增量为 0 的行（修改假条但班级未变等）不写。
+    事务回滚时回调不执行，增量随之丢弃；写入失败只记日志，不影响已提交的请假，汇总表可用 rebuild_leave_stats 重建。
+    """
+    totals = Counter()
+    for keys, delta in changes:
+        for row in leave_delta_rows(keys):
+            totals[row] += delta
+    totals = {row: delta for row, delta in totals.items() if delta}
+    if totals:
+        transaction.on_commit(lambda: _write_stat_deltas_logged(totals))
+
+
+def apply_leave_delta(keys, delta):
+    """
+    把一条假条的统计键按 delta（+1 / -1）计入汇总表（事务提交后写入，见 apply_leave_deltas）。
+    """
+    apply_leave_deltas([(keys, delta)])
+
+
+def move_class_stat(count, old_class_name, new_class_name):
+    """
+    把 count 条假条的计数从旧班级名称移到新名称（'' 表示未分班）。
+    """
+    if count and old_class_name != new_class_name:
+        with transaction.atomic():
+            _bump(LeaveClassStat, {'class_name': old_class_name}, -count)
+            _bump(LeaveClassStat, {'class_name': new_class_name}, count)
+
+
+def move_class_count(student_id, old_class_name, new_class_name):
+    """
+    学生换班后，把其假条数从旧班级移到新班级。
+    """
+    if old_class_name != new_class_name:
+        move_class_stat(Leave.objects.filter(student_id=student_id).count(), old_class_name, new_class_name)
+
+
+def class_leave_count(class_id):
+    """
+    班级当前学生的假条总数。
+    """
+    return Leave.objects.filter(student__studentprofile__assigned_class_id=class_id).count()
+
+
+# ==========================================
+# 直接在 Leave 表上聚合
+# ==========================================
+
+def live_class_counts(queryset):
+    return list(
+        queryset.values(name=F('student__studentprofile__assigned_class__name'))
+        .annotate(value=Count('id')).order_by('-value')
+    )
+
+
+def live_daily_counts(queryset):
+    return [
+        (entry['date'], entry['count'])
+        for entry in queryset.annotate(date=TruncDate('start_date'))
+        .values('date').annotate(count=Count('id')).order_by('date')
+    ]
+
+
+def with_duration(queryset):
+    return queryset.annotate(
+        duration=ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField())
+    )
+
+
+def live_duration_days(queryset):
+    """
+    时长（整天数）直方图 {days: count}，时长为 0 的假条不计入；仅用于重建汇总表。
+    """
+    histogram = {}
+    for duration in with_duration(queryset).values_list('duration', flat=True):
+        if not duration:
+            continue
+        histogram[duration.days] = histogram.get(duration.days, 0) + 1
+    return histogram
+
+
+def live_duration_buckets(queryset, boundaries):
+    """
+    在数据库内用条件聚合完成时长分段，一次查询返回每段的数量。
+    与原 Python 循环口径一致：时长为 0 不计入，按 duration.days（向下取整）分段。
+    """
+    nonzero = ~Q(duration=timedelta(0))
+    edges = [timedelta(days=days) for days in boundaries]
+    filters = [nonzero & Q(duration__lt=edges[0])]
+    filters += [Q(duration__gte=low, duration__lt=high) for low, high in zip(edges, edges[1:])]
+    filters.append(Q(duration__gte=edges[-1]))
+    totals = with_duration(queryset).aggregate(**{
+        f'bucket_{i}': Count('id', filter=condition) for i, condition in enumerate(filters)
+    })
+    return [totals[f'bucket_{i}'] for i in range(len(filters))]
+
+
+def histogram_buckets(histogram, boundaries):
+    """
+    把整天数直方图按边界分段（读取汇总表时使用）。
+    """
+    counts = [0] * (len(boundaries) + 1)
+    for days, count in histogram.items():
+        index = 0
+        while index < len(boundaries) and days >= boundaries[index]:
+            index += 1
+        counts[index] += count
+    return counts
+
+
+def live_heatmap(queryset):
+    return list(
+        queryset.annotate(month=ExtractMonth('start_date'), weekday=ExtractWeekDay('start_date'))
+        .values('month', 'weekday').annotate(count=Count('id'))
+    )
+
+
+def rebuild_summaries():
+    """
+    全量重建汇总表（部署初始化、定时校正时使用）。
+    """
+    queryset = Leave.objects.all()
+    with transaction.atomic():
+        for model in (LeaveClassStat, LeaveDailyStat, LeaveDurationStat, LeaveHeatmapStat):
+            model.objects.all().delete()
+        LeaveClassStat.objects.bulk_create([
+            LeaveClassStat(class_name=row['name'] or '', count=row['value'])
+            for row in live_class_counts(queryset)
+        ])
+        LeaveDailyStat.objects.bulk_create([
+            LeaveDailyStat(date=date, count=count) for date, count in live_daily_counts(queryset)
+        ])
+        LeaveDurationStat.objects.bulk_create([
+            LeaveDurationStat(days=days, count=count) for days, count in live_duration_days(queryset).items()
+        ])
+        LeaveHeatmapStat.objects.bulk_create([
+            LeaveHeatmapStat(**row) for row in live_heatmap(queryset)
+        ])
+
+
+# ==========================================
+# 读取汇总表
+# ==========================================
+
+def summary_class_counts():
+    return [
+        {'name': row['class_name'] or None, 'value': row['count']}
+        for row in LeaveClassStat.objects.filter(count__gt=0).order_by('-count').values('class_name', 'count')
+    ]
+
+
+def summary_daily_counts():
+    return list(LeaveDailyStat.objects.filter(count__gt=0).order_by('date').values_list('date', 'count'))
+
+
+def summary_duration_days():
+    return dict(LeaveDurationStat.objects.filter(count__gt=0).values_list('days', 'count'))
+
+
+def summary_heatmap():
+    return list(LeaveHeatmapStat.objects.filter(count__gt=0).values('month', 'weekday', 'count'))
+
+
+# ==========================================
+# 看板各区块
+# ==========================================
+
+def smooth(counts, window_size=SMOOTHING_WINDOW):
+    """
+    “滤波预测”：滑动平均。
+    """
+    smoothed_counts = []
+    for i in range(len(counts)):
+        window = counts[max(0, i - window_size + 1): i + 1]
+        smoothed_counts.append(round(sum(window) / len(window), 2))
+    return smoothed_counts
+
+
+def trend_block(daily):
+    dates = [date.strftime('%Y-%m-%d') for date, _ in daily]
+    counts = [count for _, count in daily]
+    return {'dates': dates, 'real_values': counts, 'predict_values': smooth(counts)}
+
+
+def duration_block(counts, boundaries):
+    return [
+        {"name": label, "value": count}
+        for label, count in zip(duration_bucket_labels(boundaries), counts)
+    ]
+
+
+def is_live(source):
+    return (source or get_stats_source()) == 'live'
+
+
+def class_stats_block(source=None):
+    # 维度 1: 班级/年级统计
+    return live_class_counts(Leave.objects.all()) if is_live(source) else summary_class_counts()
+
+
+def trend_data_block(source=None):
+    # 维度 2 + 3: 日 K 线走势与平滑预测
+    daily = live_daily_counts(Leave.objects.all()) if is_live(source) else summary_daily_counts()
+    return trend_block(daily)
+
+
+def duration_stats_block(source=None):
+    # 维度 4: 时长分段统计
+    boundaries = get_duration_buckets()
+    if is_live(source):
+        durations = live_duration_buckets(Leave.objects.all(), boundaries)
+    else:
+        durations = histogram_buckets(summary_duration_days(), boundaries)
+    return duration_block(durations, boundaries)
+
+
+def heatmap_data_block(source=None):
+    # 维度 5: 高发期热力图
+    return live_heatmap(Leave.objects.all()) if is_live(source) else summary_heatmap()
+
+
+# 看板响应中的各区块，键名即响应字段名
+DASHBOARD_BLOCKS = {
+    'class_stats': class_stats_block,
+    'trend_data': trend_data_block,
+    'duration_stats': duration_stats_block,
+    'heatmap_data': heatmap_data_block,
+}
+
+
+def build_dashboard(source=None):
+    """
+    组装看板接口的完整响应数据（不经缓存）。
+    """
+    return {name: builder(source) for name, builder in DASHBOARD_BLOCKS.items()}
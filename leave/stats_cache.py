@@ -0,0 +1,156 @@
+# leave/stats_cache.py
+"""
+数据看板的分区块版本化缓存：
+- 每个区块（class_stats / trend_data / ...）单独缓存，值附带写入时的版本号
+- Leave 写入后（事务提交时）只更换受影响区块的版本号，旧值随即失效
+- 防击穿：版本失效后只有拿到锁的 worker 重算，其余 worker 先返回旧值；
+  没有旧值时短暂等待持锁者写入，超时再自行计算。
+  FileBasedCache.add 是先 has_key 再 set，并非原子操作，文件缓存时锁改用 O_CREAT | O_EXCL 创建的锁文件
+
+缓存后端为 settings.CACHES 中的 LEAVE_STATS_CACHE_ALIAS（默认 'statistics'），
+可通过 LEAVE_STATS_CACHE_BACKEND 选择 locmem 或 file。
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import transaction
+
+from .statistics import DASHBOARD_BLOCKS
+
+LOCK_TIMEOUT = 30  # 重算锁的最长持有时间（秒）
+WAIT_TIMEOUT = 5  # 无旧值时等待其他 worker 重算的最长时间（秒）
+WAIT_INTERVAL = 0.05
+
+
+def stats_cache():
+    return caches[getattr(settings, 'LEAVE_STATS_CACHE_ALIAS', 'statistics')]
+
+
+def _version_key(block):
+    return f'leave:stats:{block}:version'
+
+
+def _data_key(block):
+    return f'leave:stats:{block}:data'
+
+
+def _lock_key(block):
+    return f'leave:stats:{block}:lock'
+
+
+def _lock_path(cache, block):
+    """
+    文件缓存的锁文件路径：放在缓存目录下，不是 .djcache 文件，不参与淘汰与 clear。其他后端返回 None。
+    """
+    if isinstance(cache, FileBasedCache):
+        return os.path.join(cache._dir, f'{block}.lock')
+    return None
+
+
+def _break_stale_lock(path):
+    """
+    持有超过 LOCK_TIMEOUT 的锁文件视为持有者已崩溃：改名后删除（并发时只有一个 worker 改名成功）。
+    返回 True 表示可以重试加锁。
+    """
+    try:
+        if time.time() - os.path.getmtime(path) < LOCK_TIMEOUT:
+            return False
+        stale = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        os.rename(path, stale)
+        os.remove(stale)
+    except FileNotFoundError:
+        pass  # 持有者刚释放，或其他 worker 已清理
+    return True
+
+
+def acquire_lock(cache, block):
+    """
+    获取区块重算锁，成功返回 True。多个进程同时调用时只有一个成功。
+    文件缓存用 O_EXCL 锁文件；locmem 等后端的 add 本身是原子的。
+    """
+    path = _lock_path(cache, block)
+    if path is None:
+        return cache.add(_lock_key(block), 1, LOCK_TIMEOUT)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            if not _break_stale_lock(path):
+                return False
+    return False
+
+
+def release_lock(cache, block):
+    path = _lock_path(cache, block)
+    if path is None:
+        cache.delete(_lock_key(block))
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def block_version(block):
+    """
+    区块当前版本号；版本记录丢失（被淘汰）时生成新版本，旧数据自然失效。
+    """
+    cache = stats_cache()
+    version = cache.get(_version_key(block))
+    if version is None:
+        cache.add(_version_key(block), time.time_ns(), None)
+        version = cache.get(_version_key(block))
+    return version
+
+
+def invalidate_blocks(*blocks):
+    """
+    更换区块版本号。在事务提交后执行，避免其他 worker 用未提交前的数据按新版本回填缓存。
+    """
+    blocks = blocks or tuple(DASHBOARD_BLOCKS)
+
+    def bump():
+        cache = stats_cache()
+        for block in blocks:
+            cache.set(_version_key(block), time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def get_block(block):
+    """
+    读取一个区块，缓存失效时按防击穿策略重算。
+    """
+    cache = stats_cache()
+    version = block_version(block)
+    entry = cache.get(_data_key(block))
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    if acquire_lock(cache, block):
+        try:
+            value = DASHBOARD_BLOCKS[block]()
+            cache.set(_data_key(block), (version, value), getattr(settings, 'LEAVE_STATS_CACHE_TIMEOUT', 3600))
+        finally:
+            release_lock(cache, block)
+        return value
+
+    # 其他 worker 正在重算：有旧值先返回旧值
+    if entry is not None:
+        return entry[1]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(_data_key(block))
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    return DASHBOARD_BLOCKS[block]()
+
+
+def cached_dashboard():
+    return {block: get_block(block) for block in DASHBOARD_BLOCKS}
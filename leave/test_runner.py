@@ -0,0 +1,26 @@
+# leave/test_runner.py
+"""
+测试运行器：运行测试期间所有缓存别名改用进程内缓存。
+
+Django 的 FileBasedCache 构造时就创建目录，而系统检查会实例化 settings.CACHES 中的每个别名；
+不替换的话每次运行测试都会在 LEAVE_CACHE_DIR（默认为仓库下的 cache/）中建目录、写入吊销记录。
+需要真实文件缓存的用例自行用 override_settings 指向临时目录。
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class LeaveTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches_override = override_settings(CACHES={
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+            for alias in settings.CACHES
+        })
+        self._caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches_override.disable()
+        super().teardown_test_environment(**kwargs)
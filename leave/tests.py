@@ -1,3 +1,1523 @@
-from django.test import TestCase
+from unittest import mock
+import csv
+import io
+import os
+import tempfile
+import random
+import threading
+import time
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User, Group
+from django.core.management import CommandError, call_command
+from django.core.cache import caches
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import DurationField, ExpressionWrapper, F
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .advisors import sync_leave_advisors
+from .cache_backends import BoundedFileBasedCache
+from .compact_serializer import leave_rows, serialize_leave_rows
+from .authentication import ClaimsJWTAuthentication, TokenBackedUser, issue_tokens, revoke_user_tokens
+from .models import Leave, Class, LeaveClassStat, LeaveDailyStat, StudentProfile
+from .db import sqlite_pragmas
+from .metrics import registry as metrics_registry
+from . import views_async
+from .exporting import EXPORT_COLUMNS
+from .importing import apply_advisor_updates, bulk_import_students, plan_advisor_updates
+from .passwords import make_password_hasher, parallel_hash_passwords, shared_hash_passwords
+from .query_plans import find_table_scans
+from .serializers import LeaveSerializer
+from .state_machine import TRANSITIONS, apply_batch_transition, leave_status_changed
+from .qrcodes import get_qrcode_png, qrcode_etag, render_qrcode, verify_url
+from .stats_cache import LOCK_TIMEOUT, acquire_lock, cached_dashboard, get_block, release_lock, stats_cache
+from .statistics import build_dashboard, histogram_buckets, live_duration_buckets, live_duration_days, rebuild_summaries
+from .verification import load_verification, verify_cache
+from .roles import get_group_names, has_group, is_admin_user
+
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    'revocation': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-revocation'},
+    'verification': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-verification'},
+    'statistics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-statistics'},
+    'qrcode': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-qrcode'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LeaveTestCase(TestCase):
+    """
+    测试基类：使用进程内缓存，每个用例前清空，避免文件缓存在用例之间串数据。
+    """
+
+    def setUp(self):
+        super().setUp()
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+        return client
+
+
+class LeaveFixtureMixin:
+    """
+    构建测试用的班级、辅导员、学生与假条。
+    """
+
+    @classmethod
+    def make_group(cls, name):
+        return Group.objects.get_or_create(name=name)[0]
+
+    @classmethod
+    def make_user(cls, username, group_name, last_name='', **extra):
+        user = User.objects.create_user(username=username, password='123456', last_name=last_name, **extra)
+        user.groups.add(cls.make_group(group_name))  # 信号会创建对应档案
+        return user
+
+    @classmethod
+    def make_student(cls, username, cls_obj, advisor, last_name='学生'):
+        user = cls.make_user(username, 'stu', last_name=last_name, email=f'{username}@example.com')
+        profile = user.studentprofile
+        profile.assigned_class = cls_obj
+        profile.advisor = advisor
+        profile.save()
+        return user
+
+    @classmethod
+    def make_leaves(cls, student, count, status=0, days=1):
+        now = timezone.now()
+        return Leave.objects.bulk_create([
+            Leave(
+                student=student,
+                advisor=student.studentprofile.advisor,
+                start_date=now + timedelta(days=i),
+                end_date=now + timedelta(days=i + days),
+                reason=f'理由{i}',
+                status=status,
+            )
+            for i in range(count)
+        ])
+
+
+class QueryCountAssertionsMixin:
+    """
+    断言分页列表接口每页的查询条数固定，与 page_size 无关。
+    """
+
+    def assertPageQueryCount(self, client, url, expected, page_sizes=(1, 10, 100)):
+        for page_size in page_sizes:
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, {'page_size': page_size})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(
+                len(ctx.captured_queries), expected,
+                f'page_size={page_size} 时执行了 {len(ctx.captured_queries)} 条查询，期望 {expected} 条：\n'
+                + '\n'.join(q['sql'] for q in ctx.captured_queries)
+            )
+
+
+class LeaveListQueryTests(LeaveFixtureMixin, QueryCountAssertionsMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.students = [cls.make_student(f's{i:03d}', cls.class_a, cls.teacher) for i in range(5)]
+        for student in cls.students:
+            cls.make_leaves(student, 30)
+
+    def test_admin_list_query_count_is_constant(self):
+        # 用户与组名来自令牌声明，只剩 COUNT + 分页查询
+        self.assertPageQueryCount(self.client_for(self.admin), '/api/admin/leaves/', 2)
+
+    def test_teacher_list_query_count_is_constant(self):
+        self.assertPageQueryCount(self.client_for(self.teacher), '/api/admin/leaves/', 2)
+
+    def test_student_list_query_count_is_constant(self):
+        self.assertPageQueryCount(self.client_for(self.students[0]), '/api/view-leave/', 2)
+
+    def test_list_payload_includes_related_fields(self):
+        response = self.client_for(self.teacher).get('/api/admin/leaves/', {'page_size': 1})
+        row = response.json()['results'][0]
+        self.assertEqual(row['class_name'], '电气2304')
+        self.assertEqual(row['student_class'], '电气2304')
+        self.assertEqual(row['advisor_name'], '王老师')
+        self.assertEqual(response.json()['count'], 150)
+
+
+class CursorPaginationTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', cls.class_a, cls.teacher)
+        cls.make_leaves(cls.student, 25)
+        # 制造 leave_time 相同的假条，验证 id 作为次序键
+        Leave.objects.update(leave_time=timezone.now())
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.student)
+
+    def walk(self, params):
+        ids, response = [], self.client.get('/api/view-leave/', params).json()
+        ids += [row['id'] for row in response['results']]
+        while response['next']:
+            response = self.client.get('/api/view-leave/', {**params, 'cursor': response['next']}).json()
+            ids += [row['id'] for row in response['results']]
+        return ids, response
+
+    def test_cursor_walk_covers_every_row_once(self):
+        ids, last = self.walk({'pagination': 'cursor', 'page_size': 10})
+        expected = list(Leave.objects.order_by('-leave_time', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(last['count'], 25)
+
+    def test_previous_cursor_returns_preceding_page(self):
+        first = self.client.get('/api/view-leave/', {'pagination': 'cursor', 'page_size': 10}).json()
+        second = self.client.get('/api/view-leave/', {'cursor': first['next'], 'page_size': 10}).json()
+        back = self.client.get('/api/view-leave/', {'cursor': second['previous'], 'page_size': 10}).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_skip_count_omits_count(self):
+        response = self.client.get('/api/view-leave/', {'pagination': 'cursor', 'skip_count': '1'}).json()
+        self.assertNotIn('count', response)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/view-leave/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get('/api/view-leave/', {'page': 2, 'page_size': 10}).json()
+        self.assertEqual((response['count'], response['next'], response['previous']), (25, 3, 1))
+
+
+class RoleResolutionTests(LeaveFixtureMixin, LeaveTestCase):
+
+    def test_group_names_are_loaded_once_per_user_object(self):
+        user = self.make_user('a001', 'admin')
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_admin_user(user))
+            self.assertTrue(has_group(user, 'tch', 'admin'))
+            self.assertFalse(has_group(user, 'stu'))
+
+    def test_group_change_drops_cached_names(self):
+        user = self.make_user('t001', 'tch')
+        self.assertEqual(get_group_names(user), ('tch',))
+        user.groups.add(self.make_group('mas'))
+        self.assertTrue(is_admin_user(user))
+
+
+class ClaimsAuthenticationTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', cls.class_a, cls.teacher, last_name='张三')
+
+    def test_login_token_carries_claims(self):
+        response = self.client.post('/api/token/', {'username': 's001', 'password': '123456'})
+        access = response.json()['access']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        # 只剩分页查询本身，没有 auth_user / auth_group 查询
+        with self.assertNumQueries(1):
+            response = client.get('/api/view-leave/', {'pagination': 'cursor', 'skip_count': '1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_full_user_loaded_on_demand(self):
+        response = self.client_for(self.student).get('/api/user-info/')
+        self.assertEqual(response.json()['email'], 's001@example.com')
+        self.assertEqual(response.json()['user_group'], 'stu')
+
+    def test_submit_leave_with_token_user(self):
+        now = timezone.now()
+        response = self.client_for(self.student).post('/api/request-leave/', {
+            'start_date': now.isoformat(), 'end_date': (now + timedelta(days=1)).isoformat(), 'reason': '回家',
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Leave.objects.get().student, self.student)
+
+    def test_revoked_token_is_rejected(self):
+        client = self.client_for(self.student)
+        revoke_user_tokens(self.student.id)
+        self.assertEqual(client.get('/api/view-leave/').status_code, 401)
+        self.assertEqual(self.client_for(self.student).get('/api/view-leave/').status_code, 200)
+
+    def test_revocation_survives_cache_culling(self):
+        # 真实的文件缓存后端，MAX_ENTRIES 很小：default 写满后会随机淘汰，吊销记录不受影响
+        with tempfile.TemporaryDirectory() as tmp, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                        'LOCATION': os.path.join(tmp, 'default'), 'OPTIONS': {'MAX_ENTRIES': 10}},
+            'revocation': {'BACKEND': 'leave.cache_backends.PersistentFileBasedCache',
+                           'LOCATION': os.path.join(tmp, 'revocation'), 'OPTIONS': {'MAX_ENTRIES': 10}},
+        }):
+            client = self.client_for(self.student)
+            revoke_user_tokens(self.student.id)
+            for i in range(50):
+                caches['default'].set(f'filler-{i}', i)
+                revoke_user_tokens(100000 + i)
+            self.assertEqual(client.get('/api/view-leave/').status_code, 401)
+
+    def test_change_password_returns_fresh_tokens(self):
+        client = self.client_for(self.student)
+        response = client.post('/api/change-password/', {'currentPassword': '123456', 'newPassword': 'pw654321'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/api/view-leave/').status_code, 401)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(client.get('/api/view-leave/').status_code, 200)
+        refreshed = self.client.post('/api/token/refresh/', {'refresh': response.json()['refresh']})
+        self.assertEqual(refreshed.status_code, 200)
+
+    def test_revoked_refresh_token_cannot_be_refreshed(self):
+        refresh = str(issue_tokens(self.student))
+        revoke_user_tokens(self.student.id)
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_group_change_revokes_tokens(self):
+        client = self.client_for(self.teacher)
+        self.teacher.groups.add(self.make_group('admin'))
+        self.assertEqual(client.get('/api/admin/leaves/').status_code, 401)
+
+    def test_reverse_group_change_revokes_tokens(self):
+        admin = self.make_group('admin')
+        for change in (lambda: admin.user_set.add(self.teacher), lambda: admin.user_set.remove(self.teacher),
+                       lambda: admin.user_set.add(self.teacher), admin.user_set.clear):
+            client = self.client_for(self.teacher)
+            change()
+            self.assertEqual(client.get('/api/admin/leaves/').status_code, 401)
+
+    def test_group_rename_and_delete_revoke_member_tokens(self):
+        group = self.make_group('tch')
+        client = self.client_for(self.teacher)
+        group.save()
+        self.assertEqual(client.get('/api/admin/leaves/').status_code, 200)
+        group.name = 'tch-old'
+        group.save()
+        self.assertEqual(client.get('/api/admin/leaves/').status_code, 401)
+        client = self.client_for(self.teacher)
+        group.delete()
+        self.assertEqual(client.get('/api/admin/leaves/').status_code, 401)
+
+    def test_refresh_reads_current_claims(self):
+        refresh = str(issue_tokens(self.teacher))
+        self.teacher.last_name = '王老师（新）'
+        self.teacher.save()
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()['access'])
+        self.assertEqual(access['last_name'], '王老师（新）')
+        self.assertEqual(access['groups'], ['tch'])
+
+    @override_settings(LEAVE_JWT_REVOCATION_CHECK='none')
+    def test_refresh_rejects_inactive_user(self):
+        refresh = str(issue_tokens(self.teacher))
+        self.teacher.is_active = False
+        self.teacher.save()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+        self.teacher.delete()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    @override_settings(LEAVE_JWT_REVOCATION_CHECK='db')
+    def test_db_mode_loads_model_user(self):
+        token = issue_tokens(self.student).access_token
+        user = ClaimsJWTAuthentication().get_user(token)
+        self.assertNotIsInstance(user, TokenBackedUser)
+
+
+class LeaveCreateTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', cls.class_a, cls.teacher)
+
+    def submit(self, days):
+        start = timezone.now()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_for(self.student).post('/api/request-leave/', {
+                'start_date': start.isoformat(), 'end_date': (start + timedelta(days=days)).isoformat(), 'reason': '回家',
+            })
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json(), [q['sql'] for q in ctx.captured_queries]
+
+    def test_single_insert_without_updates(self):
+        data, queries = self.submit(1)
+        writes = [sql for sql in queries if sql.startswith(('INSERT', 'UPDATE')) and '"leave_leave"' in sql]
+        self.assertEqual(len(writes), 1, queries)
+        self.assertTrue(writes[0].startswith('INSERT'))
+        self.assertEqual((data['status'], data['advisor_name'], data['class_name']), (0, '王老师', '电气2304'))
+
+    def test_long_leave_needs_second_approval(self):
+        data, _ = self.submit(6)
+        self.assertEqual(data['status'], 4)
+        self.assertEqual(Leave.objects.get().advisor, self.teacher)
+
+    def test_student_without_class_is_rejected(self):
+        profile = self.student.studentprofile
+        profile.assigned_class = None
+        profile.save()
+        start = timezone.now()
+        response = self.client_for(self.student).post('/api/request-leave/', {
+            'start_date': start.isoformat(), 'end_date': start.isoformat(), 'reason': '回家',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Leave.objects.exists())
+
+
+class StatisticsSummaryTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.class_b = Class.objects.create(name='电气2305')
+        cls.students = [
+            cls.make_student('s001', cls.class_a, cls.teacher),
+            cls.make_student('s002', cls.class_b, cls.teacher),
+            cls.make_student('s003', None, cls.teacher),
+        ]
+
+    def add_leave(self, student, start, hours):
+        # 汇总表增量在事务提交后写入
+        with self.captureOnCommitCallbacks(execute=True):
+            return Leave.objects.create(
+                student=student, start_date=start, end_date=start + timedelta(hours=hours), reason='理由'
+            )
+
+    def seed(self):
+        base = timezone.now().replace(hour=23, minute=30)
+        leaves = []
+        for i, hours in enumerate([0, 5, 23, 24, 30, 71, 72, 200, 5, 48]):
+            leaves.append(self.add_leave(self.students[i % 3], base - timedelta(days=i * 11), hours))
+        return leaves
+
+    def assertDashboardsMatch(self):
+        summary, live = build_dashboard('summary'), build_dashboard('live')
+        key = lambda row: repr(sorted(row.items()))
+        self.assertEqual(sorted(summary['class_stats'], key=key), sorted(live['class_stats'], key=key))
+        self.assertEqual(sorted(summary['heatmap_data'], key=key), sorted(live['heatmap_data'], key=key))
+        self.assertEqual(summary['trend_data'], live['trend_data'])
+        self.assertEqual(summary['duration_stats'], live['duration_stats'])
+
+    def test_incremental_updates_match_live_aggregates(self):
+        leaves = self.seed()
+        self.assertDashboardsMatch()
+
+        moved = Leave.objects.get(pk=leaves[1].pk)
+        moved.start_date -= timedelta(days=40)
+        approved = Leave.objects.get(pk=leaves[2].pk)
+        approved.status = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            leaves[0].delete()
+            moved.save()
+            approved.save()
+        self.assertDashboardsMatch()
+
+    def test_class_change_moves_counts(self):
+        self.seed()
+        profile = self.students[0].studentprofile
+        profile.assigned_class = self.class_b
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertDashboardsMatch()
+        self.assertEqual(LeaveClassStat.objects.get(class_name='电气2304').count, 0)
+
+    def test_student_deletion_removes_counts(self):
+        self.seed()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[1].delete()
+        self.assertDashboardsMatch()
+
+    def test_class_rename_moves_counts(self):
+        self.seed()
+        self.class_a.name = '电气2304（更名）'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_a.save()
+        self.assertDashboardsMatch()
+        self.assertFalse(LeaveClassStat.objects.filter(class_name='电气2304', count__gt=0).exists())
+
+    def test_class_deletion_moves_counts_to_unassigned(self):
+        self.seed()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_b.delete()
+        self.assertDashboardsMatch()
+        self.assertEqual(LeaveClassStat.objects.get(class_name='').count, Leave.objects.filter(
+            student__in=self.students[1:]).count())
+
+    def test_rebuild_command_matches_incremental(self):
+        self.seed()
+        before = build_dashboard('summary')
+        call_command('rebuild_leave_stats', stdout=open(os.devnull, 'w'))
+        self.assertEqual(build_dashboard('summary')['trend_data'], before['trend_data'])
+        self.assertDashboardsMatch()
+
+    def test_deltas_are_written_after_commit(self):
+        start = timezone.now()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Leave.objects.create(student=self.students[0], start_date=start, end_date=start + timedelta(days=1),
+                                 reason='理由')
+            # 提交请假的事务内不碰汇总行
+            self.assertFalse(LeaveDailyStat.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertDashboardsMatch()
+
+    def test_rolled_back_leave_leaves_no_counts(self):
+        start = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Leave.objects.create(student=self.students[0], start_date=start,
+                                     end_date=start + timedelta(days=1), reason='理由')
+                transaction.set_rollback(True)
+        self.assertFalse(LeaveClassStat.objects.filter(count__gt=0).exists())
+
+    def test_dashboard_endpoint_reflects_new_leaves(self):
+        client = self.client_for(self.teacher)
+        self.assertEqual(client.get('/api/statistics/dashboard/').json()['trend_data']['dates'], [])
+        self.seed()
+        data = client.get('/api/statistics/dashboard/').json()
+        self.assertEqual(sum(data['trend_data']['real_values']), 10)
+
+
+def legacy_duration_loop(queryset):
+    """
+    改造前 StatisticsDataView 维度 4 的 Python 循环，作为一致性对照。
+    """
+    leaves_duration = queryset.annotate(
+        duration=ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField())
+    )
+    duration_dist = {'short': 0, 'medium': 0, 'long': 0}
+    for item in leaves_duration:
+        if not item.duration: continue
+        days = item.duration.days
+        if days < 1:
+            duration_dist['short'] += 1
+        elif days < 3:
+            duration_dist['medium'] += 1
+        else:
+            duration_dist['long'] += 1
+    return [duration_dist['short'], duration_dist['medium'], duration_dist['long']]
+
+
+class DurationBucketParityTests(LeaveFixtureMixin, LeaveTestCase):
+    """
+    SQL 条件聚合与原 Python 循环的一致性。
+    行数由环境变量 LEAVE_PARITY_ROWS 控制（默认 5000，完整校验用 1000000）。
+    """
+    EDGE_DURATIONS = [
+        timedelta(0), timedelta(microseconds=1), timedelta(days=1) - timedelta(microseconds=1),
+        timedelta(days=1), timedelta(days=3) - timedelta(seconds=1), timedelta(days=3), timedelta(days=30),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        rows = int(os.environ.get('LEAVE_PARITY_ROWS', 5000))
+        student = cls.make_user('s001', 'stu')
+        rng = random.Random(20241107)
+        start = timezone.now()
+        batch = []
+        for i in range(rows):
+            if i < len(cls.EDGE_DURATIONS):
+                duration = cls.EDGE_DURATIONS[i]
+            else:
+                duration = timedelta(seconds=rng.randrange(0, 10 * 86400))
+            batch.append(Leave(student=student, start_date=start, end_date=start + duration, reason=''))
+            if len(batch) == 10000:
+                Leave.objects.bulk_create(batch)
+                batch = []
+        Leave.objects.bulk_create(batch)
+
+    def test_sql_buckets_match_python_loop(self):
+        queryset = Leave.objects.all()
+        with self.assertNumQueries(1):
+            buckets = live_duration_buckets(queryset, (1, 3))
+        self.assertEqual(buckets, legacy_duration_loop(queryset))
+
+    def test_summary_histogram_matches_sql_buckets(self):
+        queryset = Leave.objects.all()
+        for boundaries in [(1, 3), (2,), (1, 2, 7)]:
+            self.assertEqual(
+                histogram_buckets(live_duration_days(queryset), boundaries),
+                live_duration_buckets(queryset, boundaries),
+            )
+
+    @override_settings(LEAVE_DURATION_BUCKETS=(1, 2, 7))
+    def test_configurable_boundaries_labels(self):
+        rebuild_summaries()
+        labels = [row['name'] for row in build_dashboard()['duration_stats']]
+        self.assertEqual(labels, ['1天以内', '1-2天', '2-7天', '7天以上'])
+        self.assertEqual(build_dashboard('live')['duration_stats'], build_dashboard('summary')['duration_stats'])
+
+
+class StatisticsCacheTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', cls.class_a, cls.teacher)
+
+    def add_leave(self, days=1):
+        start = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            return Leave.objects.create(student=self.student, start_date=start,
+                                        end_date=start + timedelta(days=days), reason='理由')
+
+    def test_blocks_are_served_from_cache(self):
+        self.add_leave()
+        expected = build_dashboard()
+        self.assertEqual(cached_dashboard(), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_dashboard(), expected)
+
+    def test_leave_writes_invalidate_blocks(self):
+        leave = self.add_leave()
+        self.assertEqual(sum(cached_dashboard()['trend_data']['real_values']), 1)
+        self.add_leave(days=5)
+        self.assertEqual(sum(cached_dashboard()['trend_data']['real_values']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.delete()
+        self.assertEqual(cached_dashboard()['duration_stats'][1]['value'], 0)
+
+    def test_class_rename_invalidates_class_stats(self):
+        self.add_leave()
+        self.assertEqual(cached_dashboard()['class_stats'][0]['name'], '电气2304')
+        self.class_a.name = '电气2306'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_a.save()
+        self.assertEqual(cached_dashboard()['class_stats'][0]['name'], '电气2306')
+
+    def test_status_change_keeps_cache(self):
+        leave = self.add_leave()
+        cached_dashboard()
+        leave.status = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.save()
+        with self.assertNumQueries(0):
+            cached_dashboard()
+
+    def test_stale_value_served_while_another_worker_recomputes(self):
+        self.add_leave()
+        stale = get_block('trend_data')
+        self.add_leave()
+        stats_cache().add('leave:stats:trend_data:lock', 1)  # 模拟其他 worker 持有重算锁
+        with self.assertNumQueries(0):
+            self.assertEqual(get_block('trend_data'), stale)
+        stats_cache().delete('leave:stats:trend_data:lock')
+        self.assertEqual(sum(get_block('trend_data')['real_values']), 2)
+
+    def test_waits_for_recompute_when_no_stale_value(self):
+        stats_cache().add('leave:stats:class_stats:lock', 1)
+        with mock.patch('leave.stats_cache.WAIT_TIMEOUT', 0.1):
+            self.assertEqual(get_block('class_stats'), [])
+
+    def file_cache(self, tmp):
+        return override_settings(CACHES={**TEST_CACHES, 'statistics': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmp,
+        }})
+
+    def test_file_cache_lock_has_a_single_holder(self):
+        # 多个 worker 同时发现版本失效：文件缓存上也只能有一个拿到重算锁
+        with tempfile.TemporaryDirectory() as tmp, self.file_cache(tmp):
+            cache = stats_cache()
+            barrier = threading.Barrier(16)
+
+            def contend(_):
+                barrier.wait()
+                return acquire_lock(cache, 'trend_data')
+
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                self.assertEqual(sum(pool.map(contend, range(16))), 1)
+            release_lock(cache, 'trend_data')
+            self.assertTrue(acquire_lock(cache, 'trend_data'))
+
+    def test_file_cache_stale_lock_is_broken(self):
+        with tempfile.TemporaryDirectory() as tmp, self.file_cache(tmp):
+            cache = stats_cache()
+            self.assertTrue(acquire_lock(cache, 'class_stats'))
+            self.assertFalse(acquire_lock(cache, 'class_stats'))
+            expired = time.time() - LOCK_TIMEOUT - 1
+            os.utime(os.path.join(tmp, 'class_stats.lock'), (expired, expired))
+            self.assertTrue(acquire_lock(cache, 'class_stats'))
+
+    def test_file_cache_serves_stale_value_while_locked(self):
+        with tempfile.TemporaryDirectory() as tmp, self.file_cache(tmp):
+            self.add_leave()
+            stale = get_block('trend_data')
+            self.add_leave()
+            acquire_lock(stats_cache(), 'trend_data')
+            with self.assertNumQueries(0):
+                self.assertEqual(get_block('trend_data'), stale)
+
+
+class QrcodeCacheTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.teacher)
+        cls.leave = cls.make_leaves(cls.student, 1)[0]
+
+    def url(self):
+        return f'/api/view-leave/qrcode/{self.leave.verification_uuid}/'
+
+    def test_png_is_rendered_once(self):
+        client = self.client_for(self.student)
+        with mock.patch('leave.qrcodes.render_qrcode', wraps=render_qrcode) as render:
+            first = client.get(self.url())
+            second = client.get(self.url())
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(first.content.startswith(b'\x89PNG'))
+        self.assertIn('immutable', first['Cache-Control'])
+        self.assertEqual(first['ETag'], qrcode_etag(verify_url(self.leave.verification_uuid)))
+
+    def test_conditional_request_returns_304(self):
+        client = self.client_for(self.student)
+        etag = client.get(self.url())['ETag']
+        with mock.patch('leave.qrcodes.get_qrcode_png') as get_png:
+            response = client.get(self.url(), HTTP_IF_NONE_MATCH=f'"other", {etag}')
+        get_png.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(client.get(self.url(), HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    @override_settings(LEAVE_QRCODE_PRERENDER=True)
+    def test_approval_prerenders_qrcode(self):
+        self.leave.status = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leave.save()
+        with mock.patch('leave.qrcodes.render_qrcode') as render:
+            get_qrcode_png(verify_url(self.leave.verification_uuid))
+        render.assert_not_called()
+
+
+class VerifyLeaveCacheTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', cls.class_a, cls.teacher)
+        cls.approved, cls.pending = cls.make_leaves(cls.student, 2)
+        Leave.objects.filter(pk=cls.approved.pk).update(status=1)
+
+    def url(self, uuid):
+        return f'/api/leave/verify/{uuid}/'
+
+    def test_bounded_cache_culls_expired_entries_first(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = BoundedFileBasedCache(tmp, {'OPTIONS': {'MAX_ENTRIES': 10}})
+            for i in range(10):
+                cache.set(f'stale-{i}', i, 0)
+            for i in range(9):
+                cache.set(f'live-{i}', i)
+            self.assertEqual([cache.get(f'live-{i}') for i in range(9)], list(range(9)))
+            self.assertEqual(len(cache._list_cache_files()), 9)
+
+    def test_bounded_cache_lists_directory_every_cull_interval(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = BoundedFileBasedCache(tmp, {'OPTIONS': {'MAX_ENTRIES': 1000, 'CULL_INTERVAL': 50}})
+            with mock.patch.object(cache, '_list_cache_files', wraps=cache._list_cache_files) as listing:
+                for i in range(200):
+                    cache.set(f'k{i}', i)
+            self.assertEqual(listing.call_count, 4)
+
+    def test_approved_payload_is_cached(self):
+        client = APIClient()
+        first = client.get(self.url(self.approved.verification_uuid))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['student_class'], '电气2304')
+        with self.assertNumQueries(0):
+            second = client.get(self.url(self.approved.verification_uuid))
+        self.assertEqual(first.content, second.content)
+
+    def test_negative_results_keep_status_codes(self):
+        client = APIClient()
+        unknown = '00000000-0000-4000-8000-000000000000'
+        for uuid, expected in ((unknown, 404), (self.pending.verification_uuid, 400)):
+            self.assertEqual(client.get(self.url(uuid)).status_code, expected)
+            with self.assertNumQueries(0):
+                self.assertEqual(client.get(self.url(uuid)).status_code, expected)
+
+    def test_status_change_invalidates(self):
+        client = APIClient()
+        url = self.url(self.pending.verification_uuid)
+        self.assertEqual(client.get(url).status_code, 400)
+        leave = Leave.objects.get(pk=self.pending.pk)
+        leave.status = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.save()
+        self.assertEqual(client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.delete()
+        self.assertEqual(client.get(url).status_code, 404)
+
+    def test_profile_change_invalidates(self):
+        client = APIClient()
+        url = self.url(self.approved.verification_uuid)
+        client.get(url)
+        profile = self.student.studentprofile
+        profile.assigned_class = Class.objects.create(name='电气2305')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(client.get(url).json()['student_class'], '电气2305')
+
+    def test_name_and_class_renames_invalidate(self):
+        client = APIClient()
+        url = self.url(self.approved.verification_uuid)
+        client.get(url)
+        self.teacher.last_name = '王老师（新）'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.save()
+        self.assertEqual(client.get(url).json()['advisor_name'], '王老师（新）')
+        self.class_a.name = '电气2306'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_a.save()
+        self.assertEqual(client.get(url).json()['student_class'], '电气2306')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_a.delete()
+        self.assertIsNone(client.get(url).json()['student_class'])
+
+    def test_login_keeps_cached_entry(self):
+        url = self.url(self.approved.verification_uuid)
+        APIClient().get(url)
+        self.student.last_login = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            APIClient().get(url)
+
+    def test_invalidation_during_load_is_not_served(self):
+        # 读穿透查询之后、写回缓存之前假条被批准：写回的旧结果不能被后续请求命中
+        client = APIClient()
+        url = self.url(self.pending.verification_uuid)
+        leave = Leave.objects.get(pk=self.pending.pk)
+
+        def load_then_approve(uuid):
+            entry = load_verification(uuid)
+            leave.status = 1
+            with self.captureOnCommitCallbacks(execute=True):
+                leave.save()
+            return entry
+
+        with mock.patch('leave.verification.load_verification', side_effect=load_then_approve):
+            self.assertEqual(client.get(url).status_code, 400)
+        self.assertEqual(client.get(url).status_code, 200)
+
+
+class StudentBulkImportTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.class_a = Class.objects.create(name='电气2304')
+        cls.make_user('s000', 'stu', last_name='老生')
+
+    def rows(self, *specs):
+        return [
+            {'row': i + 2, 'username': username, 'last_name': f'学生{i}', 'email': f'{username}@example.com',
+             'class_name': class_name}
+            for i, (username, class_name) in enumerate(specs)
+        ]
+
+    def test_creates_users_groups_and_profiles(self):
+        rows = self.rows(*[(f's{i:03d}', '电气2304') for i in range(1, 8)])
+        with self.assertNumQueries(3 + 4 * 5):  # 班级、已有学号、stu 组 + 每块 3 条 INSERT 与保存点开始/结束
+            result = bulk_import_students(rows, chunk_size=2, hasher=lambda pw: ['unusable'] * len(pw))
+        self.assertEqual(len(result.created), 7)
+        self.assertEqual(result.errors, [])
+        student = User.objects.get(username='s007')
+        self.assertEqual(get_group_names(student), ('stu',))
+        self.assertEqual(student.studentprofile.assigned_class, self.class_a)
+
+    def test_row_errors_are_reported(self):
+        rows = self.rows(('s000', '电气2304'), ('s001', '不存在'), ('', '电气2304'), ('s002', '电气2304'),
+                         ('s002', '电气2304'))
+        result = bulk_import_students(rows)
+        self.assertEqual(result.created, ['s002'])
+        self.assertEqual([error[:2] for error in result.errors], [(2, 's000'), (3, 's001'), (4, ''), (6, 's002')])
+        self.assertTrue(User.objects.get(username='s002').check_password('123456'))
+        self.assertEqual(StudentProfile.objects.filter(user__username='s002').count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PasswordHashingTests(LeaveTestCase):
+
+    def test_parallel_hashes_are_salted_per_user(self):
+        encoded = parallel_hash_passwords(['123456'] * 4 + ['abc'], workers=2)
+        self.assertEqual(len(set(encoded)), 5)
+        self.assertTrue(all(check_password('123456', e) for e in encoded[:4]))
+        self.assertTrue(check_password('abc', encoded[4]))
+
+    def test_shared_mode_hashes_each_password_once(self):
+        with mock.patch('leave.passwords.make_password', wraps=lambda pw: f'hashed:{pw}') as make:
+            encoded = shared_hash_passwords(['123456', 'abc', '123456'])
+        self.assertEqual(make.call_count, 2)
+        self.assertEqual(encoded, ['hashed:123456', 'hashed:abc', 'hashed:123456'])
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            make_password_hasher('plain')
+
+
+class AdvisorUpdateTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.old = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.new = cls.make_user('t002', 'tch', last_name='李老师')
+        cls.make_user('t003', 'tch', last_name='张老师')
+        cls.make_user('t004', 'tch', last_name='张老师')
+        class_a = Class.objects.create(name='电气2304')
+        cls.students = [cls.make_student(f's{i:03d}', class_a, cls.old) for i in range(4)]
+
+    def rows(self, *specs):
+        return [{'row': i + 2, 'username': u, 'advisor_last_name': a} for i, (u, a) in enumerate(specs)]
+
+    def test_plan_uses_two_queries_and_reports_diff(self):
+        rows = self.rows(('s000', '李老师'), ('s001', '王老师'), ('s002', '张老师'), ('s003', '赵老师'), ('x999', '李老师'))
+        with self.assertNumQueries(2):
+            plan = plan_advisor_updates(rows)
+        self.assertEqual(plan.changes, [(2, 's000', '王老师', '李老师')])
+        self.assertEqual(plan.unchanged, ['s001'])
+        self.assertEqual([error[:2] for error in plan.errors], [(4, 's002'), (5, 's003'), (6, 'x999')])
+        self.assertIn('同名', plan.errors[0][2])
+        self.assertEqual(StudentProfile.objects.get(user__username='s000').advisor, self.old)  # 试运行不写库
+
+    def test_apply_updates_in_batches(self):
+        self.make_leaves(self.students[0], 2)
+        plan = plan_advisor_updates(self.rows(*[(f's{i:03d}', '李老师') for i in range(4)]))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(apply_advisor_updates(plan, batch_size=2), 4)
+        profile_updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "leave_studentprofile"')]
+        self.assertEqual(len(profile_updates), 2)
+        self.assertEqual(StudentProfile.objects.filter(advisor=self.new).count(), 4)
+        self.assertEqual(Leave.objects.filter(advisor=self.new).count(), 2)  # 假条随学生转到新辅导员
+
+
+class LeaveExportTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.teacher, last_name='张三')
+        cls.leaves = cls.make_leaves(cls.student, 6)
+        Leave.objects.filter(pk__in=[leave.pk for leave in cls.leaves[:3]]).update(status=1)
+
+    def export(self, name, **options):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), name)
+        call_command('export_leaves', output=path, stdout=io.StringIO(), **options)
+        return path
+
+    def test_csv_export_with_filters(self):
+        today = timezone.localdate(self.leaves[0].start_date)
+        with self.assertNumQueries(1):
+            path = self.export('leaves.csv', status=[1], start_date=str(today + timedelta(days=1)), chunk_size=1)
+        with open(path, encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][:4], ['请假条ID', '学号', '学生姓名', '班级'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [leave.pk for leave in self.leaves[1:3]])
+        self.assertEqual(rows[1][1:6], ['s001', '张三', '电气2304', 's001@example.com', '王老师'])
+
+    def test_xlsx_export_is_write_only_and_readable(self):
+        from openpyxl import load_workbook
+        path = self.export('leaves.xlsx')
+        sheet = load_workbook(path, read_only=True).active
+        rows = list(sheet.values)
+        self.assertEqual(len(rows), 7)
+        expected_start = timezone.localtime(self.leaves[0].start_date).replace(tzinfo=None)
+        self.assertEqual(rows[1][6].replace(microsecond=0), expected_start.replace(microsecond=0))
+
+    def test_parquet_requires_pyarrow(self):
+        with mock.patch.dict('sys.modules', {'pyarrow': None}):
+            with self.assertRaises(CommandError):
+                self.export('leaves.parquet')
+
+
+class LeaveExportEndpointTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        other = cls.make_user('t002', 'tch', last_name='李老师')
+        class_a = Class.objects.create(name='电气2304')
+        cls.mine = cls.make_leaves(cls.make_student('s001', class_a, cls.teacher), 3)
+        cls.others = cls.make_leaves(cls.make_student('s002', class_a, other), 2, status=1)
+
+    def download(self, user, **params):
+        response = self.client_for(user).get('/api/admin/leaves/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_is_scoped_like_admin_list(self):
+        rows = list(csv.reader(io.StringIO(self.download(self.teacher).decode('utf-8-sig'))))
+        self.assertEqual(rows[0], [header for header, _ in EXPORT_COLUMNS])
+        self.assertEqual(sorted(int(row[0]) for row in rows[1:]), sorted(leave.pk for leave in self.mine))
+        rows = list(csv.reader(io.StringIO(self.download(self.admin, status='1').decode('utf-8-sig'))))
+        self.assertEqual(sorted(int(row[0]) for row in rows[1:]), sorted(leave.pk for leave in self.others))
+
+    @mock.patch('leave.views.EXPORT_CHUNK_SIZE', 2)
+    def test_xlsx_streams_a_valid_workbook(self):
+        from openpyxl import load_workbook
+        content = self.download(self.admin, file_type='xlsx')
+        rows = list(load_workbook(io.BytesIO(content), read_only=True).active.values)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][:3], (self.mine[0].pk, 's001', '学生'))
+        # 日期列是数值日期单元格，与 export_leaves 命令的 openpyxl 导出一致
+        leave = self.mine[0]
+        for column, value in ((6, leave.start_date), (7, leave.end_date), (9, leave.leave_time)):
+            expected = timezone.localtime(value).replace(tzinfo=None)
+            self.assertIsInstance(rows[1][column], datetime)
+            self.assertLess(abs(rows[1][column] - expected), timedelta(milliseconds=1))
+
+    def test_bad_parameters_and_roles(self):
+        self.assertEqual(self.client_for(self.admin).get('/api/admin/leaves/export/', {'file_type': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client_for(self.admin).get('/api/admin/leaves/export/', {'start_date': 'x'}).status_code, 400)
+        student = User.objects.get(username='s001')
+        self.assertEqual(self.client_for(student).get('/api/admin/leaves/export/').status_code, 403)
+
+
+class QueryPlanTests(LeaveFixtureMixin, LeaveTestCase):
+    """
+    列表、导出与统计查询都必须走索引，不能全表扫描 leave_leave。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', class_a, cls.teacher)
+        for i in range(2, 6):
+            cls.make_leaves(cls.make_student(f's{i:03d}', class_a, cls.teacher), 20, status=i % 5)
+        cls.make_leaves(cls.student, 20)
+
+    def assertNoTableScans(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            fn()
+        self.assertTrue(ctx.captured_queries)
+        offenders = find_table_scans(ctx.captured_queries)
+        self.assertEqual(offenders, [], '\n'.join(f'{scans}: {sql}' for sql, scans in offenders))
+
+    def test_list_queries_use_indexes(self):
+        student, teacher, admin = (self.client_for(u) for u in (self.student, self.teacher, self.admin))
+        urls = [
+            (student, '/api/view-leave/', {}),
+            (student, '/api/view-leave/', {'status': 0}),
+            (teacher, '/api/admin/leaves/', {}),
+            (teacher, '/api/admin/leaves/', {'status': 1}),
+            (admin, '/api/admin/leaves/', {}),
+            (admin, '/api/admin/leaves/', {'status': 4}),
+            (admin, '/api/admin/leaves/', {'pagination': 'cursor', 'skip_count': 1}),
+        ]
+        for client, url, params in urls:
+            with self.subTest(url=url, params=params):
+                self.assertNoTableScans(lambda: self.assertEqual(client.get(url, params).status_code, 200))
+
+    def test_export_and_statistics_queries_use_indexes(self):
+        today = timezone.localdate()
+        admin = self.client_for(self.admin)
+        self.assertNoTableScans(lambda: b''.join(admin.get(
+            '/api/admin/leaves/export/', {'start_date': str(today), 'end_date': str(today + timedelta(days=3))}
+        ).streaming_content))
+        self.assertNoTableScans(lambda: build_dashboard('live'))
+
+
+class TeacherScopeTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.old = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.new = cls.make_user('t002', 'tch', last_name='李老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.old)
+        cls.leaves = cls.make_leaves(cls.student, 3)
+
+    def listed_ids(self, user):
+        return sorted(row['id'] for row in self.client_for(user).get('/api/admin/leaves/').json()['results'])
+
+    def test_moved_student_leaves_follow_new_advisor(self):
+        self.assertEqual(self.listed_ids(self.old), sorted(leave.pk for leave in self.leaves))
+        response = self.client_for(self.admin).patch(
+            '/api/admin/students/modify/s001/', {'advisor_last_name': '李老师'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.listed_ids(self.old), [])
+        self.assertEqual(self.listed_ids(self.new), sorted(leave.pk for leave in self.leaves))
+
+    def test_reconcile_command_repairs_stale_advisors(self):
+        Leave.objects.filter(pk=self.leaves[0].pk).update(advisor=self.new)
+        Leave.objects.filter(pk=self.leaves[1].pk).update(advisor=None)
+        out = io.StringIO()
+        untouched = self.make_leaves(self.make_student('s002', None, self.new), 1)[0]
+        cache = verify_cache()
+        for leave in (*self.leaves, untouched):
+            cache.set(f'leave:verify:{leave.verification_uuid}', ('missing', None))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_leave_advisors', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(Leave.objects.filter(advisor=self.old).count(), 3)
+        # 只有被校正学生的防伪缓存失效
+        self.assertIsNone(cache.get(f'leave:verify:{self.leaves[2].verification_uuid}'))
+        self.assertIsNotNone(cache.get(f'leave:verify:{untouched.verification_uuid}'))
+
+    def test_sync_returns_affected_students(self):
+        Leave.objects.filter(pk=self.leaves[0].pk).update(advisor=self.new)
+        self.assertEqual(sync_leave_advisors(), (1, {self.student.pk}))
+        self.assertEqual(sync_leave_advisors(), (0, set()))
+
+
+class BatchTransitionTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.other = cls.make_user('t002', 'tch', last_name='李老师')
+        class_a = Class.objects.create(name='电气2304')
+        cls.student = cls.make_student('s001', class_a, cls.teacher)
+        cls.outsider = cls.make_student('s002', class_a, cls.other)
+        cls.pending = cls.make_leaves(cls.student, 3)
+        cls.approved = cls.make_leaves(cls.student, 1, status=1)[0]
+        cls.foreign = cls.make_leaves(cls.outsider, 1)[0]
+
+    def url(self, action):
+        return f'/api/admin/leaves/batch/{action}/'
+
+    def test_approve_uses_one_update_and_reports_each_id(self):
+        ids = [leave.pk for leave in self.pending] + [self.approved.pk, 999999]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_for(self.admin).post(self.url('approve'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "leave_leave"')]
+        self.assertEqual(len(updates), 1)
+        body = response.json()
+        self.assertEqual(body['updated'], 3)
+        results = {row['id']: row['result'] for row in body['results']}
+        self.assertEqual(results[self.approved.pk], 'invalid_state')
+        self.assertEqual(results[999999], 'not_found')
+        self.assertEqual(Leave.objects.filter(id__in=ids[:3], status=1, approver='管理员').count(), 3)
+
+    def test_competing_transition_is_not_reported_ok(self):
+        # 读取状态之后、UPDATE 之前另一个审批人驳回了第一张假条（SQLite 上 select_for_update 不加锁）
+        raced = self.pending[0].pk
+        real_savepoint = transaction.savepoint
+
+        def competitor_then_savepoint(*args, **kwargs):
+            Leave.objects.filter(pk=raced).update(status=2)
+            return real_savepoint(*args, **kwargs)
+
+        signalled = []
+        receiver = lambda sender, leaves, target, **kwargs: signalled.extend(leave_id for leave_id, _ in leaves)
+        leave_status_changed.connect(receiver)
+        self.addCleanup(leave_status_changed.disconnect, receiver)
+        ids = [leave.pk for leave in self.pending]
+        with mock.patch('leave.state_machine.transaction.savepoint', competitor_then_savepoint):
+            updated, results = apply_batch_transition(TRANSITIONS['approve'], ids, approver='管理员')
+        self.assertEqual(updated, 2)
+        self.assertEqual(results[0], {'id': raced, 'result': 'invalid_state', 'status': 2})
+        self.assertEqual([row['result'] for row in results[1:]], ['ok', 'ok'])
+        self.assertEqual(sorted(signalled), sorted(ids[1:]))
+        self.assertEqual(Leave.objects.get(pk=raced).status, 2)
+
+    def test_invalid_state_and_reject_reason(self):
+        ids = [self.pending[0].pk, self.approved.pk]
+        response = self.client_for(self.admin).post(
+            self.url('reject'), {'ids': ids, 'reject_reason': '材料不全'}, format='json'
+        )
+        self.assertEqual(response.json()['results'], [
+            {'id': self.pending[0].pk, 'result': 'ok'},
+            {'id': self.approved.pk, 'result': 'invalid_state', 'status': 1},
+        ])
+        self.assertEqual(Leave.objects.get(pk=self.pending[0].pk).reject_reason, '材料不全')
+        self.assertIsNone(Leave.objects.get(pk=self.approved.pk).reject_reason)
+
+    def test_teacher_is_limited_to_own_students(self):
+        response = self.client_for(self.teacher).post(
+            self.url('reject'), {'ids': [self.pending[0].pk, self.foreign.pk]}, format='json'
+        )
+        results = {row['id']: row['result'] for row in response.json()['results']}
+        self.assertEqual(results, {self.pending[0].pk: 'ok', self.foreign.pk: 'not_found'})
+        self.assertEqual(Leave.objects.get(pk=self.foreign.pk).status, 0)
+
+    def test_rejects_bad_input(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.post(self.url('explode'), {'ids': [1]}, format='json').status_code, 404)
+        for ids in ([], 'abc', [1, 'x'], [True], list(range(501))):
+            self.assertEqual(client.post(self.url('approve'), {'ids': ids}, format='json').status_code, 400)
+        mas = self.make_user('m001', 'mas')
+        self.assertEqual(
+            self.client_for(mas).post(self.url('complete'), {'ids': [1]}, format='json').status_code, 403
+        )
+
+    def test_status_change_invalidates_verification(self):
+        client = APIClient()
+        url = f'/api/leave/verify/{self.pending[1].verification_uuid}/'
+        self.assertEqual(client.get(url).status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.admin).post(self.url('approve'), {'ids': [self.pending[1].pk]}, format='json')
+        self.assertEqual(client.get(url).status_code, 200)
+
+
+class SingleTransitionTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.teacher)
+        cls.leave = cls.make_leaves(cls.student, 1)[0]
+
+    def test_reject_is_a_narrow_conditional_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client_for(self.admin).post(
+                f'/api/admin/reject-leave/{self.leave.pk}/', {'reject_reason': '材料不全'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "leave_leave"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"status" IN', updates[0])
+        self.assertNotIn('"reason"', updates[0])
+        leave = Leave.objects.get(pk=self.leave.pk)
+        self.assertEqual((leave.status, leave.approver, leave.reject_reason), (2, '管理员', '材料不全'))
+
+    def test_losing_transition_reports_current_state(self):
+        admin, teacher = self.client_for(self.admin), self.client_for(self.teacher)
+        self.assertEqual(admin.post(f'/api/admin/reject-leave/{self.leave.pk}/').status_code, 200)
+        # 另一位审批人基于旧状态的批准不会覆盖已拒绝的结果
+        self.assertEqual(teacher.patch(f'/api/admin/approve-leave/{self.leave.pk}/').status_code, 400)
+        self.assertEqual(Leave.objects.get(pk=self.leave.pk).status, 2)
+        self.assertEqual(admin.patch('/api/admin/complete-leave/999999/').status_code, 404)
+
+
+class SqliteConnectionTests(TestCase):
+
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    @override_settings(LEAVE_SQLITE_SYNCHRONOUS='', LEAVE_SQLITE_BUSY_TIMEOUT=200)
+    def test_blank_pragmas_are_skipped(self):
+        self.assertEqual(sqlite_pragmas(), [('journal_mode', 'WAL'), ('busy_timeout', 200)])
+
+
+class AsyncReadViewTests(LeaveFixtureMixin, LeaveTestCase):
+    """
+    异步只读视图与同步视图的响应逐字节一致。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.teacher)
+        cls.leaves = cls.make_leaves(cls.student, 12)
+        Leave.objects.filter(pk=cls.leaves[0].pk).update(status=1)
+
+    def call_async(self, view, path, user=None, data=None, method='get', **kwargs):
+        headers = {'authorization': f'Bearer {issue_tokens(user).access_token}'} if user else {}
+        request = getattr(AsyncRequestFactory(), method)(path, data, headers=headers)
+        return async_to_sync(view)(request, **kwargs)
+
+    def assertSameResponse(self, sync_response, async_response):
+        self.assertEqual(sync_response.status_code, async_response.status_code)
+        self.assertEqual(sync_response.content, async_response.content)
+
+    def test_student_leaves(self):
+        client = self.client_for(self.student)
+        for params in ({}, {'page': 2, 'page_size': 5}, {'status': 1}, {'pagination': 'cursor', 'page_size': 5},
+                       {'cursor': 'bad'}):
+            sync_response = client.get('/api/view-leave/', params)
+            expected_queries = 0 if params.get('cursor') == 'bad' else 2  # 计数 + 一页；无效游标不查询
+            with self.assertNumQueries(expected_queries):
+                async_response = self.call_async(views_async.get_student_leaves, '/api/view-leave/',
+                                                 self.student, params)
+            self.assertSameResponse(sync_response, async_response)
+
+    def test_user_info_and_dashboard(self):
+        client = self.client_for(self.student)
+        self.assertSameResponse(client.get('/api/user-info/'),
+                                self.call_async(views_async.UserInfoView, '/api/user-info/', self.student))
+        self.assertSameResponse(client.get('/api/statistics/dashboard/'),
+                                self.call_async(views_async.statistics_dashboard, '/', self.student))
+
+    def test_verify_leave(self):
+        unknown = '00000000-0000-4000-8000-000000000000'
+        for uuid in (self.leaves[0].verification_uuid, self.leaves[1].verification_uuid, unknown):
+            path = f'/api/leave/verify/{uuid}/'
+            self.assertSameResponse(APIClient().get(path), self.call_async(views_async.verify_leave, path, uuid=uuid))
+
+    def test_qrcode(self):
+        uuid = self.leaves[0].verification_uuid
+        response = self.call_async(views_async.leave_qrcode, '/', self.student, uuid=uuid)
+        self.assertEqual(response.content, render_qrcode(verify_url(uuid)))
+        self.assertEqual(response['ETag'], qrcode_etag(verify_url(uuid)))
+        request = AsyncRequestFactory().get('/', headers={
+            'authorization': f'Bearer {issue_tokens(self.student).access_token}',
+            'if-none-match': response['ETag'],
+        })
+        self.assertEqual(async_to_sync(views_async.leave_qrcode)(request, uuid=uuid).status_code, 304)
+
+    def test_auth_and_permission_errors(self):
+        self.assertSameResponse(APIClient().get('/api/user-info/'),
+                                self.call_async(views_async.UserInfoView, '/'))
+        self.assertSameResponse(self.client_for(self.teacher).get('/api/view-leave/'),
+                                self.call_async(views_async.get_student_leaves, '/', self.teacher))
+        bad_token = APIClient()
+        bad_token.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        request = AsyncRequestFactory().get('/', headers={'authorization': 'Bearer not-a-token'})
+        async_response = async_to_sync(views_async.UserInfoView)(request)
+        self.assertSameResponse(bad_token.get('/api/user-info/'), async_response)
+        self.assertEqual(async_response['WWW-Authenticate'], 'Bearer realm="api"')
+        self.assertEqual(self.call_async(views_async.UserInfoView, '/', self.student, method='post').status_code, 405)
+
+
+class RequestMetricsTests(LeaveFixtureMixin, LeaveTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.teacher)
+        cls.leaves = cls.make_leaves(cls.student, 6)
+
+    def setUp(self):
+        super().setUp()
+        metrics_registry.reset()
+
+    def test_records_route_queries_and_size(self):
+        client = self.client_for(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/admin/leaves/')
+        stats = metrics_registry.snapshot()['routes']['GET /api/admin/leaves/']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['max_queries'], len(ctx.captured_queries))
+        self.assertEqual(stats['max_response_bytes'], len(response.content))
+        self.assertEqual(stats['n_plus_one_requests'], 0)
+        self.assertEqual(sum(stats['duration_histogram_ms'].values()), 1)
+
+    def test_flags_repeated_sql(self):
+        # 换回逐行懒加载关联的模型序列化，每行都会查询学生，正是 N+1
+        lazy = lambda rows: LeaveSerializer(Leave.objects.filter(id__in=[row.id for row in rows]), many=True).data
+        with mock.patch('leave.pagination.serialize_leave_rows', lazy), \
+                self.assertLogs('leave.metrics', 'WARNING') as logs:
+            self.client_for(self.student).get('/api/view-leave/')
+        stats = metrics_registry.snapshot()['routes']['GET /api/view-leave/']
+        self.assertEqual(stats['n_plus_one_requests'], 1)
+        self.assertIn('auth_user', stats['repeated_sql'][0]['sql'])
+        self.assertIn('possible N+1 in GET /api/view-leave/', logs.output[0])
+
+    def test_async_requests_are_recorded(self):
+        async_to_sync(AsyncClient().get)(f'/api/leave/verify/{self.leaves[0].verification_uuid}/')
+        stats = metrics_registry.snapshot()['routes']['GET /api/leave/verify/<uuid:uuid>/']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['max_queries'], 0)
+
+    def test_endpoint_is_admin_only(self):
+        self.assertEqual(self.client_for(self.teacher).get('/api/admin/metrics/').status_code, 403)
+        response = self.client_for(self.admin).get('/api/admin/metrics/', {'reset': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('GET /api/admin/metrics/', self.client_for(self.admin).get('/api/admin/metrics/').json()['routes'])
+
+
+class CompactLeaveSerializerTests(LeaveFixtureMixin, LeaveTestCase):
+    """
+    列表快速序列化必须与 LeaveSerializer 渲染出的 JSON 逐字节一致。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.student = cls.make_student('s001', Class.objects.create(name='电气2304'), cls.teacher)
+        leaves = cls.make_leaves(cls.student, 3)
+        Leave.objects.filter(pk=leaves[0].pk).update(status=2, reject_reason='材料不全', approver='王老师')
+        Leave.objects.filter(pk=leaves[1].pk).update(start_date=leaves[1].start_date.replace(microsecond=0))
+        # 有档案但未分班、没有辅导员
+        cls.make_leaves(cls.make_student('s002', None, None), 2)
+        # 没有档案
+        orphan = cls.make_student('s003', None, None)
+        cls.make_leaves(orphan, 1)
+        StudentProfile.objects.filter(user=orphan).delete()
+
+    def assertSameJSON(self, qs):
+        expected = JSONRenderer().render(LeaveSerializer(qs, many=True).data)
+        self.assertEqual(JSONRenderer().render(serialize_leave_rows(leave_rows(qs))), expected)
+
+    def test_matches_leave_serializer(self):
+        self.assertSameJSON(Leave.objects.order_by('id'))
+
+    def test_matches_leave_serializer_in_utc(self):
+        with timezone.override('UTC'):
+            self.assertSameJSON(Leave.objects.order_by('id'))
+
+    def test_missing_profile_and_class(self):
+        rows = {row['student_number']: row for row in serialize_leave_rows(leave_rows(Leave.objects.all()))}
+        self.assertEqual((rows['s001']['class_name'], rows['s001']['student_class']), ('电气2304', '电气2304'))
+        self.assertNotIn('class_name', rows['s002'])
+        self.assertIsNone(rows['s002']['advisor_name'])
+        self.assertEqual((rows['s003']['class_name'], rows['s003']['student_class']), (None, None))
+
+    def test_list_views_use_compact_rows(self):
+        response = self.client_for(self.student).get('/api/view-leave/', {'pagination': 'cursor'})
+        qs = Leave.objects.filter(student=self.student).order_by('-leave_time', '-id')
+        self.assertEqual(JSONRenderer().render(response.json()['results']),
+                         JSONRenderer().render(LeaveSerializer(qs, many=True).data))
+
+
+def _normalize_sql(sql):
+    """
+    去掉字面量，参数不同的同一条 SQL 归为一类。
+    """
+    return re.sub(r"'[^']*'|\b\d+\b", '?', sql)
+
+
+def _new_leave(case, status=0, student=None):
+    return case.make_leaves(student or case.student, 1, status=status)[0]
+
+
+# 每个路由一个请求构造函数：返回 (方法, 路径, 请求体或查询参数, 用户或 None)。
+# 需要改动数据的请求先新建自己的目标对象，测量结束后整个请求回滚。
+QUERY_BUDGET_CASES = {
+    'register': lambda c: ('post', '/api/register/', {
+        'username': 'r001', 'password': 'pw123456', 'email': 'r001@example.com', 'class_name': '电气2304'}, None),
+    'token_obtain_pair': lambda c: ('post', '/api/token/', {'username': 's001', 'password': '123456'}, None),
+    'token_refresh': lambda c: ('post', '/api/token/refresh/', {'refresh': str(issue_tokens(c.student))}, None),
+    'request_leave': lambda c: ('post', '/api/request-leave/', {
+        'start_date': timezone.now().isoformat(), 'end_date': (timezone.now() + timedelta(days=1)).isoformat(),
+        'reason': '预算'}, c.student),
+    'view_leave_status': lambda c: ('get', '/api/view-leave/', {'page_size': 1000}, c.student),
+    'cancel_leave': lambda c: ('patch', f'/api/cancel-leave/{_new_leave(c).pk}/', None, c.student),
+    'leave-qrcode': lambda c: ('get', f'/api/view-leave/qrcode/{c.approved.verification_uuid}/', None, c.student),
+    'UserInfoView': lambda c: ('get', '/api/UserInfoView/', None, c.student),
+    'user_info': lambda c: ('get', '/api/user-info/', None, c.student),
+    'change_password': lambda c: ('post', '/api/change-password/', {
+        'currentPassword': '123456', 'newPassword': 'pw654321'}, c.student),
+    'verify-leave': lambda c: ('get', f'/api/leave/verify/{c.approved.verification_uuid}/', None, None),
+    'admin_leave_list': lambda c: ('get', '/api/admin/leaves/', {'page_size': 1000}, c.teacher),
+    'admin_leave_export': lambda c: ('get', '/api/admin/leaves/export/', None, c.admin),
+    'add-student': lambda c: ('post', '/api/admin/students/add/', {
+        'username': 'n001', 'last_name': '新生', 'class_name': '电气2304', 'advisor_last_name': '王老师'}, c.admin),
+    'delete-student': lambda c: ('post', f'/api/admin/students/delete/{c.throwaway_student().username}/', None, c.admin),
+    'modify-student': lambda c: ('patch', '/api/admin/students/modify/s001/', {'class_name': '电气2305'}, c.admin),
+    'get_student_info': lambda c: ('get', '/api/admin/students/check/s001/', None, c.admin),
+    'reset-student-password': lambda c: ('post', '/api/admin/students/reset_password/s001/', None, c.admin),
+    'approve_leave': lambda c: ('patch', f'/api/admin/approve-leave/{_new_leave(c).pk}/', None, c.admin),
+    'pre_approve_leave': lambda c: ('patch', f'/api/admin/pre-approve-leave/{_new_leave(c, 4).pk}/', None, c.admin),
+    'mas_approve_leave': lambda c: ('patch', f'/api/admin/mas-approve-leave/{_new_leave(c, 5).pk}/', None, c.admin),
+    'reject_leave': lambda c: ('post', f'/api/admin/reject-leave/{_new_leave(c).pk}/', {'reject_reason': '预算'}, c.admin),
+    'complete_leave': lambda c: ('patch', f'/api/admin/complete-leave/{_new_leave(c, 1).pk}/', None, c.admin),
+    'batch_transition_leaves': lambda c: ('post', '/api/admin/leaves/batch/approve/', {
+        'ids': [leave.pk for leave in c.make_leaves(c.student, 5)]}, c.admin),
+    'statistics-dashboard': lambda c: ('get', '/api/statistics/dashboard/', None, c.admin),
+    'request_metrics': lambda c: ('get', '/api/admin/metrics/', None, c.admin),
+}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(LeaveFixtureMixin, LeaveTestCase):
+    """
+    每个路由在 10 行与 1000 行数据下执行的 SQL 条数必须相同；列表接口一页取全部行，逐行查询会直接暴露。
+    新增路由时需要在 QUERY_BUDGET_CASES 中补充请求。
+    """
+    SMALL, LARGE = 10, 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_user('a001', 'admin', last_name='管理员')
+        cls.teacher = cls.make_user('t001', 'tch', last_name='王老师')
+        cls.class_a = Class.objects.create(name='电气2304', teacher=cls.teacher)
+        Class.objects.create(name='电气2305', teacher=cls.teacher)
+        cls.student = cls.make_student('s001', cls.class_a, cls.teacher)
+        cls.approved = cls.make_leaves(cls.student, 1, status=1)[0]
+        cls.grow(cls.SMALL)
+
+    @classmethod
+    def grow(cls, rows):
+        """
+        扩充到 rows 个同班学生（每人一条假条），s001 自己也有 rows 条假条。
+        """
+        existing = StudentProfile.objects.filter(assigned_class=cls.class_a).count() - 1
+        encoded = make_password('123456')
+        users = User.objects.bulk_create([
+            User(username=f'b{i:05d}', password=encoded, last_name=f'学生{i}', email=f'b{i:05d}@example.com')
+            for i in range(existing, rows)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.id, group_id=cls.make_group('stu').id) for user in users
+        ])
+        StudentProfile.objects.bulk_create([
+            StudentProfile(user=user, assigned_class=cls.class_a, advisor=cls.teacher) for user in users
+        ])
+        now = timezone.now()
+        Leave.objects.bulk_create([
+            Leave(student=user, advisor=cls.teacher, start_date=now, end_date=now + timedelta(days=i % 5),
+                  reason='理由', status=i % 6)
+            for i, user in enumerate(users)
+        ])
+        cls.make_leaves(cls.student, rows - Leave.objects.filter(student=cls.student).count())
+
+    def throwaway_student(self):
+        student = self.make_student('d001', self.class_a, self.teacher)
+        self.make_leaves(student, 2)
+        return student
+
+    def measure(self, name):
+        with transaction.atomic():
+            method, path, data, user = QUERY_BUDGET_CASES[name](self)
+            client = self.client_for(user) if user else APIClient()
+            for alias in TEST_CACHES:
+                caches[alias].clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = getattr(client, method)(path, data, format='json' if method != 'get' else None)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f'{name}: {response.status_code} {getattr(response, "data", "")}')
+        return [query['sql'] for query in ctx.captured_queries]
+
+    def test_every_route_has_a_case(self):
+        from .urls import urlpatterns
+        self.assertEqual({pattern.name for pattern in urlpatterns}, set(QUERY_BUDGET_CASES))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        small = {name: self.measure(name) for name in QUERY_BUDGET_CASES}
+        self.grow(self.LARGE)
+        failures = []
+        for name in QUERY_BUDGET_CASES:
+            large = self.measure(name)
+            if len(large) <= len(small[name]):
+                continue
+            before = Counter(map(_normalize_sql, small[name]))
+            grown = [f'    {count - before[sql]} x {sql}' for sql, count in Counter(map(_normalize_sql, large)).items()
+                     if count > before[sql]]
+            failures.append(f'{name}: {len(small[name])} 条 -> {len(large)} 条\n' + '\n'.join(grown))
+        if failures:
+            self.fail(f'SQL 条数随数据量增长（{self.SMALL} -> {self.LARGE} 行）：\n' + '\n\n'.join(failures))
@@ -1,30 +1,38 @@
 # leave/urls.py
 
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import (
     RegisterView,
     request_leave,
-    get_student_leaves,
     cancel_leave,
-    UserInfoView,
     ChangePasswordView,
     AdminLeaveListView,
+    export_leaves,
     approve_leave,
     pre_approve_leave,
     mas_approve_leave,
     reject_leave,
     complete_leaving,
+    batch_transition_leaves,
+    request_metrics,
     add_student,
     delete_student,
     get_student_info,
     modify_student_profile,
     reset_student_password,
-    leave_qrcode,
-    verify_leave,
 )
 from . import views_statistics  # <--- 必须加上这一行
 
+# ASGI 部署（LEAVE_ASYNC_VIEWS=1）时，只读接口换成 views_async 中的异步版本，路由与响应不变
+if getattr(settings, 'LEAVE_ASYNC_VIEWS', False):
+    from . import views_async as read_views
+    statistics_dashboard = read_views.statistics_dashboard
+else:
+    from . import views as read_views
+    statistics_dashboard = views_statistics.StatisticsDataView.as_view()
+
 urlpatterns = [
     # 注册与登录
     path('register/', RegisterView.as_view(), name='register'),
@@ -33,20 +41,21 @@ urlpatterns = [
 
     # 学生接口
     path('request-leave/', request_leave, name='request_leave'),               # 提交请假
-    path('view-leave/', get_student_leaves, name='view_leave_status'),         # 学生查看请假（分页可选）
+    path('view-leave/', read_views.get_student_leaves, name='view_leave_status'),         # 学生查看请假（分页可选）
     path('cancel-leave/<int:leave_id>/', cancel_leave, name='cancel_leave'),   # 取消请假
-    path('view-leave/qrcode/<uuid:uuid>/', leave_qrcode, name='leave-qrcode'), # 防伪二维码生成接口
+    path('view-leave/qrcode/<uuid:uuid>/', read_views.leave_qrcode, name='leave-qrcode'), # 防伪二维码生成接口
 
     # 用户信息接口（旧路由和新路由同时保留）
-    path('UserInfoView/', UserInfoView, name='UserInfoView'),                  # 旧路由，兼容前端未改动
-    path('user-info/', UserInfoView, name='user_info'),                        # 新路由，推荐使用
+    path('UserInfoView/', read_views.UserInfoView, name='UserInfoView'),                  # 旧路由，兼容前端未改动
+    path('user-info/', read_views.UserInfoView, name='user_info'),                        # 新路由，推荐使用
 
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     # 假条防伪查询接口
-    path('leave/verify/<uuid:uuid>/', verify_leave, name='verify-leave'),
+    path('leave/verify/<uuid:uuid>/', read_views.verify_leave, name='verify-leave'),
 
     # 管理员/教师/mas 接口
     path('admin/leaves/', AdminLeaveListView, name='admin_leave_list'),                             # 分页查看请假列表
+    path('admin/leaves/export/', export_leaves, name='admin_leave_export'),                         # 流式导出请假条（CSV / XLSX）
     path('admin/students/add/', add_student, name='add-student'),                                  #教师管理员添加学生
     path('admin/students/delete/<str:username>/', delete_student, name='delete-student'),          #管理员删除学生(仅限管理员)
     path('admin/students/modify/<str:username>/', modify_student_profile, name='modify-student'),   #修改学生信息
@@ -57,5 +66,7 @@ urlpatterns = [
     path('admin/mas-approve-leave/<int:leave_id>/', mas_approve_leave, name='mas_approve_leave'),    # mas 批准长假
     path('admin/reject-leave/<int:leave_id>/', reject_leave, name='reject_leave'),                  # 拒绝请假
     path('admin/complete-leave/<int:leave_id>/', complete_leaving, name='complete_leave'),          # 销假
-    path('statistics/dashboard/', views_statistics.StatisticsDataView.as_view(), name='statistics-dashboard'),
+    path('admin/leaves/batch/<str:action>/', batch_transition_leaves, name='batch_transition_leaves'), # 批量审批/拒绝/销假
+    path('statistics/dashboard/', statistics_dashboard, name='statistics-dashboard'),
+    path('admin/metrics/', request_metrics, name='request_metrics'),                                # 请求指标（仅 admin）
 ]
@@ -0,0 +1,158 @@
+# leave/verification.py
+"""
+公开防伪查询（verify_leave）的读穿透缓存：
+- 按 verification_uuid 缓存序列化好的假条数据，命中时不查询数据库
+- 未知 UUID、未批准假条也会缓存（负缓存），分别保留 404 / 400 两种响应
+- 假条保存、删除，学生档案、用户姓名或班级名称变更后（事务提交时）更换对应条目的版本号并删除条目
+
+缓存为 settings.CACHES 中的 LEAVE_VERIFY_CACHE_ALIAS（默认 'verification'，有上限的文件缓存，
+见 cache_backends.BoundedFileBasedCache），多个 worker 共享，任一 worker 上的失效对所有 worker 生效。
+公开接口可被任意 UUID 扫描，因此不与其他数据共用别名，写满时只淘汰防伪查询自己的条目。
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from django.db.models import Q
+
+from .models import Leave
+from .queries import with_serializer_relations
+from .serializers import LeaveSerializer
+
+# 可以公开查询的状态：已批准、已销假
+VERIFIABLE_STATUSES = (1, 3)
+
+# 缓存条目的类型
+FOUND = 'found'
+MISSING = 'missing'
+UNAPPROVED = 'unapproved'
+
+
+def verify_cache():
+    return caches[getattr(settings, 'LEAVE_VERIFY_CACHE_ALIAS', 'verification')]
+
+
+def _verify_key(uuid):
+    return f'leave:verify:{uuid}'
+
+
+def _version_key(uuid):
+    return f'leave:verify:{uuid}:version'
+
+
+def _version_timeout():
+    # 版本号要比各类条目都活得久；过期后生成新版本，旧条目自然失效
+    return getattr(settings, 'LEAVE_VERIFY_CACHE_TIMEOUT', 600)
+
+
+def load_verification(uuid):
+    """
+    查询数据库，返回 (类型, 假条数据或 None)。
+    """
+    leave = with_serializer_relations(Leave.objects.filter(verification_uuid=uuid)).first()
+    if leave is None:
+        return MISSING, None
+    if leave.status not in VERIFIABLE_STATUSES:
+        return UNAPPROVED, None
+    return FOUND, dict(LeaveSerializer(leave).data)
+
+
+async def aload_verification(uuid):
+    """
+    load_verification 的异步版本（异步 ORM）。
+    """
+    leave = await with_serializer_relations(Leave.objects.filter(verification_uuid=uuid)).afirst()
+    if leave is None:
+        return MISSING, None
+    if leave.status not in VERIFIABLE_STATUSES:
+        return UNAPPROVED, None
+    return FOUND, dict(LeaveSerializer(leave).data)
+
+
+def _entry_timeout(entry):
+    if entry[0] == FOUND:
+        return getattr(settings, 'LEAVE_VERIFY_CACHE_TIMEOUT', 600)
+    return getattr(settings, 'LEAVE_VERIFY_NEGATIVE_CACHE_TIMEOUT', 60)
+
+
+def get_verification(uuid):
+    """
+    读穿透：先读缓存，未命中时查询并按结果类型设置过期时间。
+
+    条目带着查询前读到的版本号写入，只有与当前版本号一致时才算命中：
+    查询期间若有失效（版本号已更换），写回的旧数据不会被后续请求读到。
+    """
+    cache = verify_cache()
+    key, version_key = _verify_key(uuid), _version_key(uuid)
+    cached = cache.get_many([key, version_key])
+    version, entry = cached.get(version_key), cached.get(key)
+    if entry is not None and version is not None and entry[0] == version:
+        return entry[1]
+    if version is None:
+        cache.add(version_key, time.time_ns(), _version_timeout())
+        version = cache.get(version_key)
+    entry = load_verification(uuid)
+    cache.set(key, (version, entry), _entry_timeout(entry))
+    return entry
+
+
+async def aget_verification(uuid):
+    """
+    get_verification 的异步版本，与同步版本共用缓存条目和版本号。
+    """
+    cache = verify_cache()
+    key, version_key = _verify_key(uuid), _version_key(uuid)
+    cached = await cache.aget_many([key, version_key])
+    version, entry = cached.get(version_key), cached.get(key)
+    if entry is not None and version is not None and entry[0] == version:
+        return entry[1]
+    if version is None:
+        await cache.aadd(version_key, time.time_ns(), _version_timeout())
+        version = await cache.aget(version_key)
+    entry = await aload_verification(uuid)
+    await cache.aset(key, (version, entry), _entry_timeout(entry))
+    return entry
+
+
+def invalidate_verification(*uuids):
+    """
+    事务提交后更换版本号并删除条目，避免其他请求在提交前用旧数据回填。
+    """
+    uuids = list(uuids)
+    if not uuids:
+        return
+
+    def bump():
+        cache = verify_cache()
+        version = time.time_ns()
+        cache.set_many({_version_key(uuid): version for uuid in uuids}, _version_timeout())
+        cache.delete_many([_verify_key(uuid) for uuid in uuids])
+
+    transaction.on_commit(bump)
+
+
+def invalidate_student_verifications(*student_ids):
+    """
+    学生班级、辅导员等变化后，其所有假条的查询结果都需要失效。
+    """
+    invalidate_verification(
+        *Leave.objects.filter(student_id__in=student_ids).values_list('verification_uuid', flat=True)
+    )
+
+
+def invalidate_user_verifications(user_id):
+    """
+    用户姓名等变化后，其作为学生或辅导员的假条查询结果都需要失效。
+    """
+    invalidate_verification(*Leave.objects.filter(Q(student_id=user_id) | Q(advisor_id=user_id))
+                            .values_list('verification_uuid', flat=True))
+
+
+def invalidate_class_verifications(class_id):
+    """
+    班级改名或删除后，该班学生的假条查询结果都需要失效。
+    """
+    invalidate_verification(*Leave.objects.filter(student__studentprofile__assigned_class_id=class_id)
+                            .values_list('verification_uuid', flat=True))
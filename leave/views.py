@@ -1,18 +1,16 @@
 # views.py
-import io, qrcode
+from datetime import date
+
 from django.utils import timezone
-from django.core.paginator import Paginator
 from django.contrib.auth.models import User 
-from django.shortcuts import get_object_or_404 
 from django.conf import settings
-from django.http import HttpResponse 
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import Leave , Class, StudentProfile
 from .serializers import (
@@ -22,7 +20,22 @@ from .serializers import (
     ChangePasswordSerializer,
     StudentCreateSerializer
 )
+from .authentication import issue_tokens, revoke_user_tokens
 from .decorators import group_required
+from .roles import has_group, is_admin_user
+from .queries import admin_leave_queryset, admin_scope_queryset, student_leave_queryset
+from .exporting import (
+    DEFAULT_CHUNK_SIZE as EXPORT_CHUNK_SIZE,
+    filter_export_queryset,
+    iter_csv_chunks,
+    iter_export_rows,
+    iter_xlsx_chunks,
+)
+from .metrics import registry as metrics_registry
+from .pagination import leave_page_data
+from .state_machine import INVALID_STATE, NOT_FOUND, TRANSITIONS, apply_batch_transition, transition_leave
+from .verification import MISSING, UNAPPROVED, get_verification
+from .qrcodes import QRCODE_CACHE_CONTROL, etag_matches, get_qrcode_png, qrcode_etag, verify_url
 
 
 ####### 学生注册
@@ -32,7 +45,7 @@ class RegisterView(APIView):
         serializer = UserRegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = issue_tokens(user)
             return Response({
                 'detail': 'User registered successfully!',
                 'refresh': str(refresh),
@@ -54,49 +67,64 @@ def request_leave(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-####### 管理员/教师/mas 查看请假条（分页 + 按 status 过滤）
+####### 管理员/教师/mas 查看请假条（分页 + 按 status 过滤，支持游标分页）
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch', 'mas')
 def AdminLeaveListView(request):
     user = request.user
     status_param = request.query_params.get('status')
-    page_num = int(request.query_params.get('page', 1))
-    page_size = int(request.query_params.get('page_size', 10))
 
-    # 根据角色决定查询范围
-    if user.groups.filter(name__in=['admin', 'mas']).exists():
-        qs = Leave.objects.all()
-    else:
-        # tch 组只能看自己学生
-        students = user.students.all().values_list('user', flat=True)
-        qs = Leave.objects.filter(student__in=students)
+    # 根据角色决定查询范围（tch 组只能看自己学生），并预加载序列化所需关联
+    is_admin = is_admin_user(user)
+    qs = admin_leave_queryset(user, is_admin, status_param)
 
-    # 按状态过滤
-    if status_param is not None:
-        qs = qs.filter(status=status_param)
+    # 分页：默认页码分页，pagination=cursor 时使用游标分页
+    return Response(leave_page_data(request, qs))
 
-    qs = qs.order_by('-leave_time')
+####### 管理员/教师/mas 流式导出请假条（CSV / XLSX）
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
 
-    # 分页
-    paginator = Paginator(qs, page_size)
-    page_obj = paginator.get_page(page_num)
-    serializer = LeaveSerializer(page_obj.object_list, many=True)
 
-    return Response({
-        'count': paginator.count,
-        'next': page_obj.next_page_number() if page_obj.has_next() else None,
-        'previous': page_obj.previous_page_number() if page_obj.has_previous() else None,
-        'results': serializer.data,
-    })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@group_required('admin', 'tch', 'mas')
+def export_leaves(request):
+    """
+    查询参数：file_type=csv|xlsx（默认 csv）、status=1,3、start_date / end_date=YYYY-MM-DD（按开始日期，含首尾）。
+    可见范围与 AdminLeaveListView 相同；数据按块从数据库取出并逐块发送，不在内存中拼出整个文件。
+    """
+    params = request.query_params
+    file_type = params.get('file_type', 'csv')
+    if file_type not in EXPORT_CONTENT_TYPES:
+        return Response({'error': 'file_type 只能是 csv 或 xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        statuses = [int(value) for value in params.get('status', '').split(',') if value.strip()]
+        date_from = date.fromisoformat(params['start_date']) if params.get('start_date') else None
+        date_to = date.fromisoformat(params['end_date']) if params.get('end_date') else None
+    except ValueError:
+        return Response({'error': 'status 应为逗号分隔的整数，日期格式应为 YYYY-MM-DD'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    qs = filter_export_queryset(admin_scope_queryset(user, is_admin_user(user)), date_from, date_to, statuses)
+    rows = iter_export_rows(qs, EXPORT_CHUNK_SIZE)
+    chunks = iter_xlsx_chunks(rows, EXPORT_CHUNK_SIZE) if file_type == 'xlsx' else iter_csv_chunks(rows, EXPORT_CHUNK_SIZE)
+
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[file_type])
+    filename = timezone.localtime().strftime('leaves_%Y%m%d_%H%M%S') + f'.{file_type}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 ####### 教师管理员添加学生
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch', 'mas')
 def add_student(request):
-    serializer = UserProfileSerializer(request.user)#获取导员id
-    Isuser = str(serializer.data['last_name'])
+    Isuser = str(request.user.last_name)#获取导员姓名
     #print(Isuser)
     data = request.data.copy()
     user = request.user
@@ -109,7 +137,7 @@ def add_student(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     #2. 判断角色
-    is_admin = user.groups.filter(name__in=['admin', 'mas']).exists()
+    is_admin = is_admin_user(user)
     if not is_admin:
         usertmp = str(data['advisor_last_name'])#获取请求的导员id
         if not Isuser == usertmp:
@@ -148,14 +176,14 @@ def delete_student(request, username):
             status=status.HTTP_404_NOT_FOUND
         )
     # 2. 确认这是个学生账号
-    if not target.groups.filter(name='stu').exists():
+    if not has_group(target, 'stu'):
         return Response(
             {"detail": "仅能删除学生账号。"},
             status=status.HTTP_400_BAD_REQUEST
         )
     # 3. 权限判断
     requester = request.user
-    is_admin = requester.groups.filter(name__in=['admin', 'mas']).exists()
+    is_admin = is_admin_user(requester)
     if not is_admin:
         # 辅导员只能删除自己班级下的学生
         profile = getattr(target, 'studentprofile', None)
@@ -186,7 +214,7 @@ def get_student_info(request, username):
             status=status.HTTP_404_NOT_FOUND
         )
     # 2. 必须是学生组
-    if not target.groups.filter(name='stu').exists():
+    if not has_group(target, 'stu'):
         return Response(
             {"detail": "仅能查询学生账号。"},
             status=status.HTTP_400_BAD_REQUEST
@@ -222,16 +250,16 @@ def modify_student_profile(request, username):
         return Response({"detail": "学生不存在。"}, status=status.HTTP_404_NOT_FOUND)
 
     # 2. 确保这是一个学生账号
-    if not target.groups.filter(name='stu').exists():
+    if not has_group(target, 'stu'):
         return Response({"detail": "目标不是学生账号。"}, status=status.HTTP_400_BAD_REQUEST)
 
     # 3. 权限校验
     requester = request.user
-    is_admin = requester.groups.filter(name__in=['admin', 'mas']).exists()
+    is_admin = is_admin_user(requester)
 
     if not is_admin:
         # 仅允许修改自己辅导的学生
-        profile_qs = StudentProfile.objects.filter(user=target, advisor=requester)
+        profile_qs = StudentProfile.objects.filter(user=target, advisor_id=requester.id)
         if not profile_qs.exists():
             return Response(
                 {"detail": "您只能修改自己辅导的学生信息。"},
@@ -284,30 +312,14 @@ def modify_student_profile(request, username):
     }, status=status.HTTP_200_OK)
 
 
-####### 学生查询自己请假条（分页 + 按 status 可选）
+####### 学生查询自己请假条（分页 + 按 status 可选，支持游标分页）
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @group_required('stu')
 def get_student_leaves(request):
     status_param = request.query_params.get('status')
-    page_num = int(request.query_params.get('page', 1))
-    page_size = int(request.query_params.get('page_size', 10))
-
-    qs = Leave.objects.filter(student=request.user)
-    if status_param is not None:
-        qs = qs.filter(status=status_param)
-    qs = qs.order_by('-leave_time')
-
-    paginator = Paginator(qs, page_size)
-    page_obj = paginator.get_page(page_num)
-    serializer = LeaveSerializer(page_obj.object_list, many=True)
-
-    return Response({
-        'count': paginator.count,
-        'next': page_obj.next_page_number() if page_obj.has_next() else None,
-        'previous': page_obj.previous_page_number() if page_obj.has_previous() else None,
-        'results': serializer.data,
-    })
+    qs = student_leave_queryset(request.user, status_param)
+    return Response(leave_page_data(request, qs))
 
 ###### 重置学生密码
 @api_view(['POST'])
@@ -329,17 +341,17 @@ def reset_student_password(request, username):
             status=status.HTTP_404_NOT_FOUND
         )
     # 2. 确保是学生账号
-    if not student.groups.filter(name='stu').exists():
+    if not has_group(student, 'stu'):
         return Response(
             {"detail": "目标用户不是学生。"},
             status=status.HTTP_400_BAD_REQUEST
         )
     # 3. 权限校验
     requester = request.user
-    is_admin = requester.groups.filter(name__in=['admin', 'mas']).exists()
+    is_admin = is_admin_user(requester)
     if not is_admin:
         # tch 只能重置自己辅导的学生
-        if not StudentProfile.objects.filter(user=student, advisor=requester).exists():
+        if not StudentProfile.objects.filter(user=student, advisor_id=requester.id).exists():
             return Response(
                 {"detail": "您只能重置自己辅导学生的密码。"},
                 status=status.HTTP_403_FORBIDDEN
@@ -354,25 +366,31 @@ def reset_student_password(request, username):
     # 5. 重置并保存
     student.set_password(new_password)
     student.save()
+    revoke_user_tokens(student.id)
 
     return Response(
         {"detail": f"学生 {username} 的密码已重置。"},
         status=status.HTTP_200_OK
     )
 
+
+####### 单条状态迁移（批准 / 初审 / 长假批准 / 拒绝 / 销假）
+# 迁移规则见 state_machine.TRANSITIONS，每次迁移是一条带状态条件的 UPDATE
+def _transition_response(result, ok_message, not_found_message, invalid_message):
+    if result == NOT_FOUND:
+        return Response({'error': not_found_message}, status=status.HTTP_404_NOT_FOUND)
+    if result == INVALID_STATE:
+        return Response({'error': invalid_message}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'status': ok_message})
+
+
 ####### 管理员批准请假
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch', 'mas')
 def approve_leave(request, leave_id):
-    try:
-        leave = Leave.objects.get(id=leave_id)
-    except Leave.DoesNotExist:
-        return Response({'error': '假条未找到'}, status=status.HTTP_404_NOT_FOUND)
-    leave.status = 1
-    leave.approver = request.user.last_name
-    leave.save()
-    return Response({'status': 'Leave approved'})
+    result, _ = transition_leave(TRANSITIONS['approve'], leave_id, approver=request.user.last_name)
+    return _transition_response(result, 'Leave approved', '假条未找到', '只有待批准、待审核或已初审的假条才能批准')
 
 
 ####### tch 初审批准请假
@@ -380,14 +398,8 @@ def approve_leave(request, leave_id):
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch')
 def pre_approve_leave(request, leave_id):
-    try:
-        leave = Leave.objects.get(id=leave_id)
-    except Leave.DoesNotExist:
-        return Response({'error': '假条未找到'}, status=status.HTTP_404_NOT_FOUND)
-    leave.status = 5
-    leave.approver = request.user.last_name
-    leave.save()
-    return Response({'status': 'Leave pre-approved'})
+    result, _ = transition_leave(TRANSITIONS['pre_approve'], leave_id, approver=request.user.last_name)
+    return _transition_response(result, 'Leave pre-approved', '假条未找到', '只有待审核的长假才能初审')
 
 
 ####### mas 批准长假期
@@ -395,14 +407,8 @@ def pre_approve_leave(request, leave_id):
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch')
 def mas_approve_leave(request, leave_id):
-    try:
-        leave = Leave.objects.get(id=leave_id)
-    except Leave.DoesNotExist:
-        return Response({'error': '假条未找到'}, status=status.HTTP_404_NOT_FOUND)
-    leave.status = 1
-    leave.approver = request.user.last_name
-    leave.save()
-    return Response({'status': 'Long leave approved'})
+    result, _ = transition_leave(TRANSITIONS['mas_approve'], leave_id, approver=request.user.last_name)
+    return _transition_response(result, 'Long leave approved', '假条未找到', '只有待审核或已初审的长假才能批准')
 
 
 ####### 管理员拒绝请假
@@ -410,21 +416,56 @@ def mas_approve_leave(request, leave_id):
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch', 'mas')
 def reject_leave(request, leave_id):
-    try:
-        leave = Leave.objects.get(id=leave_id)
-    except Leave.DoesNotExist:
-        return Response({'error': '没有找到该假条'}, status=status.HTTP_404_NOT_FOUND)
+    result, _ = transition_leave(
+        TRANSITIONS['reject'], leave_id,
+        approver=request.user.last_name,
+        reject_reason=request.data.get('reject_reason'),
+    )
+    return _transition_response(result, '已拒绝该假条', '没有找到该假条', '只有待批准的假条才能拒绝')
 
-    reject_reason = request.data.get('reject_reason')
-    if reject_reason:
-        leave.reject_reason = reject_reason
 
-    if leave.status in [0, 4]:
-        leave.status = 2
-        leave.approver = request.user.last_name
-        leave.save()
-        return Response({'status': '已拒绝该假条'})
-    return Response({'error': '只有待批准的假条才能拒绝'}, status=status.HTTP_400_BAD_REQUEST)
+####### 批量审批 / 拒绝 / 销假
+# 每种迁移允许的用户组，与对应的单条接口一致
+BATCH_TRANSITION_GROUPS = {
+    'approve': ('admin', 'tch', 'mas'),
+    'pre_approve': ('admin', 'tch'),
+    'mas_approve': ('admin', 'tch'),
+    'reject': ('admin', 'tch', 'mas'),
+    'complete': ('admin', 'tch'),
+}
+BATCH_MAX_IDS = 500
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@group_required('admin', 'tch', 'mas')
+def batch_transition_leaves(request, action):
+    """
+    请求体：{"ids": [1, 2, 3], "reject_reason": "..."}（reject_reason 仅拒绝时可选）。
+    一条带条件的 UPDATE 完成整批迁移，返回每个 id 的结果：ok / not_found / invalid_state（附当前状态）。
+    tch 只能操作自己学生的假条，范围外的 id 返回 not_found。
+    """
+    transition = TRANSITIONS.get(action)
+    if transition is None:
+        return Response({'error': f'未知的操作: {action}'}, status=status.HTTP_404_NOT_FOUND)
+    if not has_group(request.user, *BATCH_TRANSITION_GROUPS[action]):
+        return Response({'detail': 'You do not have permission to perform this action.'},
+                        status=status.HTTP_403_FORBIDDEN)
+
+    ids = request.data.get('ids')
+    if (not isinstance(ids, list) or not ids or len(ids) > BATCH_MAX_IDS
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        return Response({'error': f'ids 必须是 1-{BATCH_MAX_IDS} 个假条 id 组成的列表'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    updated, results = apply_batch_transition(
+        transition, ids,
+        approver=user.last_name,
+        reject_reason=request.data.get('reject_reason') if action == 'reject' else None,
+        queryset=admin_scope_queryset(user, is_admin_user(user)),
+    )
+    return Response({'updated': updated, 'results': results})
 
 
 ####### 管理员/tch 销假
@@ -432,15 +473,8 @@ def reject_leave(request, leave_id):
 @permission_classes([IsAuthenticated])
 @group_required('admin', 'tch')
 def complete_leaving(request, leave_id):
-    try:
-        leave = Leave.objects.get(id=leave_id)
-    except Leave.DoesNotExist:
-        return Response({'error': '没有找到假条'}, status=status.HTTP_404_NOT_FOUND)
-    if leave.status == 1:
-        leave.status = 3
-        leave.save()
-        return Response({'status': '销假成功'})
-    return Response({'error': '只有已批准的假条才能销假'}, status=status.HTTP_400_BAD_REQUEST)
+    result, _ = transition_leave(TRANSITIONS['complete'], leave_id)
+    return _transition_response(result, '销假成功', '没有找到假条', '只有已批准的假条才能销假')
 
 
 ####### 学生取消请假
@@ -449,7 +483,7 @@ def complete_leaving(request, leave_id):
 def cancel_leave(request, leave_id):
     try:
         # 只允许删除当前登录用户自己创建的假条
-        leave = Leave.objects.get(id=leave_id, student=request.user)
+        leave = Leave.objects.get(id=leave_id, student_id=request.user.id)
     except Leave.DoesNotExist:
         return Response({'error': '没有找到或没有权限'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -460,7 +494,7 @@ def cancel_leave(request, leave_id):
     return Response({'message': '假条已成功取消'}, status=status.HTTP_200_OK)
 # def cancel_leave(request, leave_id):
 #     try:
-#         leave = Leave.objects.get(id=leave_id, student=request.user)
+#         leave = Leave.objects.get(id=leave_id, student_id=request.user.id)
 #     except Leave.DoesNotExist:
 #         return Response({'error': '没有找到或没有权限'}, status=status.HTTP_404_NOT_FOUND)
 #     if leave.status != 0:
@@ -483,18 +517,17 @@ def UserInfoView(request):
 def leave_qrcode(request, uuid):
     """
     根据 verification_uuid 生成二维码，指向验证页面 URL。
+    图片按地址缓存，并带强 ETag：浏览器再次请求时直接返回 304。
     """
-    # 构造被扫描后打开的页面地址
-    verify_path = f"/leave/verify/{uuid}/"
-    verify_url  = f"https://leave.sdutee.xyz{verify_path}"
-    #verify_url = "https://leave.sdutee.xyz"
-    # 生成二维码
-    img = qrcode.make(verify_url)
-    buf = io.BytesIO()
-    img.save(buf, format='PNG')
-    buf.seek(0)
-
-    return HttpResponse(buf, content_type='image/png')
+    url = verify_url(uuid)
+    etag = qrcode_etag(url)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_qrcode_png(url), content_type='image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = QRCODE_CACHE_CONTROL
+    return response
 
 ####### 防伪假条查询
 @api_view(['GET'])
@@ -502,19 +535,36 @@ def leave_qrcode(request, uuid):
 def verify_leave(request, uuid):
     """
     防伪验证：只有已批准(status=1)或已销假(status=3)的假条才返回详情。
-    其他状态或不存在，一律返回 400 + “假条不存在或未批准”。
+    其他状态返回 400 + “假条不存在或未批准”，UUID 不存在返回 404。
+    查询结果（包括不存在、未批准）按 UUID 缓存，假条变更时失效。
     """
-    leave = get_object_or_404(Leave, verification_uuid=uuid)
+    kind, data = get_verification(uuid)
+    if kind == MISSING:
+        raise Http404(f"No {Leave._meta.object_name} matches the given query.")
 
     # 只允许状态 1 和 3
-    if leave.status not in (1, 3):
+    if kind == UNAPPROVED:
         return Response(
             {"detail": "假条不存在或未批准"},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    serializer = LeaveSerializer(leave)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+####### 管理员查看请求指标（当前 worker 进程）
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@group_required('admin')
+def request_metrics(request):
+    """
+    按路由汇总的耗时、SQL 条数、响应大小与 N+1 嫌疑 SQL（见 leave/metrics.py）。
+    多个 worker 时只包含处理本次请求的进程，完整数据见定期写入的日志。?reset=1 读取后清零。
+    """
+    snapshot = metrics_registry.snapshot()
+    if request.query_params.get('reset') in ('1', 'true'):
+        metrics_registry.reset()
+    return Response(snapshot)
 
 
 ####### 修改密码
@@ -524,7 +574,13 @@ class ChangePasswordView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = ChangePasswordSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            return Response({"detail": "密码更新成功!"}, status=status.HTTP_200_OK)
+            user = serializer.save()
+            # 改密码会吊销此前签发的全部令牌（含本次请求所用的），返回新令牌供当前会话继续使用
+            refresh = issue_tokens(user)
+            return Response({
+                "detail": "密码更新成功!",
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+            }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
\ No newline at end of file
@@ -0,0 +1,124 @@
+# leave/views_async.py
+"""
+只读接口的异步版本，ASGI 部署（LEAVE_ASYNC_VIEWS=1，见 start.sh）时由 urls.py 挂到原路由上：
+防伪查询、防伪二维码、用户信息、学生请假列表、数据看板。
+
+这些视图是普通的 Django 异步视图（DRF 不支持 async def 视图），
+认证、权限与错误响应在 async_read_view 中按 DRF 的行为实现，响应体与同步版本逐字节一致。
+数据库查询使用异步 ORM，二维码生成放到有界线程池（qrcodes.render_executor），
+一个慢请求只占用事件循环上的一个协程，不再独占一个 worker 进程。
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import ClaimsJWTAuthentication
+from .models import Leave
+from .pagination import aleave_page_data
+from .qrcodes import QRCODE_CACHE_CONTROL, aget_qrcode_png, etag_matches, qrcode_etag, verify_url
+from .queries import student_leave_queryset
+from .roles import aget_group_names, has_group
+from .serializers import UserProfileSerializer
+from .stats_cache import cached_dashboard
+from .verification import MISSING, UNAPPROVED, aget_verification
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def json_response(data, status=200):
+    """
+    与 DRF Response 经 JSONRenderer 输出的字节相同。
+    """
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def api_error_response(exc):
+    """
+    按 DRF exception_handler 的规则把 APIException 转成响应。
+    """
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = ClaimsJWTAuthentication().authenticate_header(None)
+    return response
+
+
+def async_read_view(*group_names, public=False):
+    """
+    异步只读视图的装饰器：只允许 GET/HEAD，认证（public=True 时跳过）并按组名检查权限，
+    相当于同步视图上的 @api_view(['GET']) + IsAuthenticated + @group_required。
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            try:
+                if request.method not in READ_METHODS:
+                    raise exceptions.MethodNotAllowed(request.method)
+                if not public:
+                    result = await ClaimsJWTAuthentication().aauthenticate(request)
+                    if result is None:
+                        raise exceptions.NotAuthenticated()
+                    request.user = result[0]
+                    if group_names:
+                        await aget_group_names(request.user)
+                        if not has_group(request.user, *group_names):
+                            raise exceptions.PermissionDenied()
+                return await view_func(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return api_error_response(exc)
+        return _wrapped_view
+    return decorator
+
+
+####### 学生查询自己请假条（分页 + 按 status 可选，支持游标分页）
+@async_read_view('stu')
+async def get_student_leaves(request):
+    qs = student_leave_queryset(request.user, request.GET.get('status'))
+    return json_response(await aleave_page_data(request, qs))
+
+
+####### 用户查询自己信息
+@async_read_view()
+async def UserInfoView(request):
+    try:
+        user = await User.objects.select_related('studentprofile__assigned_class').aget(pk=request.user.id)
+    except User.DoesNotExist:
+        raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+    user._leave_group_names = await aget_group_names(request.user)
+    return json_response(UserProfileSerializer(user).data)
+
+
+####### 防伪二维码
+@async_read_view()
+async def leave_qrcode(request, uuid):
+    url = verify_url(uuid)
+    etag = qrcode_etag(url)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(await aget_qrcode_png(url), content_type='image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = QRCODE_CACHE_CONTROL
+    return response
+
+
+####### 防伪假条查询
+@async_read_view(public=True)
+async def verify_leave(request, uuid):
+    kind, data = await aget_verification(uuid)
+    if kind == MISSING:
+        raise exceptions.NotFound(f"No {Leave._meta.object_name} matches the given query.")
+    if kind == UNAPPROVED:
+        return json_response({"detail": "假条不存在或未批准"}, status=400)
+    return json_response(data)
+
+
+####### 数据看板
+@async_read_view()
+async def statistics_dashboard(request):
+    # 看板由多条聚合查询与缓存锁组成，整体放到线程中执行
+    return json_response(await sync_to_async(cached_dashboard)())
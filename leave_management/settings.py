@@ -49,7 +49,8 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # 由令牌声明构造用户，不再每个请求查询 auth_user
+        'leave.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -68,9 +69,114 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # 令牌中附加 username / last_name / groups 声明
+    'TOKEN_OBTAIN_SERIALIZER': 'leave.authentication.LeaveTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'leave.authentication.LeaveTokenRefreshSerializer',
 }
 
+# 令牌吊销检查：'none' / 'version'（默认，查缓存中的吊销时间）/ 'db'（每个请求查询 User）
+# 'none' 不做吊销与停用检查：改密码、调整组之后旧令牌（含 refresh 令牌）在过期前仍可使用；
+# 停用或删除的用户，已签发的 access 令牌在过期前（60 分钟）仍然有效，刷新时才被拒绝。生产环境不要使用
+LEAVE_JWT_REVOCATION_CHECK = os.environ.get('LEAVE_JWT_REVOCATION_CHECK', 'version')
+# 吊销记录单独使用一个从不淘汰的缓存别名（见 CACHES['revocation']），不能与其他数据共用
+LEAVE_JWT_REVOCATION_CACHE = 'revocation'
+
+# 数据看板数据来源：'summary'（增量维护的统计汇总表，默认）/ 'live'（每次扫描 Leave 表）
+LEAVE_STATS_SOURCE = os.environ.get('LEAVE_STATS_SOURCE', 'summary')
+# 时长分段边界（天），默认分为 1天以内 / 1-3天 / 3天以上
+LEAVE_DURATION_BUCKETS = (1, 3)
+
+# 缓存目录：文件缓存默认放在这里，多个 gunicorn worker 共享
+LEAVE_CACHE_DIR = os.environ.get('LEAVE_CACHE_DIR', str(BASE_DIR / 'cache'))
+
+# 数据看板缓存后端：'file'（多 worker 共享，默认）/ 'locmem'（单进程部署）
+LEAVE_STATS_CACHE_BACKEND = os.environ.get('LEAVE_STATS_CACHE_BACKEND', 'file')
+LEAVE_STATS_CACHE_ALIAS = 'statistics'
+LEAVE_STATS_CACHE_TIMEOUT = 60 * 60  # 兜底过期时间，正常情况下由 Leave 写入触发失效
+
+# 防伪二维码：验证页面地址、PNG 缓存（'locmem' 按 LRU 淘汰 / 'file' 多 worker 共享）与批准后预生成
+LEAVE_VERIFY_BASE_URL = os.environ.get('LEAVE_VERIFY_BASE_URL', 'https://leave.sdutee.xyz')
+LEAVE_QRCODE_CACHE_BACKEND = os.environ.get('LEAVE_QRCODE_CACHE_BACKEND', 'locmem')
+LEAVE_QRCODE_CACHE_ALIAS = 'qrcode'
+LEAVE_QRCODE_CACHE_MAX_ENTRIES = int(os.environ.get('LEAVE_QRCODE_CACHE_MAX_ENTRIES', 5000))  # 单张约 1KB
+LEAVE_QRCODE_PRERENDER = os.environ.get('LEAVE_QRCODE_PRERENDER', '0') == '1'
+LEAVE_QRCODE_RENDER_THREADS = int(os.environ.get('LEAVE_QRCODE_RENDER_THREADS', 2))  # 异步视图生成二维码的线程数
+
+# 请求指标：按路由统计耗时、SQL 条数与耗时、响应大小，管理员通过 /api/admin/metrics/ 查看
+LEAVE_METRICS_ENABLED = os.environ.get('LEAVE_METRICS_ENABLED', '1') == '1'
+LEAVE_METRICS_N_PLUS_ONE_THRESHOLD = 5  # 同一请求内同一条 SQL 执行达到该次数时记 WARNING
+LEAVE_METRICS_DUMP_INTERVAL = int(os.environ.get('LEAVE_METRICS_DUMP_INTERVAL', 300))  # 秒，0 表示不定期写日志
+# 汇总与 N+1 警告写入的日志文件，未设置时输出到控制台（nohup.out）
+LEAVE_METRICS_LOG_FILE = os.environ.get('LEAVE_METRICS_LOG_FILE')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'metrics': {'format': '[{asctime}] [{process}] [{levelname}] {message}', 'style': '{'},
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.FileHandler', 'filename': LEAVE_METRICS_LOG_FILE, 'formatter': 'metrics',
+        } if LEAVE_METRICS_LOG_FILE else {
+            'class': 'logging.StreamHandler', 'formatter': 'metrics',
+        },
+    },
+    'loggers': {
+        'leave.metrics': {'handlers': ['metrics'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# ASGI 部署时只读接口（防伪查询、二维码、用户信息、学生请假列表、数据看板）使用异步视图，见 leave/views_async.py
+LEAVE_ASYNC_VIEWS = os.environ.get('LEAVE_ASYNC_VIEWS', '0') == '1'
+
+# 防伪查询缓存：独立的文件缓存别名（多 worker 共享，任一 worker 上的失效对所有 worker 生效）。
+# 公开接口，每个不同的 UUID 一个文件（含负缓存），因此单独设上限，写满只淘汰防伪查询自己的条目
+LEAVE_VERIFY_CACHE_ALIAS = 'verification'
+LEAVE_VERIFY_CACHE_MAX_ENTRIES = int(os.environ.get('LEAVE_VERIFY_CACHE_MAX_ENTRIES', 20000))
+LEAVE_VERIFY_CACHE_CULL_INTERVAL = 100  # 每个 worker 每 100 次写入才统计一次目录
+LEAVE_VERIFY_CACHE_TIMEOUT = 10 * 60  # 已批准假条
+LEAVE_VERIFY_NEGATIVE_CACHE_TIMEOUT = 60  # 不存在 / 未批准
+
+CACHES = {
+    # 与未配置 CACHES 时 Django 的默认值相同（进程内缓存），项目代码不使用该别名
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # 令牌吊销记录：被淘汰就意味着已吊销的令牌重新生效，因此从不淘汰（条目数以用户数为上限）
+    'revocation': {
+        'BACKEND': 'leave.cache_backends.PersistentFileBasedCache',
+        'LOCATION': os.path.join(LEAVE_CACHE_DIR, 'revocation'),
+    },
+    'verification': {
+        'BACKEND': 'leave.cache_backends.BoundedFileBasedCache',
+        'LOCATION': os.path.join(LEAVE_CACHE_DIR, 'verification'),
+        'OPTIONS': {'MAX_ENTRIES': LEAVE_VERIFY_CACHE_MAX_ENTRIES, 'CULL_INTERVAL': LEAVE_VERIFY_CACHE_CULL_INTERVAL},
+    },
+    'statistics': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(LEAVE_CACHE_DIR, 'statistics'),
+    } if LEAVE_STATS_CACHE_BACKEND == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'leave-statistics',
+    },
+    'qrcode': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(LEAVE_CACHE_DIR, 'qrcode'),
+        'OPTIONS': {'MAX_ENTRIES': LEAVE_QRCODE_CACHE_MAX_ENTRIES},
+    } if LEAVE_QRCODE_CACHE_BACKEND == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'leave-qrcode',
+        'OPTIONS': {'MAX_ENTRIES': LEAVE_QRCODE_CACHE_MAX_ENTRIES},
+    },
+}
+
+# 测试期间缓存全部改用进程内缓存，不在 LEAVE_CACHE_DIR 中建目录
+TEST_RUNNER = 'leave.test_runner.LeaveTestRunner'
+
 MIDDLEWARE = [
+    # 放在最前，计时覆盖整个中间件链（见 leave/metrics.py）
+    "leave.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -105,12 +211,47 @@ WSGI_APPLICATION = "leave_management.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# 数据库后端：'sqlite'（默认，单机部署）/ 'postgresql'（需安装 psycopg，多 worker 高并发写入时推荐）
+# 本地试用 PostgreSQL：
+#   docker run -d -p 5432:5432 -e POSTGRES_DB=leave -e POSTGRES_PASSWORD=leave postgres:16
+#   LEAVE_DB_ENGINE=postgresql LEAVE_DB_PASSWORD=leave python manage.py migrate
+LEAVE_DB_ENGINE = os.environ.get('LEAVE_DB_ENGINE', 'sqlite')
+# 持久连接（秒）：每个 worker 复用连接，不必每个请求重新建立连接、执行 PRAGMA
+# ASGI 部署下异步 ORM 在每个请求各自的线程中执行，连接无法跨请求复用，默认关闭持久连接
+LEAVE_DB_CONN_MAX_AGE = int(os.environ.get('LEAVE_DB_CONN_MAX_AGE', 0 if LEAVE_ASYNC_VIEWS else 60))
+LEAVE_DB_CONN_HEALTH_CHECKS = os.environ.get('LEAVE_DB_CONN_HEALTH_CHECKS', '1') == '1'
+
+# SQLite 连接建立时执行的 PRAGMA（见 leave/db.py），留空则不设置
+# WAL：读不阻塞写、写不阻塞读；synchronous=NORMAL 在 WAL 下只在检查点时 fsync
+LEAVE_SQLITE_JOURNAL_MODE = os.environ.get('LEAVE_SQLITE_JOURNAL_MODE', 'WAL')
+LEAVE_SQLITE_SYNCHRONOUS = os.environ.get('LEAVE_SQLITE_SYNCHRONOUS', 'NORMAL')
+LEAVE_SQLITE_BUSY_TIMEOUT = int(os.environ.get('LEAVE_SQLITE_BUSY_TIMEOUT', 5000))  # 毫秒，等待写锁的时间
+# 事务开始即获取写锁，避免读后写的事务升级写锁时直接报 database is locked（Django 5.1+）
+LEAVE_SQLITE_TRANSACTION_MODE = os.environ.get('LEAVE_SQLITE_TRANSACTION_MODE', 'IMMEDIATE')
+
+if LEAVE_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get('LEAVE_DB_NAME', 'leave'),
+            "USER": os.environ.get('LEAVE_DB_USER', 'postgres'),
+            "PASSWORD": os.environ.get('LEAVE_DB_PASSWORD', ''),
+            "HOST": os.environ.get('LEAVE_DB_HOST', 'localhost'),
+            "PORT": os.environ.get('LEAVE_DB_PORT', '5432'),
+            "CONN_MAX_AGE": LEAVE_DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": LEAVE_DB_CONN_HEALTH_CHECKS,
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get('LEAVE_DB_NAME', BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": LEAVE_DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": LEAVE_DB_CONN_HEALTH_CHECKS,
+            "OPTIONS": {"transaction_mode": LEAVE_SQLITE_TRANSACTION_MODE} if LEAVE_SQLITE_TRANSACTION_MODE else {},
+        }
     }
-}
 
 
 # Password validation
@@ -2,5 +2,10 @@
 lsof -i :8000
 source ~/django_venv/bin/activate
 
-gunicorn --workers 3 leave_management.wsgi:application &
+if [ "$LEAVE_ASGI" = "1" ]; then
+    # ASGI 部署：只读接口使用异步视图（leave/views_async.py），需要安装 uvicorn
+    LEAVE_ASYNC_VIEWS=1 gunicorn --workers 3 -k uvicorn.workers.UvicornWorker leave_management.asgi:application &
+else
+    gunicorn --workers 3 leave_management.wsgi:application &
+fi
 